@@ -0,0 +1,71 @@
+'''
+Compares the sympy and the autodiff differentiation backends on large expressions.
+
+Run from the root of the repository:
+    python -m benchmarks.bench_autodiff
+'''
+
+import sympy
+
+import numpy as np
+
+from time import perf_counter
+from typing import Callable, Tuple, Any
+
+from src.toolbar_utils import build_value_and_grad, DIFF_BACKENDS
+
+
+GRID_SIZE = 200
+NESTING_DEPTHS = (2, 4, 6, 7)
+NUM_REPEATS = 5
+
+
+def nested_expression(depth: int) -> sympy.Expr:
+    '''
+    Builds an expression, whose symbolic derivatives grow quickly with the depth
+
+    Parameters
+    ----------
+    depth : int
+        Nesting depth
+
+    Returns
+    -------
+    sympy.Expr
+        Expression
+    '''
+
+    x, y = sympy.symbols('x y')
+    expr = x**2 + y**2
+    for _ in range(depth):
+        expr = sympy.sin(expr * x + y) * sympy.exp(-expr**2 / 4) + expr / 2
+    return expr
+
+
+def timeit(func: Callable[[], Any]) -> Tuple[float, Any]:
+    start = perf_counter()
+    result = func()
+    return perf_counter() - start, result
+
+
+def main() -> None:
+    xs = np.linspace(-1, 1, GRID_SIZE)
+    grid = np.stack(np.meshgrid(xs, xs))
+    point = np.array([0.3, -0.2])
+
+    print(f'{"depth":>5} {"backend":>9} {"build, s":>10} {"point, ms":>10} {"grid, ms":>10}')
+
+    for depth in NESTING_DEPTHS:
+        expr = nested_expression(depth)
+
+        for backend in DIFF_BACKENDS:
+            build_time, (_, kernel) = timeit(lambda: build_value_and_grad(expr, backend))
+
+            point_time = min(timeit(lambda: kernel(point))[0] for _ in range(NUM_REPEATS))
+            grid_time = min(timeit(lambda: kernel(grid))[0] for _ in range(NUM_REPEATS))
+
+            print(f'{depth:>5} {backend:>9} {build_time:>10.3f} {1e3 * point_time:>10.3f} {1e3 * grid_time:>10.3f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+'''
+Compares the differentiation backends on the kernel evaluation and on a whole BFGS run.
+With the numba backend BFGS runs entirely in compiled code.
+
+Run from the root of the repository (numba is required for the jit rows):
+    python -m benchmarks.bench_jit
+'''
+
+import numpy as np
+
+from time import perf_counter
+from typing import Callable, Tuple, Any
+
+from src.toolbar_utils import build_function, build_value_and_grad, DIFF_BACKENDS
+from src.optimizers import optimize
+
+
+GRID_SIZE = 200
+NUM_REPEATS = 5
+EPSILON = 1e-6
+
+FUNCTIONS = (
+    'x**2 + y**2 - cos(2*x + y)',
+    '(1 - x)**2 + 100*(y - x**2)**2',
+    'sin(x)*exp(-y**2) + log(1 + x**2 + y**2)',
+)
+START_POINT = (-1.2, 1.0)
+
+
+def timeit(func: Callable[[], Any]) -> Tuple[float, Any]:
+    start = perf_counter()
+    result = func()
+    return perf_counter() - start, result
+
+
+def main() -> None:
+    xs = np.linspace(-2, 2, GRID_SIZE)
+    grid = np.stack(np.meshgrid(xs, xs))
+    point = np.array([0.3, -0.2])
+    x_0 = np.array(START_POINT)
+
+    print(f'{"function":>40} {"backend":>9} {"build, s":>10} {"point, us":>10} {"grid, ms":>10} '
+          f'{"bfgs, ms":>10} {"n_iter":>7}')
+
+    for input_str in FUNCTIONS:
+        _, func, _, _ = build_function(input_str)
+
+        for backend in DIFF_BACKENDS:
+            build_time, (_, kernel) = timeit(lambda: build_value_and_grad(func, backend))
+
+            '''
+            the first run compiles the jit loop, so it is not measured
+            '''
+            optimize('bfgs', kernel, x_0, EPSILON)
+
+            point_time = min(timeit(lambda: kernel(point))[0] for _ in range(NUM_REPEATS))
+            grid_time = min(timeit(lambda: kernel(grid))[0] for _ in range(NUM_REPEATS))
+            bfgs_time, (res, _) = min(timeit(lambda: optimize('bfgs', kernel, x_0, EPSILON)) for _ in range(NUM_REPEATS))
+
+            print(f'{input_str:>40} {backend:>9} {build_time:>10.3f} {1e6 * point_time:>10.1f} '
+                  f'{1e3 * grid_time:>10.3f} {1e3 * bfgs_time:>10.3f} {res["n_iter"]:>7}')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,10 @@
 import sys
+import argparse
 
 from PyQt5.QtWidgets import QApplication
 
 from mainwindow import MainWindow
+from utils import configure_logging, LOG_LEVEL_ENV
 
 from types import TracebackType
 
@@ -20,8 +22,15 @@ if __name__ == '__main__':
     making qt output errors to stdout
     '''
     sys.excepthook = except_hook
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--log-level', default=None,
+                        help=f'logging level (e.g. DEBUG or TRACE), overrides {LOG_LEVEL_ENV} environment variable')
+    args, qt_args = parser.parse_known_args()
+
+    configure_logging(args.log_level)
     
-    app = QApplication(sys.argv)
+    app = QApplication(sys.argv[:1] + qt_args)
 
     window = MainWindow()
     window.show()
@@ -0,0 +1,374 @@
+import sympy
+
+from typing import Tuple, List, Dict, Callable, Optional, Any
+
+from pathlib import Path
+
+import numpy as np
+
+from .utils import get_logger
+from .precision import floating_dtype
+
+
+logger = get_logger(Path(__file__).name)
+
+
+VARIABLES = ('x', 'y')
+
+'''
+Supported elementary functions: name of the sympy class -> (f, f', f'')
+'''
+UNARY_FUNCTIONS: Dict[str, Tuple[Callable[[Any], Any], Callable[[Any], Any], Callable[[Any], Any]]] = {
+    'sin': (np.sin, np.cos, lambda a: -np.sin(a)),
+    'cos': (np.cos, lambda a: -np.sin(a), lambda a: -np.cos(a)),
+    'tan': (np.tan, lambda a: 1 + np.tan(a)**2, lambda a: 2 * np.tan(a) * (1 + np.tan(a)**2)),
+    'exp': (np.exp, np.exp, np.exp),
+    'log': (np.log, lambda a: 1 / a, lambda a: -1 / a**2),
+    'Abs': (np.abs, np.sign, np.zeros_like),
+    'asin': (np.arcsin, lambda a: (1 - a**2)**-0.5, lambda a: a * (1 - a**2)**-1.5),
+    'acos': (np.arccos, lambda a: -(1 - a**2)**-0.5, lambda a: -a * (1 - a**2)**-1.5),
+    'atan': (np.arctan, lambda a: 1 / (1 + a**2), lambda a: -2 * a / (1 + a**2)**2),
+    'sinh': (np.sinh, np.cosh, np.sinh),
+    'cosh': (np.cosh, np.sinh, np.cosh),
+    'tanh': (np.tanh, lambda a: 1 - np.tanh(a)**2, lambda a: -2 * np.tanh(a) * (1 - np.tanh(a)**2)),
+}
+
+VAR = 'var'
+CONST = 'const'
+ADD = 'add'
+MUL = 'mul'
+POW_CONST = 'pow_const'
+POW = 'pow'
+
+
+class Tape:
+    '''
+    Automatic differentiation engine, working directly on the sympy expression tree.
+
+    The expression is linearized into a tape of elementary operations, where
+    identical subexpressions are recorded only once. Values are propagated
+    forward along the tape, and adjoints are propagated backward (reverse mode),
+    so the gradient costs a small constant times the cost of the function itself.
+    Hessian-vector products are computed by propagating forward mode tangents
+    through both sweeps (forward-over-reverse).
+
+    All of the operations are performed on numpy arrays, so a batch of points
+    of shape (2, ...) is evaluated at once.
+    '''
+
+    def __init__(self, expr: sympy.Expr) -> None:
+        logger.debug('Recording tape')
+
+        '''
+        each node is a tuple of the operation, indices of the arguments and a constant
+        '''
+        self.nodes: List[Tuple[str, Tuple[int, ...], Any]] = []
+        self.__index: Dict[sympy.Expr, int] = {}
+
+        self.root = self.__record(sympy.sympify(expr))
+
+    def __emit(self, op: str, args: Tuple[int, ...], const: Any = None) -> int:
+        self.nodes.append((op, args, const))
+        return len(self.nodes) - 1
+
+    def __record(self, expr: sympy.Expr) -> int:
+        '''
+        Records the expression in the post order without recursion,
+        so that deeply nested expressions do not hit the recursion limit
+
+        Parameters
+        ----------
+        expr : sympy.Expr
+            Expression to record
+
+        Returns
+        -------
+        int
+            Index of the node, corresponding to the expression
+        '''
+
+        stack: List[Tuple[sympy.Expr, bool]] = [(expr, False)]
+
+        while stack:
+            node, expanded = stack.pop()
+
+            if node in self.__index:
+                continue
+
+            if not expanded and node.args:
+                stack.append((node, True))
+                stack.extend((arg, False) for arg in node.args)
+                continue
+
+            self.__index[node] = self.__emit_node(node)
+
+        return self.__index[expr]
+
+    def __emit_node(self, node: sympy.Expr) -> int:
+        if node.is_Symbol:
+            if node.name not in VARIABLES:
+                raise ValueError(f'Unknown symbol: {node}')
+            return self.__emit(VAR, (), VARIABLES.index(node.name))
+
+        args = tuple(self.__index[arg] for arg in node.args)
+
+        '''
+        constant subexpressions are folded, checking the arguments
+        instead of free_symbols, because the latter is recursive
+        '''
+        if all(self.nodes[arg][0] == CONST for arg in args):
+            try:
+                return self.__emit(CONST, (), float(node))
+            except TypeError:
+                raise ValueError(f'Not a real constant: {node}')
+
+        if node.is_Add:
+            return self.__emit(ADD, args)
+
+        if node.is_Mul:
+            '''
+            n-ary products are split into binary ones, so that
+            the partial derivatives do not require division
+            '''
+            result = args[0]
+            for arg in args[1:]:
+                result = self.__emit(MUL, (result, arg))
+            return result
+
+        if node.is_Pow:
+            exponent_op, _, exponent = self.nodes[args[1]]
+            if exponent_op == CONST:
+                return self.__emit(POW_CONST, (args[0],), exponent)
+            return self.__emit(POW, args)
+
+        name = type(node).__name__
+        if name in UNARY_FUNCTIONS and len(args) == 1:
+            return self.__emit(name, args)
+
+        raise ValueError(f'Unsupported operation: {name}')
+
+    def __forward(self, point: np.ndarray,
+                  direction: Optional[np.ndarray] = None) -> Tuple[List[Any], Optional[List[Any]]]:
+        dtype = floating_dtype(point)
+        vals: List[Any] = [None] * len(self.nodes)
+        dots: Optional[List[Any]] = None if direction is None else [None] * len(self.nodes)
+
+        for i, (op, args, const) in enumerate(self.nodes):
+            if op == VAR:
+                vals[i] = np.asarray(point[const], dtype=dtype)
+            elif op == CONST:
+                vals[i] = const
+            elif op == ADD:
+                vals[i] = sum(vals[a] for a in args)
+            elif op == MUL:
+                vals[i] = vals[args[0]] * vals[args[1]]
+            elif op == POW_CONST:
+                vals[i] = vals[args[0]]**const
+            elif op == POW:
+                vals[i] = vals[args[0]]**vals[args[1]]
+            else:
+                vals[i] = UNARY_FUNCTIONS[op][0](vals[args[0]])
+
+            if dots is None:
+                continue
+
+            assert direction is not None
+
+            if op == VAR:
+                dots[i] = direction[const]
+            elif op == CONST:
+                dots[i] = 0.0
+            elif op == ADD:
+                dots[i] = sum(dots[a] for a in args)
+            elif op == MUL:
+                a, b = args
+                dots[i] = dots[a] * vals[b] + vals[a] * dots[b]
+            elif op == POW_CONST:
+                a = args[0]
+                dots[i] = const * vals[a]**(const - 1) * dots[a]
+            elif op == POW:
+                a, b = args
+                dots[i] = vals[i] * (dots[b] * np.log(vals[a]) + vals[b] * dots[a] / vals[a])
+            else:
+                a = args[0]
+                dots[i] = UNARY_FUNCTIONS[op][1](vals[a]) * dots[a]
+
+        return vals, dots
+
+    def __reverse(self, shape: Tuple[int, ...], dtype: np.dtype, vals: List[Any],
+                  dots: Optional[List[Any]] = None) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        '''
+        Reverse sweep. If the forward tangents are given, the tangents
+        of the adjoints are propagated as well
+
+        Parameters
+        ----------
+        shape : Tuple[int, ...]
+            Shape of the batch of points
+        dtype : np.dtype
+            Floating point type of the points
+        vals : List[Any]
+            Values of the nodes
+        dots : Optional[List[Any]]
+            Tangents of the nodes
+
+        Returns
+        -------
+        Tuple[np.ndarray, Optional[np.ndarray]]
+            Gradient and, if the tangents are given, the Hessian-vector product
+        '''
+
+        n = len(self.nodes)
+        adjs: List[Any] = [None] * n
+        adj_dots: List[Any] = [None] * n
+
+        adjs[self.root] = np.ones(shape, dtype=dtype)
+        adj_dots[self.root] = np.zeros(shape, dtype=dtype)
+
+        def accumulate(i: int, adj: Any, adj_dot: Any) -> None:
+            if self.nodes[i][0] == CONST:
+                return
+            adjs[i] = adj if adjs[i] is None else adjs[i] + adj
+            if dots is not None:
+                adj_dots[i] = adj_dot if adj_dots[i] is None else adj_dots[i] + adj_dot
+
+        grad = np.zeros((len(VARIABLES), *shape), dtype=dtype)
+        grad_dot = np.zeros((len(VARIABLES), *shape), dtype=dtype)
+
+        for i in range(n - 1, -1, -1):
+            adj = adjs[i]
+            if adj is None:
+                continue
+
+            adj_dot = adj_dots[i]
+            op, args, const = self.nodes[i]
+
+            if op == CONST:
+                continue
+
+            if op == VAR:
+                grad[const] += adj
+                if dots is not None:
+                    grad_dot[const] += adj_dot
+                continue
+
+            if op == ADD:
+                for a in args:
+                    accumulate(a, adj, adj_dot)
+                continue
+
+            '''
+            for each argument, the local partial derivative and, in the
+            forward-over-reverse mode, its tangent along the direction are computed
+            '''
+            partials: List[Tuple[int, Any]] = []
+            partial_dots: List[Any] = []
+
+            if op == MUL:
+                a, b = args
+                partials = [(a, vals[b]), (b, vals[a])]
+                if dots is not None:
+                    partial_dots = [dots[b], dots[a]]
+            elif op == POW_CONST:
+                a = args[0]
+                partials = [(a, const * vals[a]**(const - 1))]
+                if dots is not None:
+                    partial_dots = [const * (const - 1) * vals[a]**(const - 2) * dots[a]]
+            elif op == POW:
+                a, b = args
+                va, vb = vals[a], vals[b]
+                d_a = vb * va**(vb - 1)
+                d_b = vals[i] * np.log(va)
+                partials = [(a, d_a), (b, d_b)]
+                if dots is not None:
+                    partial_dots = [dots[b] * va**(vb - 1) + d_a * (dots[b] * np.log(va) + (vb - 1) * dots[a] / va),
+                                    dots[i] * np.log(va) + vals[i] * dots[a] / va]
+            else:
+                a = args[0]
+                _, df, d2f = UNARY_FUNCTIONS[op]
+                partials = [(a, df(vals[a]))]
+                if dots is not None:
+                    partial_dots = [d2f(vals[a]) * dots[a]]
+
+            for k, (a, d) in enumerate(partials):
+                if dots is None:
+                    accumulate(a, adj * d, None)
+                else:
+                    accumulate(a, adj * d, adj_dot * d + adj * partial_dots[k])
+
+        return grad, (grad_dot if dots is not None else None)
+
+    def value(self, point: np.ndarray) -> Any:
+        '''
+        Evaluates the expression
+
+        Parameters
+        ----------
+        point : np.ndarray
+            A point of shape (2,) or a batch of points of shape (2, ...)
+
+        Returns
+        -------
+        Any
+            Value (or values) of the expression
+        '''
+
+        vals, _ = self.__forward(point)
+        value = np.broadcast_to(np.asarray(vals[self.root], dtype=floating_dtype(point)), np.shape(point[0]))
+
+        return float(value) if not value.shape else value
+
+    def value_and_grad(self, point: np.ndarray) -> Tuple[Any, np.ndarray]:
+        '''
+        Evaluates the expression and its gradient in the reverse mode.
+        Has the same semantics as the kernel, built by toolbar_utils.build_value_and_grad
+
+        Parameters
+        ----------
+        point : np.ndarray
+            A point of shape (2,) or a batch of points of shape (2, ...)
+
+        Returns
+        -------
+        Tuple[Any, np.ndarray]
+            Value (or values) of the expression and the gradient
+            of shape (2,) (or (2, ...))
+        '''
+
+        shape = np.shape(point[0])
+        dtype = floating_dtype(point)
+        vals, _ = self.__forward(point)
+        grad, _ = self.__reverse(shape, dtype, vals)
+
+        value = np.broadcast_to(np.asarray(vals[self.root], dtype=dtype), shape)
+
+        if not shape:
+            return float(value), grad
+
+        return value, grad
+
+    def hvp(self, point: np.ndarray, direction: np.ndarray) -> np.ndarray:
+        '''
+        Computes the Hessian-vector product in the forward-over-reverse mode
+
+        Parameters
+        ----------
+        point : np.ndarray
+            A point of shape (2,) or a batch of points of shape (2, ...)
+        direction : np.ndarray
+            The vector of shape (2,) (or (2, ...)) to multiply the Hessian by
+
+        Returns
+        -------
+        np.ndarray
+            Hessian-vector product of shape (2,) (or (2, ...))
+        '''
+
+        shape = np.shape(point[0])
+        dtype = floating_dtype(point)
+        vals, dots = self.__forward(point, np.asarray(direction, dtype=dtype))
+        _, grad_dot = self.__reverse(shape, dtype, vals, dots)
+
+        assert grad_dot is not None
+
+        return grad_dot
@@ -0,0 +1,282 @@
+import numpy as np
+from numpy.typing import DTypeLike
+
+from typing import Tuple, Callable, Optional, Any
+
+from concurrent.futures import Executor, Future
+
+from threading import Lock
+
+from pathlib import Path
+
+from .utils import get_logger, trace_span
+from .termination import Status, CURVATURE_COEF
+
+
+logger = get_logger(Path(__file__).name)
+
+
+BASIN_MAX_ITER = 200  # iteration budget of each start, the rest is reported as not converged
+BASIN_BLOCK_ROWS = 5  # number of grid rows, solved at once, so that the layer is filled progressively
+MERGE_COEF = 1e-2  # endpoints closer than MERGE_COEF * (size of the grid) are the same minimum
+
+'''
+status of the grid points, that are not solved yet
+'''
+PENDING = 0
+
+BatchValueAndGrad = Callable[[np.ndarray], Tuple[Any, np.ndarray]]
+
+
+def batch_bfgs(value_and_grad: BatchValueAndGrad, starts: np.ndarray, epsilon: float,
+               alpha: float = 1.0, max_iter: int = BASIN_MAX_ITER) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    '''
+    Runs BFGS from many initial approximations in lockstep: each iteration makes
+    a single call to the batched kernel for all of the runs, that are still active.
+    The two-dimensional approximations of the inverse hessian are kept as three arrays
+    of their entries, so the update is vectorized over the runs. The stopping criteria
+    and the curvature reset are the same, as in optimizers.optimize
+
+    Parameters
+    ----------
+    value_and_grad : BatchValueAndGrad
+        Batched kernel, accepting points of shape (2, n)
+    starts : np.ndarray
+        Initial approximations, shape (2, n)
+    epsilon : float
+        Desired precision
+    alpha : float
+        Step of the method
+    max_iter : int
+        Maximal number of iterations of each run
+
+    Returns
+    -------
+    Tuple[np.ndarray, np.ndarray, np.ndarray]
+        Last points of the runs (shape (2, n)), numbers of iterations
+        and termination statuses (values of Status)
+    '''
+
+    logger.debug(f'Solving {starts.shape[1]} starts in lockstep')
+
+    n = starts.shape[1]
+
+    x = np.array(starts, dtype=float)
+    n_iter = np.zeros(n, dtype=int)
+    status = np.full(n, Status.MAX_ITER.value)
+
+    with np.errstate(all='ignore'), trace_span(logger, 'batch_bfgs', n_starts=n):
+        _, grad = value_and_grad(x)
+        grad = np.array(grad, dtype=float).reshape(2, n)
+
+        '''
+        entries of the symmetric inverse hessian approximations
+        '''
+        h_xx, h_xy, h_yy = np.ones(n), np.zeros(n), np.ones(n)
+
+        finite = np.all(np.isfinite(grad), axis=0)
+        converged = finite & (np.hypot(*grad) < epsilon)
+        status[~finite] = Status.NOT_FINITE.value
+        status[converged] = Status.CONVERGED.value
+
+        active = np.flatnonzero(finite & ~converged)
+
+        for _ in range(max_iter):
+            if active.size == 0:
+                break
+
+            g = grad[:, active]
+            s = -alpha * np.stack([h_xx[active] * g[0] + h_xy[active] * g[1],
+                                   h_xy[active] * g[0] + h_yy[active] * g[1]])
+            x_new = x[:, active] + s
+
+            _, g_new = value_and_grad(x_new)
+            g_new = np.array(g_new, dtype=float).reshape(2, active.size)
+
+            '''
+            a non-finite point is not accepted, so the run ends at the last finite point
+            '''
+            ok = np.all(np.isfinite(x_new), axis=0) & np.all(np.isfinite(g_new), axis=0)
+            status[active[~ok]] = Status.NOT_FINITE.value
+
+            active, s, g, g_new = active[ok], s[:, ok], g[:, ok], g_new[:, ok]
+            x[:, active] += s
+            grad[:, active] = g_new
+            n_iter[active] += 1
+
+            '''
+            H_inv = (I - rho s d^T) H_inv (I - rho d s^T) + rho s s^T,
+            reset to the identity on a curvature failure
+            '''
+            d = g_new - g
+            curvature = np.sum(d * s, axis=0)
+            curvature_ok = curvature > CURVATURE_COEF * np.hypot(*s) * np.hypot(*d)
+            rho = np.where(curvature_ok, 1 / np.where(curvature_ok, curvature, 1), 0)
+
+            xx, xy, yy = h_xx[active], h_xy[active], h_yy[active]
+            hd_x = xx * d[0] + xy * d[1]
+            hd_y = xy * d[0] + yy * d[1]
+            scale = rho * (1 + rho * (d[0] * hd_x + d[1] * hd_y))
+
+            xx = xx + scale * s[0] * s[0] - rho * 2 * s[0] * hd_x
+            xy = xy + scale * s[0] * s[1] - rho * (s[0] * hd_y + s[1] * hd_x)
+            yy = yy + scale * s[1] * s[1] - rho * 2 * s[1] * hd_y
+
+            reset = ~curvature_ok | ~(np.isfinite(xx) & np.isfinite(xy) & np.isfinite(yy))
+            h_xx[active] = np.where(reset, 1.0, xx)
+            h_xy[active] = np.where(reset, 0.0, xy)
+            h_yy[active] = np.where(reset, 1.0, yy)
+
+            converged = np.hypot(*g_new) < epsilon
+            status[active[converged]] = Status.CONVERGED.value
+            active = active[~converged]
+
+    return x, n_iter, status
+
+
+class BasinMap:
+    '''
+    Basins of attraction and convergence speed of BFGS on a grid of initial approximations.
+    The grid is solved by blocks of rows, so that the map can be shown, while it is being filled.
+
+    The endpoints of the converged runs are merged into minima incrementally: an endpoint
+    is assigned to the first known minimum within the merge distance, or becomes a new minimum,
+    so the labels of the solved blocks do not change, when new blocks are solved.
+
+    The blocks may be solved by a background executor (see submit), while the solved part is read
+    '''
+
+    def __init__(self, value_and_grad: BatchValueAndGrad, x_lims: Tuple[float, float], y_lims: Tuple[float, float],
+                 epsilon: float, shape: Tuple[int, int], block_rows: int = BASIN_BLOCK_ROWS,
+                 max_iter: int = BASIN_MAX_ITER, dtype: DTypeLike = np.float64) -> None:
+        self.value_and_grad = value_and_grad
+        self.epsilon = epsilon
+        self.block_rows = block_rows
+        self.max_iter = max_iter
+
+        '''
+        the grid is stored in the given type, while the runs are made in float64
+        '''
+        self.X, self.Y = np.meshgrid(np.linspace(*x_lims, shape[1], dtype=dtype),
+                                     np.linspace(*y_lims, shape[0], dtype=dtype))
+        self.merge_distance = MERGE_COEF * np.hypot(x_lims[1] - x_lims[0], y_lims[1] - y_lims[0])
+
+        self.n_iter = np.zeros(shape, dtype=np.int32)
+        self.status = np.full(shape, PENDING, dtype=np.int8)
+        self.labels = np.full(shape, -1, dtype=np.int32)
+        self.minima = np.empty((0, 2))
+
+        self.next_row = 0  # first row, that is not solved yet
+
+        '''
+        the lock guards the results, the runs of a block are made without holding it
+        '''
+        self.__lock = Lock()
+        self.__pending = False  # whether a block is scheduled on an executor
+
+    @property
+    def done(self) -> bool:
+        return self.next_row >= self.X.shape[0]
+
+    def compute_block(self) -> None:
+        '''
+        Solves the next block of rows of the grid
+        '''
+
+        if self.done:
+            return
+
+        rows = slice(self.next_row, min(self.next_row + self.block_rows, self.X.shape[0]))
+        logger.debug(f'Computing basins of rows {rows.start}-{rows.stop}')
+
+        starts = np.stack([self.X[rows].ravel(), self.Y[rows].ravel()])
+        x, n_iter, status = batch_bfgs(self.value_and_grad, starts, self.epsilon, max_iter=self.max_iter)
+
+        shape = self.X[rows].shape
+        with self.__lock:
+            self.n_iter[rows] = n_iter.reshape(shape)
+            self.status[rows] = status.reshape(shape)
+            self.labels[rows] = self.__assign_minima(x, status == Status.CONVERGED.value).reshape(shape)
+
+            self.next_row = rows.stop
+
+    def submit(self, executor: Executor, callback: Optional[Callable[[], None]] = None) -> Optional[Future]:
+        '''
+        Schedules solving of the next block on a background executor.
+        At most one block of the map is scheduled at a time
+
+        Parameters
+        ----------
+        executor : Executor
+            Executor to run the computation on
+        callback : Optional[Callable[[], None]]
+            Function, called from the worker after the block is solved
+
+        Returns
+        -------
+        Optional[Future]
+            Future of the computation or None, if the map is done or a block is already scheduled
+        '''
+
+        with self.__lock:
+            if self.done or self.__pending:
+                return None
+            self.__pending = True
+
+        def job() -> None:
+            try:
+                self.compute_block()
+            finally:
+                with self.__lock:
+                    self.__pending = False
+            if callback is not None:
+                callback()
+
+        return executor.submit(job)
+
+    def compute_all(self) -> None:
+        while not self.done:
+            self.compute_block()
+
+    def basins(self) -> np.ndarray:
+        '''
+        Returns
+        -------
+        np.ndarray
+            Index of the minimum, each grid point converges to,
+            NaN for the unsolved and not converged points
+        '''
+        with self.__lock:
+            return np.where(self.labels >= 0, self.labels, np.nan).astype(self.X.dtype)
+
+    def iterations(self) -> np.ndarray:
+        '''
+        Returns
+        -------
+        np.ndarray
+            Number of iterations, needed to converge from each grid point,
+            NaN for the unsolved and not converged points
+        '''
+        with self.__lock:
+            return np.where(self.status == Status.CONVERGED.value, self.n_iter, np.nan).astype(self.X.dtype)
+
+    def __assign_minima(self, x: np.ndarray, converged: np.ndarray) -> np.ndarray:
+        labels = np.full(x.shape[1], -1)
+
+        unassigned = np.flatnonzero(converged)
+        for label, minimum in enumerate(self.minima):
+            close = np.hypot(*(x[:, unassigned] - minimum[:, None])) <= self.merge_distance
+            labels[unassigned[close]] = label
+            unassigned = unassigned[~close]
+
+        '''
+        there are a few minima, so the loops are over the minima, and the points are vectorized
+        '''
+        while unassigned.size:
+            minimum = x[:, unassigned[0]]
+            close = np.hypot(*(x[:, unassigned] - minimum[:, None])) <= self.merge_distance
+            labels[unassigned[close]] = len(self.minima)
+            self.minima = np.vstack([self.minima, minimum])
+            unassigned = unassigned[~close]
+
+        return labels
@@ -1,153 +1,41 @@
 import numpy as np
+from numpy.typing import DTypeLike
 
-from typing import Dict, Callable, Any, List, Tuple
+from typing import Dict, Callable, Any, Tuple, Optional
 
-from .utils import CountCalls
+from .optimizers import optimize, make_value_and_grad, recalc_hess_inv  # noqa: F401
 
 
-def __make_result_dict(*, x: np.ndarray,
-                       n_iter: int,
-                       n_grad_calls: int,
-                       success: bool) -> Dict['str', Any]:
+def bfgs(grad_f: Optional[Callable[[np.ndarray], np.ndarray]],
+         x_0: np.ndarray, epsilon: float, alpha: float = 1,
+         value_and_grad: Optional[Callable[[np.ndarray], Tuple[float, np.ndarray]]] = None,
+         history_dtype: DTypeLike = np.float64) -> Tuple[Dict['str', Any], np.ndarray]:
     '''
-    Utility function, used to ensure that all
-    of the expected results are included into the
-    result dictionary
-
-    Parameters
-    ----------
-    x : np.ndarray
-        Solution
-    n_iter : int
-        Number of iterations
-    n_grad_calls : int
-        Number of gradient calls
-    success : bool
-        Whether the method converged successfully
-        
-    Returns
-    -------
-    Dict['str', Any]
-        Result dictionary
-    '''
-    return dict(x=x, n_iter=n_iter,
-                n_grad_calls=n_grad_calls,
-                success=success)
-
-
-def recalc_hess_inv(H: np.ndarray, s: np.ndarray, y: np.ndarray) -> np.ndarray:
-    '''
-    Computes new approximation of the inverse of hessian.
-    The notation the same as here https://ru.wikipedia.org/wiki/Алгоритм_Бройдена_—_Флетчера_—_Гольдфарба_—_Шанно
-
-    Parameters
-    ----------
-    H : numpy.ndarray
-        Current approximation
-    s: numpy.ndarray
-        x_k+1 - x_k
-    y: numpy.ndarray
-        grad(x_k+1) - grad(x_k)
-        
-    '''
-    
-    rho = 1 / y.T.dot(s)
-    eye = np.eye(H.shape[0])
-    return (eye - rho * s.dot(y.T)).dot(H).dot(eye - rho * y.dot(s.T)) + rho * s.dot(s.T)
-
-
-def __optimize(grad_f: Callable[[np.ndarray], np.ndarray],
-               x_0: np.ndarray, epsilon: float, alpha: float) -> List[np.ndarray]:
-    '''
-    Computes new approximation of the inverse of hessian.
-    The notation the same as here https://ru.wikipedia.org/wiki/Алгоритм_Бройдена_—_Флетчера_—_Гольдфарба_—_Шанно
-
-    Parameters
-    ----------
-    grad_f: Callable[[numpy.ndarray], numpy.ndarray]
-        Objective function gradient
-    x_0 : np.ndarray
-        Initial approximation
-    epsilon : float
-        Desired precision
-    alpha : float
-        Step of the alogirithm
-
-    Returns
-    -------
-    List[numpy.ndarray]
-        History
-        
-    '''
-    
-    history = []
-
-    H_inv = np.eye(len(x_0))
-
-    grad_value = np.array(grad_f(x_0))
-    
-    x = x_0
-    
-    n_iter = 0
-    
-    while True:
-        history.append(x)
-
-        p = H_inv.dot(grad_value)
-        
-        x_prev = x
-        x = x - alpha * p
-        
-        if np.linalg.norm(grad_value) < epsilon:
-            return history
-
-        grad_prev = grad_value
-        grad_value = np.array(grad_f(x))
-        
-        s = (x - x_prev).reshape(-1, 1)
-        y = (grad_value - grad_prev).reshape(-1, 1)
-        H_inv = recalc_hess_inv(H_inv, s, y)
-        
-        n_iter += 1
-
-
-def bfgs(grad_f: Callable[[np.ndarray], np.ndarray],
-         x_0: np.ndarray, epsilon: float, alpha: float = 1) -> Tuple[Dict['str', Any],
-                                                                     np.ndarray]:
-    '''
-    Computes new approximation of the inverse of hessian.
+    Minimizes the objective function with BFGS method.
     The notation the same as here https://ru.wikipedia.org/wiki/Алгоритм_Бройдена_—_Флетчера_—_Гольдфарба_—_Шанно
 
     Parameters
     ----------
-    grad_f: Callable[[numpy.ndarray], numpy.ndarray]
-        Objective function gradient
+    grad_f: Optional[Callable[[numpy.ndarray], numpy.ndarray]]
+        Objective function gradient. May be None, if value_and_grad is given
     x_0 : np.ndarray
         Initial approximation
     epsilon : float
         Desired precision
     alpha : float
         Step of the algirithm
+    value_and_grad: Optional[Callable[[numpy.ndarray], Tuple[float, numpy.ndarray]]]
+        Fused kernel, returning the value and the gradient of the objective function.
+        If given, it is used instead of grad_f
+    history_dtype : DTypeLike
+        Type of the stored history. The iterations are made in float64 anyway
 
     Returns
     -------
     Tuple[Dict['str', Any], numpyp.ndarray]
         Tuple of the result dictionary and the history
-        
+
     '''
-    
-    @CountCalls
-    def grad_f_wrapper(x: Any) -> Any:
-        return grad_f(x)
-    
-    history_list = __optimize(grad_f_wrapper, np.array(x_0), epsilon, alpha)
-    history = np.array(history_list)
-        
-    result_dict = __make_result_dict(
-        x=history[-1],
-        n_iter=len(history) - 1,
-        n_grad_calls=grad_f_wrapper.n_calls,
-        success=True
-    )
 
-    return result_dict, history
+    return optimize('bfgs', make_value_and_grad(grad_f, value_and_grad), x_0, epsilon, alpha,
+                    history_dtype=history_dtype)
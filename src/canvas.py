@@ -1,144 +1,348 @@
-from PyQt5.QtWidgets import QWidget, QGridLayout
+from PyQt5.QtWidgets import QWidget, QGridLayout, QTableWidget, QTableWidgetItem
+
+from PyQt5.QtCore import QTimer, pyqtSignal
 
 from matplotlib.backends.backend_qt5agg \
-    import FigureCanvasQTAgg as FigureCanvas
+    import FigureCanvasQTAgg as FigureCanvas, NavigationToolbar2QT as NavigationToolbar
 import matplotlib.pyplot as plt
-from matplotlib.colors import LogNorm
+from matplotlib.colors import ListedColormap
+
+from typing import Tuple, Callable, Optional, List, Dict, Any
+
+from numpy.typing import DTypeLike
 
-from typing import Tuple, Callable, Optional
+from collections import OrderedDict
 
 from pathlib import Path
 
+from concurrent.futures import ThreadPoolExecutor, Future
+
 import numpy as np
 
-from .utils import get_logger
+from .utils import get_logger, trace_span
+from .toolbar_utils import ValueAndGrad
+from .tiles import TileCache
+from .basins import BasinMap
+from .precision import get_policy, DOUBLE_PRECISION
+from .termination import get_status_message
+from .levels import GridLevels, LEVEL_SCALES, DEFAULT_LEVEL_SCALE
+from .export import save_history, save_surface, save_figure, SURFACE_FILE, HISTORY_FILE_PATTERN, FIGURE_FILE
+from .plotting import compute_limits, plot_quiver, plot_gradient, plot_contour, Limits, \
+    NUM_X_TICKS, NUM_Y_TICKS, LAYER_ZORDER, DEFAULT_MARGIN_COEF, DEFAULT_NUM_LEVELS
 
 
 logger = get_logger(Path(__file__).name)
 
-NUM_X_TICKS = 50
-NUM_Y_TICKS = 50
+DEFAULT_TITLE = 'BFGS'
+
+Surface = Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]
+
+RUN_COLORS = plt.cm.tab10.colors  # type: ignore
+RUNS_TABLE_COLUMNS = ('method', 'iterations', 'gradient calls', 'time, ms', 'status')
+RUNS_TABLE_MAX_HEIGHT = 150
+
+REDRAW_DELAY_MS = 100  # delay of repainting the surface after panning or zooming
+
+'''
+background layers: the minimum, BFGS converges to from each grid point,
+or the number of iterations it needs
+'''
+BASINS_LAYER = 'basins'
+ITERATIONS_LAYER = 'iterations'
+LAYERS = (BASINS_LAYER, ITERATIONS_LAYER)
+LAYER_ALPHA = 0.4
+BASIN_CACHE_CAPACITY = 8  # number of viewports, whose basin maps are kept
+BASINS_CMAP = ListedColormap(RUN_COLORS)
+
+
+def stop_executor(executor: ThreadPoolExecutor, futures: List[Future]) -> None:
+    '''
+    Cancels the computations, that have not started yet, and waits for the running ones.
+    The futures are cancelled one by one, since shutdown cancels them only from python 3.9
+    '''
 
-GRADIENT_ZORDER = 1
-CONTOUR_ZORDER = 2
-HISTORY_ZORDER = 5
-INIT_APPROX_ZORDER = 6
+    for future in futures:
+        future.cancel()
+    futures.clear()
 
-DEFAULT_MARGIN_COEF = 0.05
-DEFAULT_NUM_LEVELS = 10
+    executor.shutdown(wait=True)
+
+
+class Run:
+    '''
+    A trajectory, shown in the comparison mode, with the statistics of the run
+    '''
+
+    def __init__(self, history: np.ndarray, title: str, result: Dict['str', Any]) -> None:
+        self.history = history
+        self.title = title
+        self.result = result
+
+    def table_row(self) -> Tuple[str, ...]:
+        '''
+        Returns
+        -------
+        Tuple[str, ...]
+            Cells of the row of the runs table, see RUNS_TABLE_COLUMNS
+        '''
+        return (self.title,
+                str(self.result['n_iter']),
+                str(self.result['n_grad_calls']),
+                f'{1e3 * self.result["time"]:.2f}',
+                get_status_message(self.result['status']))
 
 
 class Canvas(QWidget):
 
-    def __init__(self) -> None:
+    '''
+    emitted by the background workers, when the requested tiles or a block of the basin map are computed
+    '''
+    tiles_ready = pyqtSignal()
+    layer_ready = pyqtSignal()
+
+    def __init__(self, background_tiles: bool = False, precision: str = DOUBLE_PRECISION) -> None:
         logger.debug('Creating Canvas object')
         
         super().__init__()
 
+        '''
+        the evaluated grids and the stored histories use the storage type of the policy
+        '''
+        self.policy = get_policy(precision)
+
         self.margin_coef = DEFAULT_MARGIN_COEF  # coeffitient, used to determine the limits of axes
         self.num_levels = DEFAULT_NUM_LEVELS  # number of contour lines
+        self.level_scale = DEFAULT_LEVEL_SCALE  # scale of the contour levels
+        self.title = DEFAULT_TITLE  # name of the method
         
         self.fig, self.ax = plt.subplots(1, 1)
         self.canvas = FigureCanvas(self.fig)
         
         self.history = np.array([])
+        self.result: Optional[Dict['str', Any]] = None  # result dictionary of the run, that produced the history
         
         self.function: Optional[Callable[[np.ndarray], float]] = None
         self.gradient: Optional[Callable[[np.ndarray], np.ndarray]] = None
+        self.value_and_grad: Optional[ValueAndGrad] = None
+
+        '''
+        the evaluated surface is cached, so that repainting the same
+        area (e.g. after changing the number of levels) does not evaluate it again
+        '''
+        self.surface_cache: Optional[Tuple[Limits, Surface]] = None
+
+        '''
+        the shown surface and the level selection of its grid are kept, so that changing
+        the number of levels or their scale only draws the contour lines again
+        '''
+        self.shown_surface: Optional[Surface] = None
+        self.levels_cache: Optional[Tuple[Any, GridLevels]] = None
+        self.contour_artist: Optional[Any] = None
+
+        '''
+        if the fused kernel is available, the surface is evaluated by tiles, so that
+        panning and zooming only evaluates the newly exposed parts of the plane.
+        The tiles may be computed by a background worker, while the available ones are shown
+        '''
+        self.tile_cache: Optional[TileCache] = None
+        self.tile_executor = ThreadPoolExecutor(max_workers=1) if background_tiles else None
+        self.tile_futures: List[Future] = []  # submitted computations, cancelled on shutdown
+        self.tiles_ready.connect(self.redraw_surface)  # type:ignore[attr-defined]
+
+        self.surface_artists: List[Any] = []
+        self.updating_axes = False
+
+        '''
+        the basin maps are cached per viewport (the cache is reset with the function)
+        and solved by blocks on a background worker, so the layer is filled progressively
+        without blocking the GUI
+        '''
+        self.layer: Optional[str] = None
+        self.layer_epsilon = 0.0
+        self.basin_maps: 'OrderedDict[Tuple[Limits, float], BasinMap]' = OrderedDict()
+        self.basin_map: Optional[BasinMap] = None  # map of the current viewport
+        self.layer_artists: List[Any] = []
+
+        self.layer_executor = ThreadPoolExecutor(max_workers=1)
+        self.layer_futures: List[Future] = []  # submitted blocks, cancelled on shutdown
+        self.layer_ready.connect(self.layer_block_ready)  # type:ignore[attr-defined]
+
+        self.redraw_timer = QTimer(self)
+        self.redraw_timer.setSingleShot(True)
+        self.redraw_timer.setInterval(REDRAW_DELAY_MS)
+        self.redraw_timer.timeout.connect(self.redraw_surface)  # type:ignore[attr-defined]
+
+        '''
+        in the comparison mode, several trajectories are drawn on one background
+        '''
+        self.comparison_mode = False
+        self.runs: List[Run] = []
+
+        self.tbl_runs = QTableWidget(0, len(RUNS_TABLE_COLUMNS))
+        self.tbl_runs.setHorizontalHeaderLabels(RUNS_TABLE_COLUMNS)
+        self.tbl_runs.setMaximumHeight(RUNS_TABLE_MAX_HEIGHT)
+        self.tbl_runs.setVisible(False)
+
+        self.navigation_toolbar = NavigationToolbar(self.canvas, self)
 
         layout = QGridLayout()
+        layout.addWidget(self.navigation_toolbar)
         layout.addWidget(self.canvas)
+        layout.addWidget(self.tbl_runs)
 
         self.setLayout(layout)
 
-    def compute_limits(self) -> Tuple[Tuple[float, float], Tuple[float, float]]:
+    def compute_limits(self) -> Limits:
         '''
-        Computes axes limits as
-        min - margin_coef * (max - min), max + margin_coef * (max - min)
-        along each axis, where min and max values are taken from current history
+        Computes axes limits, covering the visible histories, so in the comparison mode
+        the limits cover the union of the bounding boxes of all of the trajectories
+        (see plotting.compute_limits)
 
         Returns
         -------
         Tuple[Tuple[float, float], Tuple[float, float]]
             x and y axes limits respectively
         '''
-        
-        logger.debug('Computing limits')
 
-        assert self.history is not None
-        
-        min_x, min_y = self.history[0]
-        max_x, max_y = self.history[0]
-
-        for x, y in self.history[1:]:
-            if x < min_x:
-                min_x = x
-            elif x > max_x:
-                max_x = x
-            if y < min_y:
-                min_y = y
-            elif y > max_y:
-                max_y = y
-
-        w, h = max_x - min_x, max_y - min_y
-        c = self.margin_coef
-        
-        x_lims = min_x - c * w, max_x + c * w
-        y_lims = min_y - c * h, max_y + c * h
+        return compute_limits(self.visible_histories(), self.margin_coef)
+
+    def visible_histories(self) -> List[np.ndarray]:
+        '''
+        Returns
+        -------
+        List[np.ndarray]
+            Histories of all of the runs in the comparison mode,
+            otherwise the current history only
+        '''
+
+        if self.comparison_mode:
+            return [run.history for run in self.runs]
 
-        return x_lims, y_lims
+        return [self.history]
 
-    def plot_quiver(self) -> None:
+    def plot_quiver(self, history: Optional[np.ndarray] = None,
+                    color: Any = 'black', label: Optional[str] = None) -> None:
         '''
-        Plots current history as a sequence of arrows
+        Plots a history as a sequence of arrows
+
+        Parameters
+        ----------
+        history : Optional[np.ndarray]
+            History to plot. If None, the current history is plotted
+        color : Any
+            Color of the arrows
+        label : Optional[str]
+            Legend label of the trajectory
         '''
-        
-        logger.debug('Plotting quiver')
-        
-        # The x and y coordinates of the arrow locations
-        x, y = self.history[:-1, 0], self.history[:-1, 1]
-        # The x and y direction components of the arrow vectors
-        u = self.history[1:, 0] - self.history[:-1, 0],
-        v = self.history[1:, 1] - self.history[:-1, 1]
 
-        self.ax.quiver(x, y, u, v, scale_units='xy',
-                       angles='xy', scale=1, zorder=HISTORY_ZORDER)
+        if history is None:
+            history = self.history
 
-        self.ax.scatter(x[0], y[0], zorder=INIT_APPROX_ZORDER)
+        plot_quiver(self.ax, history, color, label)
 
-    def plot_gradient(self, X: np.ndarray, Y: np.ndarray) -> None:
+    def evaluate_surface(self, X: np.ndarray, Y: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
         '''
-        Plots gradient field as a field of arrows on a given meshgrid
+        Evaluates the objective function and its gradient on a given meshgrid.
+        If the fused kernel is available, the whole grid is evaluated in one batched call,
+        otherwise the function and the gradient are evaluated point by point
 
         Parameters
         ----------
         X : np.ndarray
-            x values of the arrow grid
+            x values of the grid
         Y : np.ndarray
-            y values of the arrow grid
+            y values of the grid
+
+        Returns
+        -------
+        Tuple[np.ndarray, np.ndarray, np.ndarray]
+            Function values and x and y components of the gradient
         '''
 
-        logger.debug('Plotting gradient')
+        logger.debug('Evaluating surface')
 
+        if self.value_and_grad is not None:
+            Z, (grad_X, grad_Y) = self.value_and_grad(np.stack([X, Y]))
+            return Z, grad_X, grad_Y
+
+        assert self.function is not None
         assert self.gradient is not None
-        
+
+        Z = np.empty_like(X)
         grad_X = np.empty_like(X)
         grad_Y = np.empty_like(X)
 
         for row_n in range(X.shape[0]):
             for col_n in range(X.shape[1]):
                 point = np.array([X[row_n][col_n], Y[row_n][col_n]])
-                grad_x, grad_y = self.gradient(point)
-                
-                grad_norm = (grad_x**2 + grad_y**2)**0.5
-                
-                grad_X[row_n][col_n] = grad_x / grad_norm
-                grad_Y[row_n][col_n] = grad_y / grad_norm
+                Z[row_n][col_n] = self.function(point)
+                grad_X[row_n][col_n], grad_Y[row_n][col_n] = self.gradient(point)
+
+        return Z, grad_X, grad_Y
+
+    def get_surface(self, x_lims: Tuple[float, float], y_lims: Tuple[float, float]) -> Surface:
+        '''
+        Returns the meshgrid and the surface, evaluated on it. If the fused kernel
+        is available, the surface is assembled from the tiles, otherwise
+        the cached surface is used if the limits have not changed
 
-        self.ax.quiver(X, Y, grad_X, grad_Y, scale=50, width=3e-3,
-                       color='gray', alpha=0.5, zorder=GRADIENT_ZORDER)
+        Parameters
+        ----------
+        x_lims : Tuple[float, float]
+            x axis limits
+        y_lims : Tuple[float, float]
+            y axis limits
 
-    def plot_contour(self, X: np.ndarray, Y: np.ndarray) -> None:
+        Returns
+        -------
+        Surface
+            x and y values of the grid, function values and x and y components of the gradient
+        '''
+
+        if self.tile_cache is not None:
+            if self.tile_executor is None:
+                return self.tile_cache.get_region(x_lims, y_lims)
+
+            keys = self.tile_cache.tile_keys(x_lims, y_lims)
+            future = self.tile_cache.submit(keys, self.tile_executor, self.tiles_ready.emit)  # type:ignore[attr-defined]
+            self.tile_futures = [f for f in self.tile_futures if not f.done()] + ([future] if future else [])
+            return self.tile_cache.get_region(x_lims, y_lims, compute_missing=False)
+
+        limits = (tuple(x_lims), tuple(y_lims))
+
+        if self.surface_cache is not None and self.surface_cache[0] == limits:
+            logger.debug('Using cached surface')
+            return self.surface_cache[1]
+
+        xs = np.linspace(*x_lims, NUM_X_TICKS, dtype=self.policy.storage)
+        ys = np.linspace(*y_lims, NUM_Y_TICKS, dtype=self.policy.storage)
+        X, Y = np.meshgrid(xs, ys)
+
+        surface = (X, Y, *self.evaluate_surface(X, Y))
+        self.surface_cache = (limits, surface)  # type: ignore
+
+        return surface
+
+    def plot_gradient(self, X: np.ndarray, Y: np.ndarray,
+                      grad_X: np.ndarray, grad_Y: np.ndarray) -> None:
+        '''
+        Plots gradient field as a field of arrows on a given meshgrid
+
+        Parameters
+        ----------
+        X : np.ndarray
+            x values of the arrow grid
+        Y : np.ndarray
+            y values of the arrow grid
+        grad_X : np.ndarray
+            x components of the gradient on the grid
+        grad_Y : np.ndarray
+            y components of the gradient on the grid
+        '''
+
+        self.surface_artists.append(plot_gradient(self.ax, X, Y, grad_X, grad_Y))
+
+    def plot_contour(self, X: np.ndarray, Y: np.ndarray, Z: np.ndarray) -> None:
         '''
         Plots contour lines of the objective function using a given meshgrid
 
@@ -148,31 +352,101 @@ class Canvas(QWidget):
             x values of the grid
         Y : np.ndarray
             y values of the grid
+        Z : np.ndarray
+            Function values on the grid
         '''
-        
-        logger.debug('Plotting contour')
 
-        assert self.function is not None
+        self.contour_artist = plot_contour(self.ax, X, Y, Z, self.num_levels, self.level_scale, self.get_grid_levels(Z))
+        if self.contour_artist is not None:
+            self.surface_artists.append(self.contour_artist)
 
-        Z = np.empty_like(X)
+    def get_grid_levels(self, Z: np.ndarray) -> GridLevels:
+        '''
+        Returns the level selection of the shown grid. It is computed once per grid,
+        which is identified by the viewport and, if the surface is tiled,
+        by the number of the evaluated tiles (the missing tiles are filled later)
 
-        max_Z = None
+        Parameters
+        ----------
+        Z : np.ndarray
+            Function values on the shown grid
 
-        for row_n in range(X.shape[0]):
-            for col_n in range(X.shape[1]):
-                point = np.array([X[row_n][col_n], Y[row_n][col_n]])
-                Z[row_n][col_n] = self.function(point)
-                
-                if not max_Z or Z[row_n][col_n] > max_Z:
-                    max_Z = Z[row_n][col_n]
+        Returns
+        -------
+        GridLevels
+            Level selection
+        '''
+
+        key = (self.ax.get_xlim(), self.ax.get_ylim(), self.tile_cache.n_evaluated if self.tile_cache else None)
+
+        if self.levels_cache is None or self.levels_cache[0] != key:
+            logger.debug('Selecting contour levels')
+            self.levels_cache = (key, GridLevels(Z))
+
+        return self.levels_cache[1]
+
+    def redraw_contour(self) -> None:
+        '''
+        Draws the contour lines of the shown surface again, e.g. after changing the number of levels.
+        The surface is neither evaluated nor assembled from the tiles
+        '''
+
+        if self.shown_surface is None:
+            return
+
+        logger.debug('Redrawing contour')
+
+        if self.contour_artist is not None:
+            self.contour_artist.remove()
+            self.surface_artists.remove(self.contour_artist)
+
+        X, Y, Z, _, _ = self.shown_surface
+        self.plot_contour(X, Y, Z)
+        self.canvas.draw_idle()
+
+    def plot_surface(self) -> None:
+        '''
+        Plots the gradient field and the contour lines in the current limits of the axes
+        '''
+
+        '''
+        ignoring typing, because return types of matplotlib functions are not annotated
+        '''
+        with trace_span(logger, 'plot_surface'):
+            self.shown_surface = self.get_surface(self.ax.get_xlim(), self.ax.get_ylim())  # type: ignore
+            X, Y, Z, grad_X, grad_Y = self.shown_surface
+
+            self.plot_gradient(X, Y, grad_X, grad_Y)
+            self.plot_contour(X, Y, Z)
+
+        self.plot_layer()
+
+    def redraw_surface(self) -> None:
+        '''
+        Repaints the surface only, keeping the trajectories. Called after panning
+        or zooming and when the background worker has computed new tiles
+        '''
+
+        logger.debug('Redrawing surface')
+
+        if self.function is None:
+            return
 
-        max_Z += 1 - np.min(Z)
-        Z_pos = 1 + Z - np.min(Z)
+        for artist in self.surface_artists:
+            artist.remove()
+        self.surface_artists = []
 
-        max_z_order = np.ceil(np.log10(max_Z))
+        self.plot_surface()
+        self.canvas.draw_idle()
 
-        self.ax.contour(X, Y, Z_pos, levels=np.logspace(0, max_z_order, self.num_levels),
-                        norm=LogNorm(), cmap=plt.cm.jet, alpha=0.5, zorder=CONTOUR_ZORDER)
+    def limits_changed(self, ax: Any) -> None:
+        '''
+        Callback of the axes limits. Repainting is postponed, so that
+        continuous panning does not repaint the surface on each mouse move
+        '''
+
+        if not self.updating_axes:
+            self.redraw_timer.start()
 
     def update_axes(self) -> None:
         '''
@@ -185,29 +459,169 @@ class Canvas(QWidget):
             logger.debug('Nothing to plot')
             return
 
+        if self.comparison_mode and not self.runs:
+            logger.debug('Nothing to compare')
+            return
+
+        self.updating_axes = True
+
         self.ax.clear()
+        self.surface_artists = []
+        self.layer_artists = []
 
         x_lims, y_lims = self.compute_limits()
         self.ax.set_xlim(*x_lims)
         self.ax.set_ylim(*y_lims)
 
-        self.ax.set_title('BFGS')
+        self.ax.set_title('Comparison' if self.comparison_mode else self.title)
+
+        self.plot_surface()
+
+        if self.comparison_mode:
+            for i, run in enumerate(self.runs):
+                self.plot_quiver(run.history, RUN_COLORS[i % len(RUN_COLORS)], f'{i + 1}. {run.title}')
+            self.ax.legend(loc='upper right', fontsize='small')
+        else:
+            self.plot_quiver()
 
         '''
-        ignoring typing, because return types of matplotlib functions are not annotated
+        clearing the axes drops the callbacks, so they are connected again
         '''
-        xs = np.linspace(*self.ax.get_xlim(), NUM_X_TICKS)  # type: ignore
-        ys = np.linspace(*self.ax.get_ylim(), NUM_Y_TICKS)  # type: ignore
-        X, Y = np.meshgrid(xs, ys)
+        self.ax.callbacks.connect('xlim_changed', self.limits_changed)
+        self.ax.callbacks.connect('ylim_changed', self.limits_changed)
+        self.updating_axes = False
 
-        self.plot_gradient(X, Y)
-        self.plot_contour(X, Y)
-        self.plot_quiver()
+        '''
+        the computed limits become the home view of the navigation toolbar
+        '''
+        self.navigation_toolbar.update()
 
         logger.debug('Drawing on canvas')
-        self.canvas.draw()
+        with trace_span(logger, 'draw'):
+            self.canvas.draw()
+
+    def get_basin_map(self, x_lims: Tuple[float, float], y_lims: Tuple[float, float]) -> Optional[BasinMap]:
+        '''
+        Returns the basin map of the viewport, creating an empty one, if it is not cached
+
+        Parameters
+        ----------
+        x_lims : Tuple[float, float]
+            x axis limits
+        y_lims : Tuple[float, float]
+            y axis limits
+
+        Returns
+        -------
+        Optional[BasinMap]
+            Basin map or None, if the fused kernel, needed to solve the grid in lockstep, is not available
+        '''
+
+        if self.value_and_grad is None:
+            logger.debug('The layer requires the fused kernel')
+            return None
+
+        key = ((tuple(x_lims), tuple(y_lims)), self.layer_epsilon)
+
+        basin_map = self.basin_maps.get(key)  # type: ignore
+        if basin_map is None:
+            basin_map = BasinMap(self.value_and_grad, x_lims, y_lims, self.layer_epsilon, (NUM_Y_TICKS, NUM_X_TICKS),
+                                 dtype=self.policy.storage)
+            self.basin_maps[key] = basin_map  # type: ignore
+
+            while len(self.basin_maps) > BASIN_CACHE_CAPACITY:
+                self.basin_maps.popitem(last=False)
+
+        self.basin_maps.move_to_end(key)  # type: ignore
+
+        return basin_map
+
+    def plot_layer(self) -> None:
+        '''
+        Plots the background layer in the current limits of the axes. If the basin map
+        of the viewport is not complete, the solved part is shown, and the next block is solved
+        on the background worker
+        '''
+
+        for artist in self.layer_artists:
+            artist.remove()
+        self.layer_artists = []
+
+        if self.layer is None:
+            self.basin_map = None
+            return
+
+        logger.debug(f'Plotting {self.layer} layer')
+
+        self.basin_map = self.get_basin_map(self.ax.get_xlim(), self.ax.get_ylim())  # type: ignore
+        if self.basin_map is None:
+            return
+
+        X, Y = self.basin_map.X, self.basin_map.Y
+
+        if self.layer == BASINS_LAYER:
+            values = np.ma.masked_invalid(self.basin_map.basins() % len(RUN_COLORS))
+            artist = self.ax.pcolormesh(X, Y, values, cmap=BASINS_CMAP, vmin=-0.5, vmax=len(RUN_COLORS) - 0.5,
+                                        shading='nearest', alpha=LAYER_ALPHA, zorder=LAYER_ZORDER)
+        else:
+            values = np.ma.masked_invalid(self.basin_map.iterations())
+            artist = self.ax.pcolormesh(X, Y, values, cmap=plt.cm.viridis, shading='nearest',
+                                        alpha=LAYER_ALPHA, zorder=LAYER_ZORDER)
+        self.layer_artists.append(artist)
+
+        future = self.basin_map.submit(self.layer_executor, self.layer_ready.emit)  # type:ignore[attr-defined]
+        self.layer_futures = [f for f in self.layer_futures if not f.done()] + ([future] if future else [])
+
+    def layer_block_ready(self) -> None:
+        '''
+        Called in the GUI thread, when the background worker has solved a block of a basin map.
+        Repaints the layer, which schedules the next block of the current map
+        '''
+
+        if self.layer is None or self.function is None:
+            return
+
+        self.plot_layer()
+        self.canvas.draw_idle()
 
-    def update_history(self, history: np.ndarray) -> None:
+    def shutdown(self) -> None:
+        '''
+        Stops the background workers, waiting for the running blocks. Called, when the window is closed
+        '''
+
+        logger.debug('Shutting down canvas workers')
+
+        if self.tile_executor is not None:
+            stop_executor(self.tile_executor, self.tile_futures)
+        stop_executor(self.layer_executor, self.layer_futures)
+
+    def set_layer(self, layer: Optional[str], epsilon: float) -> None:
+        '''
+        Sets the background layer
+
+        Parameters
+        ----------
+        layer : Optional[str]
+            One of LAYERS or None to hide the layer
+        epsilon : float
+            Precision of the runs, started from the grid points
+        '''
+
+        logger.debug(f'Setting layer: {layer}')
+
+        assert layer is None or layer in LAYERS
+
+        self.layer = layer
+        self.layer_epsilon = epsilon
+
+        if self.function is None:
+            return
+
+        self.plot_layer()
+        self.canvas.draw_idle()
+
+    def update_history(self, history: np.ndarray, title: str = DEFAULT_TITLE,
+                       result: Optional[Dict['str', Any]] = None) -> None:
         '''
         A setter function for the iteration history of the method
 
@@ -215,20 +629,27 @@ class Canvas(QWidget):
         ----------
         history : Sequence
             A new history
+        title : str
+            Name of the method, that produced the history
+        result : Optional[Dict['str', Any]]
+            Result dictionary of the run, stored with the exported history
         '''
         
         logger.debug('Updating history')
 
-        history_np = np.array(history)
+        history_np = np.array(history, dtype=self.policy.storage)
         
-        assert len(history_np) > 1
+        assert len(history_np) > 0
         assert len(history_np.shape) == 2
         assert history_np.shape[1] == 2
         
         self.history = history_np
+        self.title = title
+        self.result = result
 
     def update_function(self, func: Callable[[np.ndarray], float],
-                        grad: Callable[[np.ndarray], np.ndarray]) -> None:
+                        grad: Callable[[np.ndarray], np.ndarray],
+                        value_and_grad: Optional[ValueAndGrad] = None) -> None:
         '''
         A setter function for the objective function and it's gradient
 
@@ -238,10 +659,52 @@ class Canvas(QWidget):
             Function
         grad : Callable[[Sequence[float]], List[float]]
             Gradient
+        value_and_grad : Optional[ValueAndGrad]
+            Fused batched kernel, used to evaluate the surface, if given
         '''
         
         self.function = func
         self.gradient = grad
+        self.value_and_grad = value_and_grad
+
+        self.reset_caches()
+
+    def reset_caches(self) -> None:
+        '''
+        Drops the evaluated surfaces and basin maps, e.g. when the function or the precision is changed
+        '''
+
+        self.surface_cache = None
+        self.shown_surface = None
+        self.levels_cache = None
+        self.tile_cache = None
+        if self.value_and_grad is not None:
+            self.tile_cache = TileCache(self.value_and_grad, dtype=self.policy.storage)
+
+        self.basin_maps.clear()
+        self.basin_map = None
+
+    def set_precision(self, precision: str) -> None:
+        '''
+        Sets the dtype policy of the evaluated grids and the stored histories
+
+        Parameters
+        ----------
+        precision : str
+            Name of the policy, one of the keys of precision.POLICIES
+        '''
+
+        logger.debug(f'Setting precision: {precision}')
+
+        self.policy = get_policy(precision)
+        self.reset_caches()
+
+        if self.history.size:
+            self.history = self.history.astype(self.policy.storage)
+        for run in self.runs:
+            run.history = run.history.astype(self.policy.storage)
+
+        self.update_axes()
 
     def update_num_levels(self, num_levels: int) -> None:
         '''
@@ -256,4 +719,167 @@ class Canvas(QWidget):
         assert num_levels > 0
         
         self.num_levels = num_levels
+        self.redraw_contour()
+
+    def set_level_scale(self, scale: str) -> None:
+        '''
+        Sets the scale of the contour levels
+
+        Parameters
+        ----------
+        scale : str
+            One of levels.LEVEL_SCALES
+        '''
+
+        logger.debug(f'Setting level scale: {scale}')
+
+        assert scale in LEVEL_SCALES
+
+        self.level_scale = scale
+        self.redraw_contour()
+
+    def set_comparison_mode(self, enabled: bool) -> None:
+        '''
+        Turns the comparison mode on and off. The collected runs are kept,
+        so the comparison can be resumed
+
+        Parameters
+        ----------
+        enabled : bool
+            Whether the comparison mode is on
+        '''
+
+        logger.debug(f'Setting comparison mode: {enabled}')
+
+        self.comparison_mode = enabled
+        self.tbl_runs.setVisible(enabled)
         self.update_axes()
+
+    def add_run(self, history: np.ndarray, title: str, result: Dict['str', Any]) -> None:
+        '''
+        Adds a trajectory to the comparison
+
+        Parameters
+        ----------
+        history : np.ndarray
+            History of the method
+        title : str
+            Name of the method
+        result : Dict['str', Any]
+            Result dictionary of the run
+        '''
+
+        logger.debug('Adding run')
+
+        self.update_history(history, title, result)
+        self.runs.append(Run(self.history, title, result))
+        self.update_runs_table()
+
+    def clear_runs(self) -> None:
+        '''
+        Removes all of the trajectories from the comparison
+        '''
+
+        logger.debug('Clearing runs')
+
+        self.runs = []
+        self.update_runs_table()
+
+    def update_runs_table(self) -> None:
+        '''
+        Fills the runs table with the statistics of the collected runs
+        '''
+
+        self.tbl_runs.setRowCount(len(self.runs))
+
+        for row_n, run in enumerate(self.runs):
+            for col_n, cell in enumerate(run.table_row()):
+                self.tbl_runs.setItem(row_n, col_n, QTableWidgetItem(cell))
+
+        self.tbl_runs.resizeColumnsToContents()
+
+    def export_history(self, path: Path, dtype: Optional[DTypeLike] = None) -> None:
+        '''
+        Saves the current history (see export.save_history)
+
+        Parameters
+        ----------
+        path : Path
+            Path of the npz file
+        dtype : Optional[DTypeLike]
+            Type of the stored coordinates. If None, the storage type of the policy is used
+        '''
+
+        assert self.history.size
+
+        save_history(path, self.history, self.result, self.title, self.policy.storage if dtype is None else dtype)
+
+    def export_surface(self, path: Path, dtype: Optional[DTypeLike] = None) -> None:
+        '''
+        Saves the shown surface as it was evaluated, without evaluating it again (see export.save_surface)
+
+        Parameters
+        ----------
+        path : Path
+            Path of the npz file
+        dtype : Optional[DTypeLike]
+            Type of the stored values. If None, the storage type of the policy is used
+        '''
+
+        assert self.shown_surface is not None
+
+        save_surface(path, self.shown_surface, self.policy.storage if dtype is None else dtype)
+
+    def export_figure(self, path: Path) -> None:
+        '''
+        Saves the figure in the format, given by the extension of the path.
+        The layers below the trajectories of the vector formats are rasterized (see export.save_figure)
+
+        Parameters
+        ----------
+        path : Path
+            Path of the file
+        '''
+
+        save_figure(self.fig, path)
+
+    def export_bundle(self, directory: Path, dtype: Optional[DTypeLike] = None) -> List[Path]:
+        '''
+        Saves the shown surface, the visible histories with the results of the runs
+        and the figure to a directory, which is read by export.build_report
+
+        Parameters
+        ----------
+        directory : Path
+            Directory of the bundle, created if it does not exist
+        dtype : Optional[DTypeLike]
+            Type of the stored values. If None, the storage type of the policy is used
+
+        Returns
+        -------
+        List[Path]
+            Written files
+        '''
+
+        logger.debug(f'Exporting bundle to {directory}')
+
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+
+        dtype = self.policy.storage if dtype is None else dtype
+
+        written = [directory / SURFACE_FILE]
+        self.export_surface(written[0], dtype)
+
+        if self.comparison_mode:
+            for run_n, run in enumerate(self.runs):
+                written.append(directory / HISTORY_FILE_PATTERN.format(run_n))
+                save_history(written[-1], run.history, run.result, run.title, dtype)
+        else:
+            written.append(directory / HISTORY_FILE_PATTERN.format(0))
+            self.export_history(written[-1], dtype)
+
+        written.append(directory / FIGURE_FILE)
+        self.export_figure(written[-1])
+
+        return written
@@ -1,17 +1,25 @@
 from PyQt5.QtWidgets import QWidget, QLineEdit, QPushButton, QLabel, QSlider, \
-    QVBoxLayout, QHBoxLayout, QMessageBox
+    QVBoxLayout, QHBoxLayout, QMessageBox, QComboBox, QCheckBox, QFileDialog
 from PyQt5.QtGui import QDoubleValidator
 from PyQt5.QtCore import Qt, QLocale
 
 from pathlib import Path
 
+from threading import Thread
+
+from typing import Tuple, Optional
+
 import numpy as np
 
-from .canvas import Canvas
+from .canvas import Canvas, LAYERS
 from .utils import get_logger
-from .bfgs import bfgs
-from .toolbar_utils import build_function, build_gradient
+from .optimizers import optimize, optimizer_titles, make_value_and_grad, OPTIMIZERS
+from .toolbar_utils import build_function, build_gradient, build_value_and_grad, DIFF_BACKENDS
 from .errors import Error, get_error_message
+from .precision import POLICIES, DOUBLE_PRECISION
+from .termination import get_status_message
+from .levels import LEVEL_SCALES, DEFAULT_LEVEL_SCALE
+from .sandbox import get_sandbox
 
 
 logger = get_logger(Path(__file__).name)
@@ -22,6 +30,9 @@ NUM_LEVELS_SLIDER_RANGE = (10, 100)
 DEFAULT_FUNCTION = 'x**2+y**2-cos(2*x+y)'
 DEFAULT_APPROXIMATION = (0.5, -0.5)
 DEFAULT_PRECISION = 1e-3
+DEFAULT_METHOD = 'bfgs'
+NO_LAYER = 'none'
+RUN_TIME_LIMIT = 10.0  # wall-clock budget of a run in seconds, so that a divergent run does not freeze the GUI
 
 
 class CanvasToolBar(QWidget):
@@ -33,8 +44,20 @@ class CanvasToolBar(QWidget):
 
         self.canvas = canvas
 
+        '''
+        the function and the backend of the last run. The canvas keeps its
+        cached surface, and the compared runs are kept, while they are the same
+        '''
+        self.function_key: Optional[Tuple[str, str]] = None
+
         self.canvas.update_num_levels(NUM_LEVELS_SLIDER_RANGE[0])
 
+        '''
+        the sandbox worker takes seconds to start, so it is started in the background,
+        while the window is shown, rather than on the first run
+        '''
+        Thread(target=get_sandbox().start, daemon=True).start()
+
         self.__initialize_interface()
 
     def __initialize_interface(self) -> None:
@@ -59,6 +82,22 @@ class CanvasToolBar(QWidget):
         num_levels_layout.addWidget(self.lbl_num_levels)
 
         self.num_levels_widget.setLayout(num_levels_layout)
+
+        # level scale widget
+        self.level_scale_widget = QWidget()
+
+        self.lbl_level_scale = QLabel('level scale:')
+
+        self.cmb_level_scale = QComboBox()
+        self.cmb_level_scale.addItems(LEVEL_SCALES)
+        self.cmb_level_scale.setCurrentText(DEFAULT_LEVEL_SCALE)
+        self.cmb_level_scale.currentTextChanged.connect(self.cmb_level_scale_changed)  # type:ignore[attr-defined]
+
+        level_scale_layout = QHBoxLayout()
+        level_scale_layout.addWidget(self.lbl_level_scale)
+        level_scale_layout.addWidget(self.cmb_level_scale)
+
+        self.level_scale_widget.setLayout(level_scale_layout)
         
         # target function widget
         self.func_widget = QWidget()
@@ -118,18 +157,107 @@ class CanvasToolBar(QWidget):
         epsilon_layout.addWidget(self.led_epsilon)
 
         self.epsilon_widget.setLayout(epsilon_layout)
+
+        # differentiation backend widget
+        self.backend_widget = QWidget()
+
+        self.lbl_backend = QLabel('differentiation:')
+
+        self.cmb_backend = QComboBox()
+        self.cmb_backend.addItems(DIFF_BACKENDS)
+
+        backend_layout = QHBoxLayout()
+        backend_layout.addWidget(self.lbl_backend)
+        backend_layout.addWidget(self.cmb_backend)
+
+        self.backend_widget.setLayout(backend_layout)
+
+        # precision widget
+        self.precision_widget = QWidget()
+
+        self.lbl_precision = QLabel('precision:')
+
+        self.cmb_precision = QComboBox()
+        self.cmb_precision.addItems(POLICIES)
+        self.cmb_precision.setCurrentText(DOUBLE_PRECISION)
+        self.cmb_precision.currentTextChanged.connect(self.cmb_precision_changed)  # type:ignore[attr-defined]
+
+        precision_layout = QHBoxLayout()
+        precision_layout.addWidget(self.lbl_precision)
+        precision_layout.addWidget(self.cmb_precision)
+
+        self.precision_widget.setLayout(precision_layout)
+
+        # method widget
+        self.method_widget = QWidget()
+
+        self.lbl_method = QLabel('method:')
+
+        self.cmb_method = QComboBox()
+        for name, title in optimizer_titles():
+            self.cmb_method.addItem(title, name)
+        self.cmb_method.setCurrentIndex(self.cmb_method.findData(DEFAULT_METHOD))
+
+        method_layout = QHBoxLayout()
+        method_layout.addWidget(self.lbl_method)
+        method_layout.addWidget(self.cmb_method)
+
+        self.method_widget.setLayout(method_layout)
+        
+        # comparison widget
+        self.comparison_widget = QWidget()
+
+        self.chk_compare = QCheckBox('compare runs')
+        self.chk_compare.toggled.connect(self.chk_compare_toggled)  # type:ignore[attr-defined]
+
+        self.btn_clear = QPushButton('clear')
+        self.btn_clear.clicked.connect(self.btn_clear_clicked)  # type:ignore[attr-defined]
+        self.btn_clear.setEnabled(False)
+
+        comparison_layout = QHBoxLayout()
+        comparison_layout.addWidget(self.chk_compare)
+        comparison_layout.addWidget(self.btn_clear)
+
+        self.comparison_widget.setLayout(comparison_layout)
+
+        # background layer widget
+        self.layer_widget = QWidget()
+
+        self.lbl_layer = QLabel('layer:')
+
+        self.cmb_layer = QComboBox()
+        self.cmb_layer.addItems((NO_LAYER, *LAYERS))
+        self.cmb_layer.currentTextChanged.connect(self.cmb_layer_changed)  # type:ignore[attr-defined]
+
+        layer_layout = QHBoxLayout()
+        layer_layout.addWidget(self.lbl_layer)
+        layer_layout.addWidget(self.cmb_layer)
+
+        self.layer_widget.setLayout(layer_layout)
         
         # run button
         self.btn_run = QPushButton('run')
         self.btn_run.clicked.connect(self.btn_run_clicked)  # type:ignore[attr-defined]
+
+        # export button, enabled after the first run
+        self.btn_export = QPushButton('export')
+        self.btn_export.clicked.connect(self.btn_export_clicked)  # type:ignore[attr-defined]
+        self.btn_export.setEnabled(False)
         
         layout = QVBoxLayout()
 
         layout.addWidget(self.num_levels_widget, alignment=Qt.AlignTop)  # type:ignore[attr-defined]
+        layout.addWidget(self.level_scale_widget, alignment=Qt.AlignTop)  # type:ignore[attr-defined]
         layout.addWidget(self.func_widget, alignment=Qt.AlignTop)  # type:ignore[attr-defined]
         layout.addWidget(self.init_approx_widget, alignment=Qt.AlignTop)  # type:ignore[attr-defined]
         layout.addWidget(self.epsilon_widget, alignment=Qt.AlignTop)  # type:ignore[attr-defined]
+        layout.addWidget(self.backend_widget, alignment=Qt.AlignTop)  # type:ignore[attr-defined]
+        layout.addWidget(self.precision_widget, alignment=Qt.AlignTop)  # type:ignore[attr-defined]
+        layout.addWidget(self.method_widget, alignment=Qt.AlignTop)  # type:ignore[attr-defined]
+        layout.addWidget(self.comparison_widget, alignment=Qt.AlignTop)  # type:ignore[attr-defined]
+        layout.addWidget(self.layer_widget, alignment=Qt.AlignTop)  # type:ignore[attr-defined]
         layout.addWidget(self.btn_run, alignment=Qt.AlignTop)  # type:ignore[attr-defined]
+        layout.addWidget(self.btn_export, alignment=Qt.AlignTop)  # type:ignore[attr-defined]
 
         self.setLayout(layout)
 
@@ -140,6 +268,42 @@ class CanvasToolBar(QWidget):
         value = self.sld_num_levels.value()
         self.canvas.update_num_levels(value)
         
+    def cmb_level_scale_changed(self, text: str) -> None:
+        self.canvas.set_level_scale(text)
+
+    def chk_compare_toggled(self, checked: bool) -> None:
+        self.btn_clear.setEnabled(checked)
+        self.canvas.set_comparison_mode(checked)
+
+    def cmb_precision_changed(self, text: str) -> None:
+        self.canvas.set_precision(text)
+
+    def cmb_layer_changed(self, text: str) -> None:
+        epsilon = float(self.led_epsilon.text()) if self.led_epsilon.text() else DEFAULT_PRECISION
+        self.canvas.set_layer(None if text == NO_LAYER else text, epsilon)
+
+    def btn_clear_clicked(self) -> None:
+        self.canvas.clear_runs()
+        self.canvas.update_axes()
+        
+    def btn_export_clicked(self) -> None:
+        logger.debug('export button clicked')
+
+        directory = QFileDialog.getExistingDirectory(self, 'Export to directory')
+        if not directory:
+            return
+
+        try:
+            self.canvas.export_bundle(Path(directory))
+        except OSError as e:
+            QMessageBox.warning(
+                self,
+                'Error',
+                f'Unable to export: {e}',
+                QMessageBox.Ok
+            )
+            logger.warning(f'Unable to export: {e}')
+
     def btn_run_clicked(self) -> None:
         logger.debug('run button clicked')
         
@@ -167,7 +331,7 @@ class CanvasToolBar(QWidget):
 
         epsilon = float(self.led_epsilon.text())
 
-        err, func_sympy, func = build_function(str(self.led_func.text()))
+        err, func_sympy, func, derivatives = build_function(str(self.led_func.text()))
         if err != Error.OK:
             QMessageBox.warning(
                 self,
@@ -179,7 +343,7 @@ class CanvasToolBar(QWidget):
 
         assert func is not None
         
-        err, grad = build_gradient(func_sympy)
+        err, grad = build_gradient(func_sympy, derivatives)
         if not grad:
             QMessageBox.warning(
                 self,
@@ -191,9 +355,43 @@ class CanvasToolBar(QWidget):
 
         assert grad is not None
 
-        _, history = bfgs(grad, x0, epsilon)
-
-        self.canvas.update_history(history)
-        self.canvas.update_function(func, grad)
-
+        '''
+        the fused kernel is an optimization, so the
+        closures above are used if it can not be built
+        '''
+        backend = str(self.cmb_backend.currentText())
+        err, value_and_grad = build_value_and_grad(func_sympy, backend, derivatives)
+        if err != Error.OK:
+            logger.warning('Falling back to separate function and gradient')
+
+        method = str(self.cmb_method.currentData())
+        result, history = optimize(method, make_value_and_grad(grad, value_and_grad), x0, epsilon,
+                                   max_time=RUN_TIME_LIMIT, history_dtype=self.canvas.policy.storage)
+        if not result['success']:
+            logger.warning(f'{method} did not converge: {get_status_message(result["status"])}')
+
+        function_key = (str(self.led_func.text()), backend)
+        if function_key != self.function_key:
+            self.function_key = function_key
+            self.canvas.update_function(func, grad, value_and_grad)
+            self.canvas.clear_runs()
+
+        if self.chk_compare.isChecked():
+            self.canvas.add_run(history, OPTIMIZERS[method].title, result)
+        else:
+            self.canvas.update_history(history, OPTIMIZERS[method].title, result)
+
+        self.canvas.layer_epsilon = epsilon
         self.canvas.update_axes()
+        self.btn_export.setEnabled(True)
+
+        '''
+        the trajectory is shown anyway, so the status is reported after plotting
+        '''
+        if not result['success']:
+            QMessageBox.warning(
+                self,
+                'Warning',
+                get_status_message(result['status']),
+                QMessageBox.Ok
+            )
@@ -5,7 +5,9 @@ class Error(Enum):
     OK = 1,
     SYNTAX = 2,
     GRAMMATICAL = 3,
-    UNABLE_TO_DIFFERENTIALE = 4
+    UNABLE_TO_DIFFERENTIALE = 4,
+    TOO_LARGE = 5,
+    TIMEOUT = 6
 
 
 def get_error_message(err: Error) -> str:
@@ -32,5 +34,9 @@ def get_error_message(err: Error) -> str:
         return 'Grammatic error'
     if err == Error.UNABLE_TO_DIFFERENTIALE:
         return 'Unable to differentiate the function'
+    if err == Error.TOO_LARGE:
+        return 'The expression is too large'
+    if err == Error.TIMEOUT:
+        return 'Processing of the expression takes too long'
     
     return 'Unknown error'
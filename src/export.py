@@ -0,0 +1,465 @@
+import zipfile
+
+import numpy as np
+from numpy.typing import DTypeLike
+
+from matplotlib.figure import Figure
+from matplotlib.collections import Collection
+from matplotlib.image import AxesImage
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.backends.backend_pdf import PdfPages
+
+from typing import Tuple, Optional, List, Dict, Any, Type
+
+from types import TracebackType
+
+from pathlib import Path
+
+from .utils import get_logger
+from .termination import Status
+from .levels import GridLevels, DEFAULT_LEVEL_SCALE
+from .plotting import compute_limits, plot_quiver, plot_gradient, plot_contour, \
+    HISTORY_ZORDER, DEFAULT_MARGIN_COEF, DEFAULT_NUM_LEVELS
+
+
+logger = get_logger(Path(__file__).name)
+
+
+'''
+Export of the trajectories, the evaluated surfaces and the figures.
+
+The histories and the surfaces are stored column-wise in compressed npz archives,
+which are read back by numpy without pickling. A history is split into chunks of rows,
+and each column of a chunk is a separate member of the archive (like the column chunks
+of the row groups of Parquet), so a history is written without holding it in memory
+'''
+
+HISTORY_COLUMNS = ('x', 'y')
+SURFACE_COLUMNS = ('X', 'Y', 'Z', 'grad_X', 'grad_Y')
+CHUNK_SIZE = 65536  # rows per chunk of a history
+RESULT_PREFIX = 'result.'  # prefix of the members, that store the fields of the result dictionary
+TITLE_MEMBER = 'title'
+
+'''
+layout of an exported bundle, which is read by build_report
+'''
+SURFACE_FILE = 'surface.npz'
+HISTORY_FILE_PATTERN = 'history_{:03d}.npz'
+FIGURE_FILE = 'figure.svg'
+
+VECTOR_FORMATS = ('svg', 'pdf')
+EXPORT_DPI = 150  # resolution of the rasterized layers of the vector figures
+REPORT_SIZE = (8.0, 6.0)  # size of a report page in inches
+
+Surface = Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]
+
+
+class HistoryWriter:
+    '''
+    Streaming writer of a history. The points are buffered and written by chunks
+    of chunk_size rows, so the memory does not depend on the length of the history.
+    The file is complete, when the writer is closed. Usable as a context manager
+
+    Parameters
+    ----------
+    path : Path
+        Path of the npz file
+    dtype : DTypeLike
+        Type of the stored coordinates, e.g. np.float32 to halve the file
+    chunk_size : int
+        Number of rows per chunk
+    '''
+
+    def __init__(self, path: Path, dtype: DTypeLike = np.float64, chunk_size: int = CHUNK_SIZE) -> None:
+        assert chunk_size > 0
+
+        self.path = Path(path)
+        self.dtype = np.dtype(dtype)
+        self.chunk_size = chunk_size
+
+        self.n_rows = 0
+        self.n_chunks = 0
+
+        self.__buffer = np.empty((chunk_size, len(HISTORY_COLUMNS)), dtype=self.dtype)
+        self.__n_buffered = 0
+        self.__archive: Optional[zipfile.ZipFile] = zipfile.ZipFile(
+            self.path, 'w', compression=zipfile.ZIP_DEFLATED, allowZip64=True
+        )
+
+    def write(self, points: Any) -> None:
+        '''
+        Appends the points to the history
+
+        Parameters
+        ----------
+        points : Any
+            A point of shape (2,) or points of shape (n, 2)
+        '''
+
+        points = np.asarray(points).reshape(-1, len(HISTORY_COLUMNS))
+
+        while len(points):
+            n = min(len(points), self.chunk_size - self.__n_buffered)
+            self.__buffer[self.__n_buffered:self.__n_buffered + n] = points[:n]
+            self.__n_buffered += n
+            points = points[n:]
+
+            if self.__n_buffered == self.chunk_size:
+                self.__flush()
+
+    def write_result(self, result: Dict['str', Any], title: Optional[str] = None) -> None:
+        '''
+        Stores the result dictionary of the run (see optimizers.optimize) next to the history
+
+        Parameters
+        ----------
+        result : Dict['str', Any]
+            Result dictionary. The status is stored by its name, and the missing values are skipped
+        title : Optional[str]
+            Name of the method, that produced the history
+        '''
+
+        for key, value in result.items():
+            if value is None:
+                continue
+            if isinstance(value, Status):
+                value = value.name
+            self.__write_member(RESULT_PREFIX + key, np.asarray(value))
+
+        if title is not None:
+            self.__write_member(TITLE_MEMBER, np.asarray(title))
+
+    def close(self) -> None:
+        if self.__archive is None:
+            return
+
+        self.__flush()
+        self.__archive.close()
+        self.__archive = None
+
+        logger.debug(f'Written {self.n_rows} points in {self.n_chunks} chunks to {self.path}')
+
+    def __enter__(self) -> 'HistoryWriter':
+        return self
+
+    def __exit__(self, exc_type: Optional[Type[BaseException]], exc_value: Optional[BaseException],
+                 traceback: Optional[TracebackType]) -> None:
+        self.close()
+
+    def __flush(self) -> None:
+        if not self.__n_buffered:
+            return
+
+        chunk = self.__buffer[:self.__n_buffered]
+        for column_n, column in enumerate(HISTORY_COLUMNS):
+            self.__write_member(f'{column}.{self.n_chunks:06d}', chunk[:, column_n])
+
+        self.n_rows += self.__n_buffered
+        self.n_chunks += 1
+        self.__n_buffered = 0
+
+    def __write_member(self, name: str, array: np.ndarray) -> None:
+        assert self.__archive is not None
+
+        with self.__archive.open(name + '.npy', 'w', force_zip64=True) as file:
+            np.lib.format.write_array(file, array, allow_pickle=False)
+
+
+def save_history(path: Path, history: np.ndarray, result: Optional[Dict['str', Any]] = None,
+                 title: Optional[str] = None, dtype: Optional[DTypeLike] = None,
+                 chunk_size: int = CHUNK_SIZE) -> None:
+    '''
+    Saves a history and, optionally, the result of the run, e.g. the output of optimizers.bfgs
+
+    Parameters
+    ----------
+    path : Path
+        Path of the npz file
+    history : np.ndarray
+        History of shape (n, 2)
+    result : Optional[Dict['str', Any]]
+        Result dictionary of the run
+    title : Optional[str]
+        Name of the method
+    dtype : Optional[DTypeLike]
+        Type of the stored coordinates. If None, the type of the history is kept
+    chunk_size : int
+        Number of rows per chunk
+    '''
+
+    logger.debug(f'Saving history to {path}')
+
+    history = np.asarray(history)
+
+    with HistoryWriter(path, history.dtype if dtype is None else dtype, chunk_size) as writer:
+        for start in range(0, len(history), chunk_size):
+            writer.write(history[start:start + chunk_size])
+        if result is not None or title is not None:
+            writer.write_result({} if result is None else result, title)
+
+
+def load_history(path: Path) -> Tuple[np.ndarray, Dict['str', Any], Optional[str]]:
+    '''
+    Loads a history, saved by save_history or HistoryWriter
+
+    Parameters
+    ----------
+    path : Path
+        Path of the npz file
+
+    Returns
+    -------
+    Tuple[np.ndarray, Dict['str', Any], Optional[str]]
+        History of shape (n, 2) of the stored type, the result dictionary
+        (empty, if it was not saved) and the name of the method
+    '''
+
+    logger.debug(f'Loading history from {path}')
+
+    with np.load(path, allow_pickle=False) as archive:
+        names = sorted(archive.files)
+
+        columns = []
+        for column in HISTORY_COLUMNS:
+            chunks = [archive[name] for name in names if name.startswith(column + '.')]
+            columns.append(np.concatenate(chunks) if chunks else np.empty(0))
+        history = np.stack(columns, axis=1)
+
+        result: Dict['str', Any] = {}
+        for name in names:
+            if name.startswith(RESULT_PREFIX):
+                value = archive[name]
+                result[name[len(RESULT_PREFIX):]] = value.item() if value.ndim == 0 else value
+
+        title = str(archive[TITLE_MEMBER]) if TITLE_MEMBER in archive.files else None
+
+    if 'status' in result:
+        result['status'] = Status[result['status']]
+
+    return history, result, title
+
+
+def save_surface(path: Path, surface: Surface, dtype: Optional[DTypeLike] = None) -> None:
+    '''
+    Saves an evaluated surface
+
+    Parameters
+    ----------
+    path : Path
+        Path of the npz file
+    surface : Surface
+        x and y values of the grid, function values and x and y components of the gradient
+    dtype : Optional[DTypeLike]
+        Type of the stored values. If None, the types of the arrays are kept
+    '''
+
+    logger.debug(f'Saving surface to {path}')
+
+    arrays: Dict[str, Any] = {column: np.asarray(array) if dtype is None else np.asarray(array, dtype=dtype)
+                              for column, array in zip(SURFACE_COLUMNS, surface)}
+
+    np.savez_compressed(path, **arrays)
+
+
+def load_surface(path: Path) -> Surface:
+    '''
+    Loads a surface, saved by save_surface
+
+    Parameters
+    ----------
+    path : Path
+        Path of the npz file
+
+    Returns
+    -------
+    Surface
+        x and y values of the grid, function values and x and y components of the gradient
+    '''
+
+    logger.debug(f'Loading surface from {path}')
+
+    with np.load(path, allow_pickle=False) as archive:
+        X, Y, Z, grad_X, grad_Y = (archive[column] for column in SURFACE_COLUMNS)
+
+    return X, Y, Z, grad_X, grad_Y
+
+
+def rasterize_layers(fig: Figure, zorder: float = HISTORY_ZORDER) -> List[Any]:
+    '''
+    Marks the dense layers (the collections and the images below zorder, i.e. the background layer,
+    the gradient field and the contour lines) to be rasterized, when the figure is saved in a vector format.
+    The layers, which are drawn one after another, share an image, while the trajectories,
+    the axes and the text stay vector
+
+    Parameters
+    ----------
+    fig : Figure
+        Figure to export
+    zorder : float
+        The artists with lower zorder are rasterized
+
+    Returns
+    -------
+    List[Any]
+        The artists, which were not rasterized before, so the marks may be removed
+    '''
+
+    marked = []
+    for ax in fig.axes:
+        for artist in ax.get_children():
+            if isinstance(artist, (Collection, AxesImage)) and artist.get_zorder() < zorder \
+                    and not artist.get_rasterized():
+                artist.set_rasterized(True)
+                marked.append(artist)
+
+    return marked
+
+
+def save_figure(fig: Figure, path: Path, dpi: float = EXPORT_DPI) -> None:
+    '''
+    Saves a figure in the format, given by the extension of the path. The dense layers
+    of the vector formats (see VECTOR_FORMATS) are rasterized, so the size of the file
+    depends on the resolution rather than on the number of the drawn cells and arrows.
+    The figure is left unchanged
+
+    Parameters
+    ----------
+    fig : Figure
+        Figure to export
+    path : Path
+        Path of the file
+    dpi : float
+        Resolution of the raster formats and of the rasterized layers
+    '''
+
+    logger.debug(f'Saving figure to {path}')
+
+    marked = rasterize_layers(fig) if Path(path).suffix[1:].lower() in VECTOR_FORMATS else []
+
+    try:
+        fig.savefig(path, dpi=dpi)
+    finally:
+        for artist in marked:
+            artist.set_rasterized(False)
+
+
+def render_report_page(surface: Surface, history: np.ndarray, title: Optional[str],
+                       result: Dict['str', Any], num_levels: int = DEFAULT_NUM_LEVELS,
+                       scale: str = DEFAULT_LEVEL_SCALE, grid_levels: Optional[GridLevels] = None) -> Figure:
+    '''
+    Draws a trajectory on a stored surface. Nothing is evaluated, so the page
+    shows the part of the surface, that was exported, even if the trajectory leaves it
+
+    Parameters
+    ----------
+    surface : Surface
+        Stored surface
+    history : np.ndarray
+        Stored history
+    title : Optional[str]
+        Name of the method
+    result : Dict['str', Any]
+        Stored result dictionary, may be empty
+    num_levels : int
+        Number of contour lines
+    scale : str
+        Scale of the contour levels
+    grid_levels : Optional[GridLevels]
+        Level selection of the surface, shared by the pages. If None, it is computed from the surface
+
+    Returns
+    -------
+    Figure
+        Page of the report
+    '''
+
+    X, Y, Z, grad_X, grad_Y = surface
+
+    fig = Figure(figsize=REPORT_SIZE)
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+
+    '''
+    the history is drawn within the union of its bounding box and the grid
+    '''
+    x_lims, y_lims = compute_limits([history, np.array([[X.min(), Y.min()], [X.max(), Y.max()]])],
+                                    DEFAULT_MARGIN_COEF)
+    ax.set_xlim(*x_lims)
+    ax.set_ylim(*y_lims)
+
+    plot_gradient(ax, X, Y, grad_X, grad_Y)
+    plot_contour(ax, X, Y, Z, num_levels, scale, grid_levels)
+    if len(history):
+        plot_quiver(ax, history)
+
+    caption = title or 'History'
+    if 'n_iter' in result and 'status' in result:
+        caption += f': {result["n_iter"]} iterations, {result["status"].name.lower()}'
+    ax.set_title(caption)
+
+    return fig
+
+
+def build_report(directory: Path, output: Path, num_levels: int = DEFAULT_NUM_LEVELS,
+                 scale: str = DEFAULT_LEVEL_SCALE, dpi: float = EXPORT_DPI) -> List[Path]:
+    '''
+    Renders the histories of an exported bundle (see Canvas.export_bundle) on its surface,
+    one page per history. The stored data is used as is, so no function is evaluated,
+    and a report of many runs takes the time of drawing only
+
+    Parameters
+    ----------
+    directory : Path
+        Directory of the bundle with SURFACE_FILE and the files of the histories
+    output : Path
+        Path of the report. A pdf report has a page per history,
+        for the other formats a file per history is written next to the given path
+        with the number of the history appended to the name
+    num_levels : int
+        Number of contour lines
+    scale : str
+        Scale of the contour levels
+    dpi : float
+        Resolution of the raster formats and of the rasterized layers
+
+    Returns
+    -------
+    List[Path]
+        Written files
+    '''
+
+    directory, output = Path(directory), Path(output)
+
+    surface = load_surface(directory / SURFACE_FILE)
+
+    '''
+    the pages share the surface, so its values are sorted for the level selection once
+    '''
+    grid_levels = GridLevels(surface[2])
+    history_paths = sorted(directory.glob(HISTORY_FILE_PATTERN.replace('{:03d}', '*')))
+
+    logger.debug(f'Building report of {len(history_paths)} histories')
+
+    def render(path: Path) -> Figure:
+        history, result, title = load_history(path)
+        return render_report_page(surface, history, title, result, num_levels, scale, grid_levels)
+
+    '''
+    the pages are rendered one at a time, so a report of many runs does not hold all of the figures
+    '''
+    pages = (render(path) for path in history_paths)
+
+    if output.suffix.lower() == '.pdf':
+        with PdfPages(output) as pdf:
+            for fig in pages:
+                rasterize_layers(fig)
+                pdf.savefig(fig, dpi=dpi)
+        return [output]
+
+    written = []
+    for page_n, fig in enumerate(pages):
+        path = output.with_name(f'{output.stem}_{page_n:03d}{output.suffix}')
+        save_figure(fig, path, dpi)
+        written.append(path)
+
+    return written
@@ -0,0 +1,309 @@
+import math
+import sys
+
+import sympy
+from sympy.printing.pycode import PythonCodePrinter
+
+from typing import Tuple, Any, Callable, Optional, Dict
+
+from pathlib import Path
+
+from time import perf_counter
+
+import numpy as np
+from numpy.typing import DTypeLike
+
+from .utils import get_logger
+from .termination import Termination, Status, CURVATURE_COEF
+from .precision import floating_dtype
+from .parser import differentiate, SYMBOLS, REAL_SYMBOLS
+
+try:
+    import numba
+except ImportError:  # pragma: no cover
+    numba = None  # type: ignore[assignment]
+
+
+logger = get_logger(Path(__file__).name)
+
+
+'''
+numba is an optional dependency. Without it, the jit backend is not
+offered, and the kernels are built by the other backends
+'''
+NUMBA_AVAILABLE = numba is not None
+
+KERNEL_NAME = '_value_and_grad'
+
+'''
+a point, used to compile the kernel eagerly, so that
+the compilation errors are reported by build_jit_value_and_grad
+'''
+COMPILATION_POINT = (0.5, 0.5)
+
+'''
+the wall clock is read by the compiled loop once in this number of iterations,
+since leaving the compiled code is much more expensive than an iteration
+'''
+TIME_CHECK_PERIOD = 64
+
+'''
+status codes, returned by the compiled loop (numba treats the globals as constants)
+'''
+CONVERGED = Status.CONVERGED.value
+F_TOL = Status.F_TOL.value
+X_TOL = Status.X_TOL.value
+MAX_ITER = Status.MAX_ITER.value
+MAX_GRAD_CALLS = Status.MAX_GRAD_CALLS.value
+TIME_LIMIT = Status.TIME_LIMIT.value
+NOT_FINITE = Status.NOT_FINITE.value
+
+
+def generate_kernel_source(func: sympy.Expr, derivatives: Optional[Tuple[sympy.Expr, sympy.Expr]] = None) -> str:
+    '''
+    Generates the source of a scalar python function, returning the value
+    and the partial derivatives of the objective function. Common subexpressions
+    are extracted into local variables
+
+    Parameters
+    ----------
+    func : sympy.Expr
+        Objective function of x and y
+    derivatives : Optional[Tuple[sympy.Expr, sympy.Expr]]
+        Partial derivatives of the function (see parser.differentiate). If None, the function is differentiated
+
+    Returns
+    -------
+    str
+        Source of the function f(x, y) -> (value, grad_x, grad_y)
+    '''
+
+    if derivatives is None:
+        derivatives = differentiate(func)
+
+    to_real = {SYMBOLS[name]: REAL_SYMBOLS[name] for name in SYMBOLS}
+    replacements, exprs = sympy.cse([expr.subs(to_real) for expr in (func, *derivatives)])
+
+    printer = PythonCodePrinter({'fully_qualified_modules': True})
+
+    lines = [f'def {KERNEL_NAME}(x, y):']
+    for symbol, expr in replacements:
+        lines.append(f'    {symbol} = {printer.doprint(expr)}')
+    lines.append(f'    return {", ".join(f"float({printer.doprint(expr)})" for expr in exprs)}')
+
+    return '\n'.join(lines)
+
+
+def __batch_loop(kernel: Callable, xs: np.ndarray, ys: np.ndarray,
+                 values: np.ndarray, grad_xs: np.ndarray, grad_ys: np.ndarray) -> None:
+    '''
+    the kernel computes in float64, whatever the type of the arrays is
+    '''
+    for k in range(xs.size):
+        values[k], grad_xs[k], grad_ys[k] = kernel(float(xs[k]), float(ys[k]))
+
+
+def __elapsed(start_time: float) -> float:
+    with numba.objmode(elapsed='float64'):
+        elapsed = perf_counter() - start_time
+    return elapsed
+
+
+def __bfgs_loop(kernel: Callable, x_0: np.ndarray, alpha: float, epsilon: float,
+                max_grad_calls: int, max_time: float, f_tol: float, x_tol: float,
+                start_time: float, history: np.ndarray) -> Tuple[int, int, float, float, float, int]:
+    '''
+    the problem is two-dimensional, so the inverse hessian approximation
+    is kept in scalars: this avoids allocating temporary arrays
+    and calling BLAS (which numba supports only with scipy installed).
+    The stopping criteria are the same as in termination.Termination
+    '''
+    max_iter = history.shape[0] - 1
+    h_xx, h_xy, h_yy = 1.0, 0.0, 1.0
+
+    x, y = x_0[0], x_0[1]
+    value, grad_x, grad_y = kernel(x, y)
+    n_calls = 1
+
+    history[0, 0], history[0, 1] = x, y
+    n_iter = 0
+
+    if not (math.isfinite(value) and math.isfinite(grad_x) and math.isfinite(grad_y)):
+        return n_iter, n_calls, x, y, value, NOT_FINITE
+    if math.sqrt(grad_x * grad_x + grad_y * grad_y) < epsilon:
+        return n_iter, n_calls, x, y, value, CONVERGED
+    if max_iter <= 0:
+        return n_iter, n_calls, x, y, value, MAX_ITER
+
+    while True:
+        s_x = -alpha * (h_xx * grad_x + h_xy * grad_y)
+        s_y = -alpha * (h_xy * grad_x + h_yy * grad_y)
+        x_new, y_new = x + s_x, y + s_y
+
+        value_new, grad_x_new, grad_y_new = kernel(x_new, y_new)
+        n_calls += 1
+
+        finite = math.isfinite(x_new) and math.isfinite(y_new) and math.isfinite(value_new)
+        if not (finite and math.isfinite(grad_x_new) and math.isfinite(grad_y_new)):
+            return n_iter, n_calls, x, y, value, NOT_FINITE
+
+        '''
+        H_inv = (I - rho s d^T) H_inv (I - rho d s^T) + rho s s^T,
+        reset to the identity on a curvature failure
+        '''
+        d_x, d_y = grad_x_new - grad_x, grad_y_new - grad_y
+        curvature = d_x * s_x + d_y * s_y
+
+        curvature_ok = curvature > CURVATURE_COEF * math.sqrt((s_x * s_x + s_y * s_y) * (d_x * d_x + d_y * d_y))
+
+        if curvature_ok:
+            rho = 1 / curvature
+
+            hd_x = h_xx * d_x + h_xy * d_y
+            hd_y = h_xy * d_x + h_yy * d_y
+            dhd = d_x * hd_x + d_y * hd_y
+            scale = rho * (1 + rho * dhd)
+
+            h_xx += scale * s_x * s_x - rho * 2 * s_x * hd_x
+            h_xy += scale * s_x * s_y - rho * (s_x * hd_y + s_y * hd_x)
+            h_yy += scale * s_y * s_y - rho * 2 * s_y * hd_y
+
+        if not (curvature_ok and math.isfinite(h_xx) and math.isfinite(h_xy) and math.isfinite(h_yy)):
+            h_xx, h_xy, h_yy = 1.0, 0.0, 1.0
+
+        step_norm = math.sqrt(s_x * s_x + s_y * s_y)
+        x_norm = math.sqrt(x * x + y * y)
+        f_change = abs(value - value_new)
+        f_scale = max(abs(value), abs(value_new), 1.0)
+
+        x, y, value, grad_x, grad_y = x_new, y_new, value_new, grad_x_new, grad_y_new
+        n_iter += 1
+        history[n_iter, 0], history[n_iter, 1] = x, y
+
+        if math.sqrt(grad_x * grad_x + grad_y * grad_y) < epsilon:
+            return n_iter, n_calls, x, y, value, CONVERGED
+        if f_tol > 0 and f_change <= f_tol * f_scale:
+            return n_iter, n_calls, x, y, value, F_TOL
+        if x_tol > 0 and step_norm <= x_tol * (x_norm + x_tol):
+            return n_iter, n_calls, x, y, value, X_TOL
+        if n_iter >= max_iter:
+            return n_iter, n_calls, x, y, value, MAX_ITER
+        if n_calls >= max_grad_calls:
+            return n_iter, n_calls, x, y, value, MAX_GRAD_CALLS
+        if n_iter % TIME_CHECK_PERIOD == 0 and __elapsed(start_time) >= max_time:
+            return n_iter, n_calls, x, y, value, TIME_LIMIT
+
+
+if NUMBA_AVAILABLE:
+    _batch_loop = numba.njit(__batch_loop)
+    __elapsed = numba.njit(__elapsed)
+    _bfgs_loop = numba.njit(__bfgs_loop)
+
+
+class JitKernel:
+    '''
+    Fused kernel, compiled with numba. Has the same semantics as the kernels,
+    built by toolbar_utils.build_value_and_grad: given a point of shape (2,) it
+    returns a float and an array of shape (2,), given a batch of shape (2, ...)
+    it returns arrays of shapes (...) and (2, ...) of the type of the batch.
+    The kernel itself always computes in float64
+    '''
+
+    def __init__(self, scalar: Callable[[float, float], Tuple[float, float, float]]) -> None:
+        self.scalar = scalar
+
+    def __call__(self, point: np.ndarray) -> Tuple[Any, np.ndarray]:
+        if np.ndim(point[0]) == 0:
+            value, grad_x, grad_y = self.scalar(float(point[0]), float(point[1]))
+            return value, np.array([grad_x, grad_y])
+
+        dtype = floating_dtype(point)
+        xs = np.ascontiguousarray(point[0], dtype=dtype)
+        ys = np.ascontiguousarray(point[1], dtype=dtype)
+
+        values = np.empty(xs.shape, dtype=dtype)
+        grad = np.empty((2, *xs.shape), dtype=dtype)
+
+        _batch_loop(self.scalar, xs.reshape(-1), ys.reshape(-1),
+                    values.reshape(-1), grad[0].reshape(-1), grad[1].reshape(-1))
+
+        return values, grad
+
+
+def build_jit_value_and_grad(func: sympy.Expr,
+                             derivatives: Optional[Tuple[sympy.Expr, sympy.Expr]] = None) -> Optional[JitKernel]:
+    '''
+    Compiles the fused kernel of the objective function with numba
+
+    Parameters
+    ----------
+    func : sympy.Expr
+        Objective function of x and y
+    derivatives : Optional[Tuple[sympy.Expr, sympy.Expr]]
+        Partial derivatives of the function. If None, the function is differentiated
+
+    Returns
+    -------
+    Optional[JitKernel]
+        Kernel or None, if numba is not available or the function can not be compiled
+    '''
+
+    if not NUMBA_AVAILABLE:
+        logger.warning('numba is not available')
+        return None
+
+    logger.debug('Compiling kernel')
+
+    try:
+        source = generate_kernel_source(func, derivatives)
+        namespace: Dict[str, Any] = {'math': math}
+        exec(source, namespace)
+        scalar = numba.njit(namespace[KERNEL_NAME])
+        scalar(*COMPILATION_POINT)
+
+    except Exception as e:
+        '''
+        printing and compilation errors have too many types to be listed
+        '''
+        logger.warning(f'Unable to compile the function: {e}')
+        return None
+
+    return JitKernel(scalar)
+
+
+def jit_bfgs(kernel: JitKernel, x_0: np.ndarray, alpha: float, termination: Termination,
+             history_dtype: DTypeLike = np.float64) -> Tuple[int, int, np.ndarray, float, Status, np.ndarray]:
+    '''
+    Runs the whole BFGS loop in compiled code, avoiding the python overhead
+    of each iteration, which dominates for two-dimensional problems
+
+    Parameters
+    ----------
+    kernel : JitKernel
+        Compiled kernel
+    x_0 : np.ndarray
+        Initial approximation
+    alpha : float
+        Step of the algorithm
+    termination : Termination
+        Stopping criteria
+    history_dtype : DTypeLike
+        Type of the stored history. The iterations are made in float64 anyway
+
+    Returns
+    -------
+    Tuple[int, int, np.ndarray, float, Status, np.ndarray]
+        Number of iterations, number of kernel calls, the last point, the value at it,
+        the reason of the termination and the history
+    '''
+
+    history = np.empty((max(termination.max_iter, 0) + 1, len(x_0)), dtype=history_dtype)
+
+    max_grad_calls = sys.maxsize if termination.max_grad_calls is None else termination.max_grad_calls
+    max_time = np.inf if termination.max_time is None else termination.max_time
+
+    n_iter, n_calls, x, y, value, status = _bfgs_loop(kernel.scalar, np.array(x_0, dtype=float), alpha,
+                                                      termination.epsilon, max_grad_calls, max_time,
+                                                      termination.f_tol, termination.x_tol, perf_counter(), history)
+
+    return n_iter, n_calls, np.array([x, y]), value, Status(status), history[:n_iter + 1].copy()
@@ -0,0 +1,160 @@
+import numpy as np
+
+from typing import Any
+
+from pathlib import Path
+
+from .utils import get_logger
+
+
+logger = get_logger(Path(__file__).name)
+
+
+'''
+scales of the contour levels: the log scale is dense near the minimum of the surface,
+the symlog scale is dense near zero and handles the surfaces of both signs and of huge ranges,
+the quantile scale (histogram equalization) puts the same share of the grid between the levels
+'''
+LOG_SCALE = 'log'
+SYMLOG_SCALE = 'symlog'
+QUANTILE_SCALE = 'quantile'
+LINEAR_SCALE = 'linear'
+LEVEL_SCALES = (LOG_SCALE, SYMLOG_SCALE, QUANTILE_SCALE, LINEAR_SCALE)
+DEFAULT_LEVEL_SCALE = LOG_SCALE
+
+'''
+the linear part of the symlog scale spans the absolute values below this quantile,
+and the log scale is linear for the distances to the minimum below this quantile
+'''
+LINTHRESH_QUANTILE = 0.05
+
+LOG_OVERFLOW = 700.0  # np.expm1 overflows float64 above ~709.78
+
+
+class GridLevels:
+    '''
+    Contour level selection for an evaluated grid. The statistics of the grid
+    (the sorted finite values and the threshold of the symlog scale) are computed once,
+    so the levels for another number of lines or another scale are computed
+    in O(number of levels) without touching the grid.
+
+    The non-finite values (NaN and infinity) are ignored. The levels lie strictly
+    between the minimum and the maximum of the finite values, so a constant grid has no levels
+
+    Parameters
+    ----------
+    Z : Any
+        Function values on the grid of any shape and floating point type
+    '''
+
+    def __init__(self, Z: Any) -> None:
+        values = np.asarray(Z, dtype=np.float64).ravel()
+        finite = values[np.isfinite(values)]
+
+        self.sorted = np.sort(finite)
+        self.n_nonfinite = values.size - finite.size
+
+        '''
+        the units of the log scale (of the distance to the minimum) and of the linear part
+        of the symlog scale (of the absolute value) are the small quantiles of these values,
+        so the scales do not depend on the units of the function
+        '''
+        with np.errstate(over='ignore'):
+            self.log_unit = self.__unit(self.sorted - self.sorted[0]) if finite.size else 1.0
+        self.linthresh = self.__unit(np.sort(np.abs(finite)))
+
+    @property
+    def empty(self) -> bool:
+        '''
+        Whether the grid has less than two distinct finite values
+        '''
+        return not self.sorted.size or not self.sorted[-1] > self.sorted[0]
+
+    def levels(self, num_levels: int, scale: str = DEFAULT_LEVEL_SCALE) -> np.ndarray:
+        '''
+        Selects the contour levels
+
+        Parameters
+        ----------
+        num_levels : int
+            Desired number of levels. Fewer levels are returned, if some of them coincide
+            (e.g. the quantiles of a grid with plateaus)
+        scale : str
+            One of LEVEL_SCALES
+
+        Returns
+        -------
+        np.ndarray
+            Strictly increasing levels
+        '''
+
+        assert scale in LEVEL_SCALES
+        assert num_levels > 0
+
+        if self.empty:
+            return np.empty(0)
+
+        low, high = self.sorted[0], self.sorted[-1]
+
+        '''
+        the levels are placed uniformly in the transformed space, excluding the ends
+        '''
+        fractions = np.arange(1, num_levels + 1) / (num_levels + 1)
+
+        with np.errstate(over='ignore', invalid='ignore'):
+            if scale == LOG_SCALE and np.isfinite(high - low):
+                t_high = self.__log(high - low, self.log_unit)
+                levels = low + self.__log_inverse(fractions * t_high, self.log_unit)
+            elif scale in (LOG_SCALE, SYMLOG_SCALE):
+                '''
+                the symlog scale, which is also used instead of the log scale, when the range overflows
+                '''
+                t_low = np.sign(low) * self.__log(abs(low), self.linthresh)
+                t_high = np.sign(high) * self.__log(abs(high), self.linthresh)
+                t = t_low + fractions * (t_high - t_low)
+                levels = np.sign(t) * self.__log_inverse(np.abs(t), self.linthresh)
+            elif scale == QUANTILE_SCALE:
+                levels = self.__quantile(self.sorted, fractions)
+            else:
+                '''
+                interpolating between the ends does not overflow, even if their difference does
+                '''
+                levels = low * (1 - fractions) + high * fractions
+
+        levels = np.unique(levels)
+        return levels[(levels > low) & (levels < high)]
+
+    @staticmethod
+    def __log(z: Any, unit: float) -> Any:
+        '''
+        log(1 + z / unit) for z >= 0, computed as log(max) + log(1 + min / max) - log(unit),
+        where max and min are taken of z and unit, so that neither z / unit nor z + unit overflow
+        '''
+        larger = np.maximum(z, unit)
+        return np.log(larger) + np.log1p(np.minimum(z, unit) / larger) - np.log(unit)
+
+    @staticmethod
+    def __log_inverse(t: Any, unit: float) -> Any:
+        return np.where(t < LOG_OVERFLOW, unit * np.expm1(np.minimum(t, LOG_OVERFLOW)), np.exp(t + np.log(unit)) - unit)
+
+    @classmethod
+    def __unit(cls, values: np.ndarray) -> float:
+        '''
+        returns the LINTHRESH_QUANTILE quantile of the positive sorted values, or 1, if there are none
+        '''
+        positive = values[(values > 0) & np.isfinite(values)]
+        if not positive.size:
+            return 1.0
+        return float(cls.__quantile(positive, np.array([LINTHRESH_QUANTILE]))[0])
+
+    @staticmethod
+    def __quantile(sorted_values: np.ndarray, fractions: np.ndarray) -> np.ndarray:
+        '''
+        linear interpolation between the order statistics, as in np.quantile,
+        but without sorting the values again
+        '''
+        positions = fractions * (sorted_values.size - 1)
+        lower = np.floor(positions).astype(int)
+        upper = np.minimum(lower + 1, sorted_values.size - 1)
+        weights = positions - lower
+        return sorted_values[lower] * (1 - weights) + sorted_values[upper] * weights
@@ -1,7 +1,10 @@
 from PyQt5.QtWidgets import QWidget, QHBoxLayout
+from PyQt5.QtGui import QCloseEvent
 
 from pathlib import Path
 
+from typing import Optional
+
 from canvas import Canvas
 from canvastoolbar import CanvasToolBar
 from utils import get_logger
@@ -12,7 +15,7 @@ logger = get_logger(Path(__file__).name)
 
 WINDOW_SIZE = (800, 600)
 WINDOW_POS = (100, 100)
-WINDOW_TITLE = 'BFGS visualizer'
+WINDOW_TITLE = 'Gradient methods visualizer'
 
 
 class MainWindow(QWidget):
@@ -28,10 +31,18 @@ class MainWindow(QWidget):
 
         layout = QHBoxLayout()
     
-        canvas = Canvas()
-        toolbar = CanvasToolBar(canvas)
-
-        layout.addWidget(canvas)
-        layout.addWidget(toolbar)
+        '''
+        the surface is evaluated by the background worker, so panning and zooming
+        do not block the window, while the newly exposed tiles are computed
+        '''
+        self.canvas = Canvas(background_tiles=True)
+        self.toolbar = CanvasToolBar(self.canvas)
+
+        layout.addWidget(self.canvas)
+        layout.addWidget(self.toolbar)
         
         self.setLayout(layout)
+
+    def closeEvent(self, event: Optional[QCloseEvent]) -> None:
+        self.canvas.shutdown()
+        super().closeEvent(event)
@@ -0,0 +1,664 @@
+import numpy as np
+from numpy.typing import DTypeLike
+
+from abc import ABC, abstractmethod
+from inspect import isabstract
+
+from typing import Dict, Callable, Any, Tuple, Optional, Type, List
+
+from pathlib import Path
+
+from time import perf_counter
+
+from .utils import CountCalls, get_logger, trace_span, TRACE
+from .jit import JitKernel, jit_bfgs
+from .termination import Termination, Status, SUCCESS_STATUSES, DEFAULT_MAX_ITER, CURVATURE_COEF
+
+
+logger = get_logger(Path(__file__).name)
+
+
+'''
+Kernel, returning the value of the objective function
+(or None, if only the gradient is known) and its gradient
+'''
+ValueAndGrad = Callable[[np.ndarray], Tuple[Optional[float], np.ndarray]]
+
+HISTORY_INITIAL_CAPACITY = 64
+
+ARMIJO_COEF = 1e-4
+BACKTRACKING_COEF = 0.5
+MAX_BACKTRACKING_STEPS = 30
+
+
+def __make_result_dict(*, x: np.ndarray,
+                       n_iter: int,
+                       n_grad_calls: int,
+                       status: Status,
+                       fun: Optional[float] = None,
+                       method: str = '',
+                       time: float = 0.0) -> Dict['str', Any]:
+    '''
+    Utility function, used to ensure that all
+    of the expected results are included into the
+    result dictionary
+
+    Parameters
+    ----------
+    x : np.ndarray
+        Solution
+    n_iter : int
+        Number of iterations
+    n_grad_calls : int
+        Number of gradient calls
+    status : Status
+        Reason of the termination. The run is successful,
+        if the status is one of SUCCESS_STATUSES
+    fun : Optional[float]
+        Value of the objective function at the solution,
+        if the function itself is available
+    method : str
+        Name of the method
+    time : float
+        Wall time of the run in seconds
+
+    Returns
+    -------
+    Dict['str', Any]
+        Result dictionary
+    '''
+    return dict(x=x, n_iter=n_iter,
+                n_grad_calls=n_grad_calls,
+                success=status in SUCCESS_STATUSES,
+                status=status, fun=fun,
+                method=method, time=time)
+
+
+class HistoryBuffer:
+    '''
+    Preallocated storage for the iteration history. The capacity is doubled,
+    when the buffer is full, so appending a point is amortized O(1) and
+    the history is not rebuilt from a list of small arrays in the end.
+    The points are stored in the given type, which may be narrower, than the type of the iterations
+    '''
+
+    def __init__(self, dim: int, capacity: int = HISTORY_INITIAL_CAPACITY, dtype: DTypeLike = np.float64) -> None:
+        self.__data = np.empty((capacity, dim), dtype=dtype)
+        self.__size = 0
+
+    def __len__(self) -> int:
+        return self.__size
+
+    def append(self, x: np.ndarray) -> None:
+        if self.__size == len(self.__data):
+            self.__data = np.concatenate([self.__data, np.empty_like(self.__data)])
+        self.__data[self.__size] = x
+        self.__size += 1
+
+    def array(self) -> np.ndarray:
+        '''
+        Returns
+        -------
+        np.ndarray
+            Copy of the stored history of shape (n, dim)
+        '''
+        return self.__data[:self.__size].copy()
+
+
+def recalc_hess_inv(H: np.ndarray, s: np.ndarray, y: np.ndarray) -> np.ndarray:
+    '''
+    Computes new approximation of the inverse of hessian.
+    The notation the same as here https://ru.wikipedia.org/wiki/Алгоритм_Бройдена_—_Флетчера_—_Гольдфарба_—_Шанно
+
+    Parameters
+    ----------
+    H : numpy.ndarray
+        Current approximation
+    s: numpy.ndarray
+        x_k+1 - x_k
+    y: numpy.ndarray
+        grad(x_k+1) - grad(x_k)
+
+    '''
+
+    rho = 1 / y.T.dot(s)
+    eye = np.eye(H.shape[0])
+    return (eye - rho * s.dot(y.T)).dot(H).dot(eye - rho * y.dot(s.T)) + rho * s.dot(s.T)
+
+
+def backtracking_line_search(value_and_grad: ValueAndGrad, x: np.ndarray,
+                             value: Optional[float], grad: np.ndarray,
+                             direction: np.ndarray, alpha: float) -> Tuple[np.ndarray, Optional[float], np.ndarray]:
+    '''
+    Backtracking line search with the Armijo condition. The fused kernel
+    gives the gradient at the accepted point for free, so no extra calls are made.
+    If the value of the objective function is unknown, the full step is taken
+
+    Parameters
+    ----------
+    value_and_grad : ValueAndGrad
+        Objective function kernel
+    x : np.ndarray
+        Current point
+    value : Optional[float]
+        Objective function value at the current point
+    grad : np.ndarray
+        Gradient at the current point
+    direction : np.ndarray
+        Descent direction
+    alpha : float
+        Initial step
+
+    Returns
+    -------
+    Tuple[np.ndarray, Optional[float], np.ndarray]
+        New point, the objective function value and the gradient at this point
+    '''
+
+    slope = grad.dot(direction)
+
+    for _ in range(MAX_BACKTRACKING_STEPS):
+        x_new = x + alpha * direction
+        value_new, grad_new = value_and_grad(x_new)
+
+        if value is None or value_new is None or value_new <= value + ARMIJO_COEF * alpha * slope:
+            break
+
+        alpha *= BACKTRACKING_COEF
+
+    return x_new, value_new, np.asarray(grad_new)
+
+
+class Optimizer(ABC):
+    '''
+    Base class of the gradient methods. An instance is created for each run,
+    so it stores the state of the method (momentum, approximation of the hessian etc.).
+    A subclass, that does not implement the abstract hooks, can not be instantiated
+
+    The driver calls step until the stopping criterion is met. The step may evaluate
+    the objective function kernel as many times as it needs, but it is expected to return
+    the value and the gradient at the new point, so that they are not evaluated twice
+    '''
+
+    name = ''
+    title = ''
+    default_alpha = 1.0
+
+    def __init__(self, alpha: Optional[float] = None) -> None:
+        self.alpha = self.default_alpha if alpha is None else alpha
+
+    def start(self, x: np.ndarray, value: Optional[float], grad: np.ndarray) -> None:
+        '''
+        Initializes the state of the method at the initial approximation
+        '''
+
+    @abstractmethod
+    def step(self, x: np.ndarray, value: Optional[float], grad: np.ndarray,
+             value_and_grad: ValueAndGrad) -> Tuple[np.ndarray, Optional[float], np.ndarray]:
+        '''
+        Makes one iteration of the method
+
+        Parameters
+        ----------
+        x : np.ndarray
+            Current point
+        value : Optional[float]
+            Objective function value at the current point
+        grad : np.ndarray
+            Gradient at the current point
+        value_and_grad : ValueAndGrad
+            Objective function kernel
+
+        Returns
+        -------
+        Tuple[np.ndarray, Optional[float], np.ndarray]
+            New point, the objective function value and the gradient at this point
+        '''
+
+
+OPTIMIZERS: Dict[str, Type[Optimizer]] = {}
+
+
+def register_optimizer(cls: Type[Optimizer]) -> Type[Optimizer]:
+    '''
+    Class decorator, that adds an optimizer to the registry under its name
+    '''
+
+    assert cls.name and cls.name not in OPTIMIZERS
+    assert not isabstract(cls), f'{cls.__name__} does not implement {", ".join(cls.__abstractmethods__)}'
+    OPTIMIZERS[cls.name] = cls
+    return cls
+
+
+@register_optimizer
+class GradientDescent(Optimizer):
+    name = 'gd'
+    title = 'Gradient descent'
+    default_alpha = 0.1
+
+    def step(self, x: np.ndarray, value: Optional[float], grad: np.ndarray,
+             value_and_grad: ValueAndGrad) -> Tuple[np.ndarray, Optional[float], np.ndarray]:
+        x_new = x - self.alpha * grad
+        value_new, grad_new = value_and_grad(x_new)
+        return x_new, value_new, np.asarray(grad_new)
+
+
+@register_optimizer
+class Momentum(Optimizer):
+    name = 'momentum'
+    title = 'Momentum'
+    default_alpha = 0.1
+    beta = 0.9
+
+    def start(self, x: np.ndarray, value: Optional[float], grad: np.ndarray) -> None:
+        self.velocity = np.zeros_like(x, dtype=float)
+
+    def step(self, x: np.ndarray, value: Optional[float], grad: np.ndarray,
+             value_and_grad: ValueAndGrad) -> Tuple[np.ndarray, Optional[float], np.ndarray]:
+        self.velocity = self.beta * self.velocity - self.alpha * grad
+        x_new = x + self.velocity
+        value_new, grad_new = value_and_grad(x_new)
+        return x_new, value_new, np.asarray(grad_new)
+
+
+@register_optimizer
+class Nesterov(Momentum):
+    '''
+    Nesterov accelerated gradient in the form, where the gradient is evaluated
+    only at the iterates, so each step costs one kernel call
+    '''
+
+    name = 'nesterov'
+    title = 'Nesterov'
+
+    def step(self, x: np.ndarray, value: Optional[float], grad: np.ndarray,
+             value_and_grad: ValueAndGrad) -> Tuple[np.ndarray, Optional[float], np.ndarray]:
+        self.velocity = self.beta * self.velocity - self.alpha * grad
+        x_new = x + self.beta * self.velocity - self.alpha * grad
+        value_new, grad_new = value_and_grad(x_new)
+        return x_new, value_new, np.asarray(grad_new)
+
+
+@register_optimizer
+class Adam(Optimizer):
+    name = 'adam'
+    title = 'Adam'
+    default_alpha = 0.1
+    beta_1 = 0.9
+    beta_2 = 0.999
+    eps = 1e-8
+
+    def start(self, x: np.ndarray, value: Optional[float], grad: np.ndarray) -> None:
+        self.m = np.zeros_like(x, dtype=float)
+        self.v = np.zeros_like(x, dtype=float)
+        self.t = 0
+
+    def step(self, x: np.ndarray, value: Optional[float], grad: np.ndarray,
+             value_and_grad: ValueAndGrad) -> Tuple[np.ndarray, Optional[float], np.ndarray]:
+        self.t += 1
+        self.m = self.beta_1 * self.m + (1 - self.beta_1) * grad
+        self.v = self.beta_2 * self.v + (1 - self.beta_2) * grad**2
+
+        m_hat = self.m / (1 - self.beta_1**self.t)
+        v_hat = self.v / (1 - self.beta_2**self.t)
+
+        x_new = x - self.alpha * m_hat / (v_hat**0.5 + self.eps)
+        value_new, grad_new = value_and_grad(x_new)
+        return x_new, value_new, np.asarray(grad_new)
+
+
+class ConjugateGradient(Optimizer):
+    '''
+    Nonlinear conjugate gradient method with the backtracking line search.
+    The direction is reset to the antigradient every n iterations
+    and whenever it stops being a descent direction
+    '''
+
+    default_alpha = 1.0
+
+    @abstractmethod
+    def beta(self, grad: np.ndarray, grad_new: np.ndarray) -> float:
+        '''
+        Computes the coefficient of the previous direction in the new one
+
+        Parameters
+        ----------
+        grad : numpy.ndarray
+            Gradient at the previous point
+        grad_new : numpy.ndarray
+            Gradient at the new point
+        '''
+
+    def start(self, x: np.ndarray, value: Optional[float], grad: np.ndarray) -> None:
+        self.direction = -grad
+        self.n_steps = 0
+
+    def step(self, x: np.ndarray, value: Optional[float], grad: np.ndarray,
+             value_and_grad: ValueAndGrad) -> Tuple[np.ndarray, Optional[float], np.ndarray]:
+        x_new, value_new, grad_new = backtracking_line_search(value_and_grad, x, value, grad,
+                                                              self.direction, self.alpha)
+        self.n_steps += 1
+
+        self.direction = -grad_new + self.beta(grad, grad_new) * self.direction
+
+        if self.n_steps % len(x) == 0 or grad_new.dot(self.direction) >= 0:
+            self.direction = -grad_new
+
+        return x_new, value_new, grad_new
+
+
+@register_optimizer
+class FletcherReeves(ConjugateGradient):
+    name = 'cg-fr'
+    title = 'CG (Fletcher-Reeves)'
+
+    def beta(self, grad: np.ndarray, grad_new: np.ndarray) -> float:
+        return float(grad_new.dot(grad_new) / grad.dot(grad))
+
+
+@register_optimizer
+class PolakRibiere(ConjugateGradient):
+    name = 'cg-pr'
+    title = 'CG (Polak-Ribiere)'
+
+    def beta(self, grad: np.ndarray, grad_new: np.ndarray) -> float:
+        return max(0.0, float(grad_new.dot(grad_new - grad) / grad.dot(grad)))
+
+
+class QuasiNewton(Optimizer):
+    '''
+    Quasi-Newton method, that maintains an approximation of the inverse of hessian
+    '''
+
+    default_alpha = 1.0
+
+    @abstractmethod
+    def update(self, H: np.ndarray, s: np.ndarray, y: np.ndarray) -> np.ndarray:
+        '''
+        Computes new approximation of the inverse of hessian
+
+        Parameters
+        ----------
+        H : numpy.ndarray
+            Current approximation
+        s: numpy.ndarray
+            x_k+1 - x_k as a column
+        y: numpy.ndarray
+            grad(x_k+1) - grad(x_k) as a column
+        '''
+
+    def curvature_ok(self, s: np.ndarray, y: np.ndarray) -> bool:
+        '''
+        Checks the curvature condition s^T y > 0, required by the update
+        to keep the approximation positive definite
+        '''
+        return s.T.dot(y).item() > CURVATURE_COEF * np.linalg.norm(s) * np.linalg.norm(y)
+
+    def start(self, x: np.ndarray, value: Optional[float], grad: np.ndarray) -> None:
+        self.H_inv = np.eye(len(x))
+        self.n_resets = 0
+
+    def step(self, x: np.ndarray, value: Optional[float], grad: np.ndarray,
+             value_and_grad: ValueAndGrad) -> Tuple[np.ndarray, Optional[float], np.ndarray]:
+        p = self.H_inv.dot(grad)
+        x_new = x - self.alpha * p
+
+        value_new, grad_new = value_and_grad(x_new)
+        grad_new = np.asarray(grad_new)
+
+        s = (x_new - x).reshape(-1, 1)
+        y = (grad_new - grad).reshape(-1, 1)
+
+        H_inv = self.update(self.H_inv, s, y) if self.curvature_ok(s, y) else None
+
+        '''
+        on a curvature failure the approximation is reset to the identity,
+        so the next step is a gradient descent step
+        '''
+        if H_inv is None or not np.all(np.isfinite(H_inv)):
+            logger.debug('Curvature failure, resetting the approximation of the inverse hessian')
+            H_inv = np.eye(len(x))
+            self.n_resets += 1
+
+        self.H_inv = H_inv
+
+        return x_new, value_new, grad_new
+
+
+@register_optimizer
+class BFGS(QuasiNewton):
+    name = 'bfgs'
+    title = 'BFGS'
+
+    def update(self, H: np.ndarray, s: np.ndarray, y: np.ndarray) -> np.ndarray:
+        return recalc_hess_inv(H, s, y)
+
+
+@register_optimizer
+class DFP(QuasiNewton):
+    name = 'dfp'
+    title = 'DFP'
+
+    def update(self, H: np.ndarray, s: np.ndarray, y: np.ndarray) -> np.ndarray:
+        Hy = H.dot(y)
+        return H + s.dot(s.T) / y.T.dot(s) - Hy.dot(Hy.T) / y.T.dot(Hy)
+
+
+@register_optimizer
+class SR1(QuasiNewton):
+    name = 'sr1'
+    title = 'SR1'
+    skip_coef = 1e-8
+
+    def curvature_ok(self, s: np.ndarray, y: np.ndarray) -> bool:
+        '''
+        SR1 does not keep the approximation positive definite, so the negative curvature is allowed
+        '''
+        return True
+
+    def update(self, H: np.ndarray, s: np.ndarray, y: np.ndarray) -> np.ndarray:
+        r = s - H.dot(y)
+        denominator = r.T.dot(y).item()
+
+        '''
+        the update is skipped, when the denominator is close to zero
+        '''
+        if abs(denominator) < self.skip_coef * np.linalg.norm(r) * np.linalg.norm(y):
+            return H
+
+        return H + r.dot(r.T) / denominator
+
+
+def make_value_and_grad(grad_f: Optional[Callable[[np.ndarray], np.ndarray]],
+                        value_and_grad: Optional[ValueAndGrad]) -> ValueAndGrad:
+    '''
+    Returns the fused kernel, if it is given, otherwise wraps
+    the gradient into a kernel, that does not know the function values
+
+    Parameters
+    ----------
+    grad_f : Optional[Callable[[np.ndarray], np.ndarray]]
+        Objective function gradient
+    value_and_grad : Optional[ValueAndGrad]
+        Fused kernel
+
+    Returns
+    -------
+    ValueAndGrad
+        Kernel
+    '''
+
+    if value_and_grad is not None:
+        return value_and_grad
+
+    assert grad_f is not None
+
+    def grad_only(x: np.ndarray) -> Tuple[Optional[float], np.ndarray]:
+        assert grad_f is not None
+        return None, grad_f(x)
+
+    return grad_only
+
+
+def get_optimizer(name: str, alpha: Optional[float] = None) -> Optimizer:
+    '''
+    Creates an optimizer by its name
+
+    Parameters
+    ----------
+    name : str
+        Name of the method, one of the keys of OPTIMIZERS
+    alpha : Optional[float]
+        Step of the method. If None, the default step of the method is used
+
+    Returns
+    -------
+    Optimizer
+        Optimizer
+    '''
+
+    if name not in OPTIMIZERS:
+        raise ValueError(f'Unknown method: {name}')
+
+    return OPTIMIZERS[name](alpha)
+
+
+def optimize(method: str, value_and_grad: ValueAndGrad,
+             x_0: np.ndarray, epsilon: float, alpha: Optional[float] = None,
+             max_iter: int = DEFAULT_MAX_ITER, max_grad_calls: Optional[int] = None,
+             max_time: Optional[float] = None, f_tol: float = 0.0, x_tol: float = 0.0,
+             history_dtype: DTypeLike = np.float64) -> Tuple[Dict['str', Any], np.ndarray]:
+    '''
+    Common driver of the gradient methods. Iterates until the norm of the gradient
+    is less than epsilon or another stopping criterion of Termination is met.
+    The reason of the termination is reported in the 'status' field of the result
+
+    Parameters
+    ----------
+    method : str
+        Name of the method, one of the keys of OPTIMIZERS
+    value_and_grad: ValueAndGrad
+        Objective function kernel
+    x_0 : np.ndarray
+        Initial approximation
+    epsilon : float
+        Desired precision
+    alpha : Optional[float]
+        Step of the method. If None, the default step of the method is used
+    max_iter : int
+        Maximal number of iterations
+    max_grad_calls : Optional[int]
+        Maximal number of gradient calls, unlimited if None
+    max_time : Optional[float]
+        Maximal wall time in seconds, unlimited if None
+    f_tol : float
+        Relative tolerance of the function value change, disabled if zero
+    x_tol : float
+        Relative tolerance of the step, disabled if zero
+    history_dtype : DTypeLike
+        Type of the stored history (see precision.DtypePolicy). The iterations
+        and the approximations of the hessian are computed in float64 anyway
+
+    Returns
+    -------
+    Tuple[Dict['str', Any], numpy.ndarray]
+        Tuple of the result dictionary and the history. If the method has produced
+        NaN or infinity, the history and the solution end at the last finite point
+    '''
+
+    logger.debug(f'Optimizing with {method}')
+
+    start_time = perf_counter()
+
+    optimizer = get_optimizer(method, alpha)
+    termination = Termination(epsilon, max_iter, max_grad_calls, max_time, f_tol, x_tol)
+
+    '''
+    the level is checked once, so that disabled tracing
+    costs a single boolean check per iteration
+    '''
+    tracing = logger.isEnabledFor(TRACE)
+
+    '''
+    BFGS with a compiled kernel runs entirely in compiled code,
+    unless the iterations have to be traced
+    '''
+    if isinstance(value_and_grad, JitKernel) and isinstance(optimizer, BFGS) and not tracing:
+        n_iter, n_grad_calls, jit_x, jit_value, jit_status, history_array = jit_bfgs(
+            value_and_grad, x_0, optimizer.alpha, termination, history_dtype
+        )
+
+        result_dict = __make_result_dict(
+            x=jit_x,
+            n_iter=n_iter,
+            n_grad_calls=n_grad_calls,
+            status=jit_status,
+            fun=jit_value,
+            method=method,
+            time=perf_counter() - start_time
+        )
+
+        return result_dict, history_array
+
+    kernel = CountCalls(value_and_grad)
+
+    x = np.array(x_0, dtype=float)
+    value, grad = kernel(x)
+    grad = np.asarray(grad)
+
+    history = HistoryBuffer(len(x), dtype=history_dtype)
+    history.append(x)
+
+    n_iter = 0
+    status = termination.start(value, grad)
+
+    if status is None:
+        optimizer.start(x, value, grad)
+
+    with trace_span(logger, 'optimize', method=method):
+        while status is None:
+            x_new, value_new, grad_new = optimizer.step(x, value, grad, kernel)
+
+            status = termination.check(n_iter + 1, kernel.n_calls, x, value, x_new, value_new, grad_new)
+
+            '''
+            a non-finite point is not accepted, so the run
+            ends at the last finite point
+            '''
+            if status == Status.NOT_FINITE:
+                break
+
+            x, value, grad = x_new, value_new, grad_new
+            history.append(x)
+            n_iter += 1
+
+            if tracing:
+                logger.log(TRACE, 'iteration', extra={'fields': dict(
+                    method=method, n_iter=n_iter, fun=value, grad_norm=np.linalg.norm(grad)
+                )})
+
+    logger.debug(f'{method} terminated with status {status}')
+
+    assert status is not None
+
+    result_dict = __make_result_dict(
+        x=x,
+        n_iter=n_iter,
+        n_grad_calls=kernel.n_calls,
+        status=status,
+        fun=value,
+        method=method,
+        time=perf_counter() - start_time
+    )
+
+    return result_dict, history.array()
+
+
+def optimizer_titles() -> List[Tuple[str, str]]:
+    '''
+    Returns
+    -------
+    List[Tuple[str, str]]
+        Names and human-readable titles of the registered optimizers
+    '''
+    return [(name, cls.title) for name, cls in OPTIMIZERS.items()]
@@ -0,0 +1,509 @@
+import math
+import re
+from decimal import Decimal
+
+import sympy
+
+from typing import Tuple, List, Dict, Callable, Optional, Any
+
+from pathlib import Path
+
+from .utils import get_logger
+from .errors import Error
+
+
+logger = get_logger(Path(__file__).name)
+
+
+'''
+Limits of the accepted expressions. The expressions, typed in by a user,
+are short, so the limits reject only the inputs, that would stall sympy
+'''
+MAX_INPUT_LENGTH = 1000  # number of characters
+MAX_DEPTH = 40  # nesting of the parentheses, the unary operators and the powers
+MAX_NODES = 500  # number of nodes of the syntax tree
+MAX_EXPONENT = 1000  # absolute value of a constant exponent
+MAX_CONSTANT_DIGITS = 2000  # estimated number of digits of an exactly evaluated constant
+MAX_COST = 50000  # estimated size of the expression and its partial derivatives
+
+SYMBOLS: Dict[str, sympy.Symbol] = {name: sympy.Symbol(name) for name in ('x', 'y')}
+
+'''
+the kernels are evaluated on real inputs only, so the expressions are differentiated
+with respect to the real symbols to get the derivatives of functions like Abs in a printable form
+'''
+REAL_SYMBOLS: Dict[str, sympy.Symbol] = {name: sympy.Symbol(name, real=True) for name in SYMBOLS}
+
+CONSTANTS: Dict[str, sympy.Expr] = {
+    'pi': sympy.pi,
+    'E': sympy.E,
+}
+
+'''
+the allow-list of the functions of a single argument. It matches the functions,
+supported by the autodiff backend, so every backend accepts a parsed expression
+'''
+FUNCTIONS: Dict[str, Callable[[sympy.Expr], sympy.Expr]] = {
+    'sin': sympy.sin,
+    'cos': sympy.cos,
+    'tan': sympy.tan,
+    'asin': sympy.asin,
+    'acos': sympy.acos,
+    'atan': sympy.atan,
+    'sinh': sympy.sinh,
+    'cosh': sympy.cosh,
+    'tanh': sympy.tanh,
+    'exp': sympy.exp,
+    'log': sympy.log,
+    'sqrt': sympy.sqrt,
+    'Abs': sympy.Abs,
+}
+
+TOKEN_PATTERN = re.compile(r'\s*(?:(?P<number>(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)|(?P<name>[A-Za-z_]\w*)'
+                           r'|(?P<op>\*\*|[-+*/^()]))')
+
+NUMBER = 'number'
+NAME = 'name'
+OP = 'op'
+END = 'end'
+
+'''
+kinds of the nodes of the syntax tree
+'''
+NUM = 'num'
+SYM = 'sym'
+CONST = 'const'
+FUNC = 'func'
+NEG = 'neg'
+ADD = 'add'
+SUB = 'sub'
+MUL = 'mul'
+DIV = 'div'
+POW = 'pow'
+
+BINARY_OPERATORS = {'+': ADD, '-': SUB, '*': MUL, '/': DIV, '**': POW, '^': POW}
+
+
+class ExpressionError(Exception):
+    '''
+    Raised by the parser, carries the error code, reported to the user
+
+    Parameters
+    ----------
+    error : Error
+        Error code
+    message : str
+        Description of the error
+    '''
+
+    def __init__(self, error: Error, message: str) -> None:
+        super().__init__(message)
+        self.error = error
+
+
+class Node:
+    '''
+    Node of the syntax tree. The tree is checked and its cost is estimated,
+    before any sympy object is created, since sympy evaluates
+    the constant subexpressions (e.g. huge powers) eagerly
+
+    Parameters
+    ----------
+    kind : str
+        Kind of the node
+    value : str
+        Text of a number, a name of a symbol, a constant or a function
+    children : Tuple[Node, ...]
+        Arguments of the operation
+    '''
+
+    def __init__(self, kind: str, value: str = '', children: Tuple['Node', ...] = ()) -> None:
+        self.kind = kind
+        self.value = value
+        self.children = children
+
+
+def tokenize(input_str: str) -> List[Tuple[str, str]]:
+    '''
+    Splits the input into the tokens
+
+    Parameters
+    ----------
+    input_str : str
+        Input string
+
+    Returns
+    -------
+    List[Tuple[str, str]]
+        Types and texts of the tokens, ending with the END token
+    '''
+
+    tokens = []
+    position = 0
+    input_str = input_str.rstrip()
+
+    while position < len(input_str):
+        match = TOKEN_PATTERN.match(input_str, position)
+        if match is None:
+            raise ExpressionError(Error.SYNTAX, f'Unexpected character: {input_str[position]!r}')
+
+        kind = match.lastgroup
+        assert kind is not None
+        tokens.append((kind, match.group(kind)))
+        position = match.end()
+
+    tokens.append((END, ''))
+    return tokens
+
+
+class Parser:
+    '''
+    Recursive descent parser of the restricted grammar:
+
+        expr  := term (('+' | '-') term)*
+        term  := unary (('*' | '/') unary)*
+        unary := ('+' | '-') unary | power
+        power := atom (('**' | '^') unary)?
+        atom  := number | name | name '(' expr ')' | '(' expr ')'
+
+    The powers are right associative and bind tighter than the unary minus,
+    as in python. The recursion is bounded by MAX_DEPTH
+
+    Parameters
+    ----------
+    tokens : List[Tuple[str, str]]
+        Tokens, returned by tokenize
+    '''
+
+    def __init__(self, tokens: List[Tuple[str, str]]) -> None:
+        self.tokens = tokens
+        self.position = 0
+        self.n_nodes = 0
+
+    def parse(self) -> Node:
+        node = self.__expr(0)
+
+        kind, text = self.__peek()
+        if kind != END:
+            raise ExpressionError(Error.SYNTAX, f'Unexpected token: {text!r}')
+
+        return node
+
+    def __peek(self) -> Tuple[str, str]:
+        return self.tokens[self.position]
+
+    def __next(self) -> Tuple[str, str]:
+        token = self.tokens[self.position]
+        if token[0] != END:
+            self.position += 1
+        return token
+
+    def __expect(self, text: str) -> None:
+        kind, actual = self.__next()
+        if kind != OP or actual != text:
+            raise ExpressionError(Error.SYNTAX, f'Expected {text!r}, got {actual!r}')
+
+    def __node(self, kind: str, value: str = '', children: Tuple[Node, ...] = ()) -> Node:
+        self.n_nodes += 1
+        if self.n_nodes > MAX_NODES:
+            raise ExpressionError(Error.TOO_LARGE, f'The expression has more than {MAX_NODES} nodes')
+        return Node(kind, value, children)
+
+    @staticmethod
+    def __check_depth(depth: int) -> None:
+        if depth > MAX_DEPTH:
+            raise ExpressionError(Error.TOO_LARGE, f'The expression is nested deeper than {MAX_DEPTH} levels')
+
+    def __expr(self, depth: int) -> Node:
+        self.__check_depth(depth)
+
+        node = self.__term(depth)
+        while self.__peek() in ((OP, '+'), (OP, '-')):
+            _, op = self.__next()
+            node = self.__node(BINARY_OPERATORS[op], children=(node, self.__term(depth)))
+
+        return node
+
+    def __term(self, depth: int) -> Node:
+        node = self.__unary(depth)
+        while self.__peek() in ((OP, '*'), (OP, '/')):
+            _, op = self.__next()
+            node = self.__node(BINARY_OPERATORS[op], children=(node, self.__unary(depth)))
+
+        return node
+
+    def __unary(self, depth: int) -> Node:
+        self.__check_depth(depth)
+
+        if self.__peek() == (OP, '+'):
+            self.__next()
+            return self.__unary(depth + 1)
+        if self.__peek() == (OP, '-'):
+            self.__next()
+            return self.__node(NEG, children=(self.__unary(depth + 1),))
+
+        return self.__power(depth)
+
+    def __power(self, depth: int) -> Node:
+        node = self.__atom(depth)
+        if self.__peek() in ((OP, '**'), (OP, '^')):
+            self.__next()
+            node = self.__node(POW, children=(node, self.__unary(depth + 1)))
+
+        return node
+
+    def __atom(self, depth: int) -> Node:
+        kind, text = self.__next()
+
+        if kind == NUMBER:
+            return self.__node(NUM, text)
+
+        if kind == OP and text == '(':
+            node = self.__expr(depth + 1)
+            self.__expect(')')
+            return node
+
+        if kind == NAME:
+            if self.__peek() == (OP, '('):
+                if text not in FUNCTIONS:
+                    raise ExpressionError(Error.GRAMMATICAL, f'Unknown function: {text}')
+                self.__next()
+                arg = self.__expr(depth + 1)
+                self.__expect(')')
+                return self.__node(FUNC, text, (arg,))
+
+            if text in SYMBOLS:
+                return self.__node(SYM, text)
+            if text in CONSTANTS:
+                return self.__node(CONST, text)
+            raise ExpressionError(Error.GRAMMATICAL, f'Unknown symbol: {text}')
+
+        if kind == END:
+            raise ExpressionError(Error.SYNTAX, 'Unexpected end of the expression')
+
+        raise ExpressionError(Error.SYNTAX, f'Unexpected token: {text!r}')
+
+
+def estimate_cost(node: Node) -> int:
+    '''
+    Estimates the cost of the symbolic differentiation: the total size of the expression
+    and of its two partial derivatives, as if they were not simplified. The derivative
+    of a product or a power copies its arguments, so nesting makes the cost grow
+    quadratically with the size of the expression
+
+    Parameters
+    ----------
+    node : Node
+        Root of the syntax tree
+
+    Returns
+    -------
+    int
+        Estimated cost
+    '''
+
+    size, derivative_size = __estimate_sizes(node)
+    return size + 2 * derivative_size
+
+
+def __estimate_sizes(node: Node) -> Tuple[int, int]:
+    '''
+    returns the sizes of the subexpression and of its derivative
+    '''
+    sizes = [__estimate_sizes(child) for child in node.children]
+    size = 1 + sum(s for s, _ in sizes)
+
+    if not sizes:
+        return 1, 1
+
+    if node.kind in (NEG, ADD, SUB):
+        return size, 1 + sum(d for _, d in sizes)
+
+    if node.kind in (MUL, DIV):
+        (s_1, d_1), (s_2, d_2) = sizes
+        return size, 3 + s_1 + d_1 + s_2 + d_2 + (s_2 if node.kind == DIV else 0)
+
+    if node.kind == POW:
+        (s_1, d_1), (s_2, d_2) = sizes
+        return size, 5 + 2 * (s_1 + s_2) + d_1 + d_2
+
+    '''
+    f(g)' = f'(g) g'
+    '''
+    (s, d), = sizes
+    return size, 3 + s + d
+
+
+class Builder:
+    '''
+    Converts the syntax tree into the sympy expression. The number of digits
+    of the constant subexpressions is tracked, so that an exactly evaluated constant
+    (e.g. 9**9**9) is rejected before sympy starts computing it
+    '''
+
+    def build(self, node: Node) -> sympy.Expr:
+        expr, _ = self.__build(node)
+        return expr
+
+    def __build(self, node: Node) -> Tuple[sympy.Expr, Optional[int]]:
+        '''
+        returns the expression and the estimated number of digits, if it is constant
+        '''
+
+        if node.kind == NUM:
+            '''
+            a float with a huge exponent is as long, as an integer with the same number of digits, when printed
+            '''
+            digits = max(len(node.value), abs(Decimal(node.value).adjusted()) + 1)
+            if digits > MAX_CONSTANT_DIGITS:
+                raise ExpressionError(Error.TOO_LARGE, 'The expression contains a too large constant')
+
+            if any(c in node.value for c in '.eE'):
+                return sympy.Float(node.value), digits
+            return sympy.Integer(node.value), digits
+        if node.kind == SYM:
+            return SYMBOLS[node.value], None
+        if node.kind == CONST:
+            return CONSTANTS[node.value], 1
+
+        args = [self.__build(child) for child in node.children]
+        constant_digits = self.__digits(node, args)
+
+        if constant_digits is not None and constant_digits > MAX_CONSTANT_DIGITS:
+            raise ExpressionError(Error.TOO_LARGE, 'The expression contains a too large constant')
+
+        exprs = [expr for expr, _ in args]
+
+        if node.kind == FUNC:
+            return FUNCTIONS[node.value](exprs[0]), constant_digits
+        if node.kind == NEG:
+            return -exprs[0], constant_digits
+        if node.kind == ADD:
+            return exprs[0] + exprs[1], constant_digits
+        if node.kind == SUB:
+            return exprs[0] - exprs[1], constant_digits
+        if node.kind == MUL:
+            return exprs[0] * exprs[1], constant_digits
+        if node.kind == DIV:
+            return exprs[0] / exprs[1], constant_digits
+
+        assert node.kind == POW
+        return exprs[0] ** exprs[1], constant_digits
+
+    @staticmethod
+    def __digits(node: Node, args: List[Tuple[sympy.Expr, Optional[int]]]) -> Optional[int]:
+        if node.kind != POW:
+            if any(d is None for _, d in args):
+                return None
+            return 1 + sum(d for _, d in args if d is not None)
+
+        (_, base_digits), (exponent, exponent_digits) = args
+
+        if exponent_digits is None:
+            return None
+
+        '''
+        the exponent is a constant of a bounded size, so it is safe to evaluate it numerically
+        '''
+        try:
+            magnitude = abs(complex(sympy.N(exponent)))
+        except (TypeError, ValueError):
+            magnitude = math.inf
+
+        if not magnitude <= MAX_EXPONENT:
+            raise ExpressionError(Error.TOO_LARGE, f'Constant exponents must not exceed {MAX_EXPONENT}')
+
+        if base_digits is None:
+            return None
+
+        return base_digits * max(1, math.ceil(magnitude)) + exponent_digits
+
+
+def parse_expression(input_str: str) -> Tuple[Error, Optional[sympy.Expr]]:
+    '''
+    Parses the objective function without eval: the sympy expression is built
+    directly from the syntax tree of the restricted grammar (see Parser),
+    using only the symbols x and y, the constants and the functions of the allow-lists.
+    The oversized inputs are rejected with Error.TOO_LARGE
+
+    Parameters
+    ----------
+    input_str : str
+        Input string
+
+    Returns
+    -------
+    Tuple[Error, Optional[sympy.Expr]]
+        Tuple of the error code and the parsed expression
+    '''
+
+    logger.debug('Parsing expression')
+
+    try:
+        if len(input_str) > MAX_INPUT_LENGTH:
+            raise ExpressionError(Error.TOO_LARGE, f'The expression is longer than {MAX_INPUT_LENGTH} characters')
+
+        tree = Parser(tokenize(input_str)).parse()
+
+        cost = estimate_cost(tree)
+        if cost > MAX_COST:
+            raise ExpressionError(Error.TOO_LARGE, f'The estimated cost of the expression is {cost}')
+
+        return Error.OK, Builder().build(tree)
+
+    except ExpressionError as e:
+        logger.warning(str(e))
+        return e.error, None
+
+
+def differentiate(expr: sympy.Expr) -> Tuple[sympy.Expr, sympy.Expr]:
+    '''
+    Computes the partial derivatives of the expression with respect to the real symbols
+    (see REAL_SYMBOLS). The derivatives are expressed in SYMBOLS, as the expression is
+
+    Parameters
+    ----------
+    expr : sympy.Expr
+        Expression of x and y
+
+    Returns
+    -------
+    Tuple[sympy.Expr, sympy.Expr]
+        Partial derivatives with respect to x and y
+    '''
+
+    to_real = {SYMBOLS[name]: REAL_SYMBOLS[name] for name in SYMBOLS}
+    from_real = {REAL_SYMBOLS[name]: SYMBOLS[name] for name in SYMBOLS}
+
+    expr_real = expr.subs(to_real)
+    return (sympy.diff(expr_real, REAL_SYMBOLS['x']).subs(from_real),
+            sympy.diff(expr_real, REAL_SYMBOLS['y']).subs(from_real))
+
+
+def prepare_expression(input_str: str) -> Tuple[Error, Optional[sympy.Expr], Optional[Tuple[Any, Any]]]:
+    '''
+    Parses the objective function and computes its partial derivatives.
+    This is the job, run by sandbox.ExpressionSandbox under the time budget
+
+    Parameters
+    ----------
+    input_str : str
+        Input string
+
+    Returns
+    -------
+    Tuple[Error, Optional[sympy.Expr], Optional[Tuple[Any, Any]]]
+        Tuple of the error code, the parsed expression and its partial derivatives
+    '''
+
+    err, expr = parse_expression(input_str)
+    if err != Error.OK:
+        return err, None, None
+
+    try:
+        derivatives = differentiate(expr)
+    except (ValueError, TypeError, NotImplementedError):
+        logger.warning('Unable to differentiate the function')
+        return Error.UNABLE_TO_DIFFERENTIALE, None, None
+
+    return Error.OK, expr, derivatives
@@ -0,0 +1,207 @@
+import matplotlib.pyplot as plt
+
+from typing import Tuple, Optional, List, Any
+
+from pathlib import Path
+
+import numpy as np
+
+from .utils import get_logger
+from .levels import GridLevels, DEFAULT_LEVEL_SCALE
+
+
+logger = get_logger(Path(__file__).name)
+
+
+'''
+Drawing functions, shared by the Canvas widget and the render service.
+They draw on given matplotlib axes and do not depend on Qt
+'''
+
+NUM_X_TICKS = 50
+NUM_Y_TICKS = 50
+
+LAYER_ZORDER = 0
+GRADIENT_ZORDER = 1
+CONTOUR_ZORDER = 2
+HISTORY_ZORDER = 5
+INIT_APPROX_ZORDER = 6
+
+DEFAULT_MARGIN_COEF = 0.05
+DEFAULT_NUM_LEVELS = 10
+
+Limits = Tuple[Tuple[float, float], Tuple[float, float]]
+
+
+def compute_limits(histories: List[np.ndarray], margin_coef: float = DEFAULT_MARGIN_COEF) -> Limits:
+    '''
+    Computes axes limits as
+    min - margin_coef * (max - min), max + margin_coef * (max - min)
+    along each axis, where min and max values are taken from the histories,
+    so the limits cover the union of the bounding boxes of the trajectories
+
+    Parameters
+    ----------
+    histories : List[np.ndarray]
+        Histories of shape (n, 2)
+    margin_coef : float
+        Relative margin
+
+    Returns
+    -------
+    Tuple[Tuple[float, float], Tuple[float, float]]
+        x and y axes limits respectively
+    '''
+
+    logger.debug('Computing limits')
+
+    points = np.concatenate(histories)
+
+    min_x, min_y = np.min(points, axis=0)
+    max_x, max_y = np.max(points, axis=0)
+
+    w, h = max_x - min_x, max_y - min_y
+
+    '''
+    a side of zero length (e.g. when the method has converged at the initial approximation)
+    gets a unit margin, since the axes can not have equal limits
+    '''
+    c_x, w = (margin_coef, w) if w > 0 else (1.0, 1.0)
+    c_y, h = (margin_coef, h) if h > 0 else (1.0, 1.0)
+
+    x_lims = min_x - c_x * w, max_x + c_x * w
+    y_lims = min_y - c_y * h, max_y + c_y * h
+
+    return x_lims, y_lims
+
+
+def plot_quiver(ax: Any, history: np.ndarray, color: Any = 'black', label: Optional[str] = None) -> None:
+    '''
+    Plots a history as a sequence of arrows. A history of one point (e.g. when the method
+    has stopped at the initial approximation) is shown by the initial point only
+
+    Parameters
+    ----------
+    ax : Any
+        Axes to draw on
+    history : np.ndarray
+        History to plot
+    color : Any
+        Color of the arrows
+    label : Optional[str]
+        Legend label of the trajectory
+    '''
+
+    logger.debug('Plotting quiver')
+
+    if len(history) > 1:
+        # The x and y coordinates of the arrow locations
+        x, y = history[:-1, 0], history[:-1, 1]
+        # The x and y direction components of the arrow vectors
+        u = history[1:, 0] - history[:-1, 0]
+        v = history[1:, 1] - history[:-1, 1]
+
+        ax.quiver(x, y, u, v, color=color, scale_units='xy',
+                  angles='xy', scale=1, zorder=HISTORY_ZORDER)
+
+    if label is None:
+        ax.scatter(history[0, 0], history[0, 1], zorder=INIT_APPROX_ZORDER)
+    else:
+        ax.scatter(history[0, 0], history[0, 1], color=color, label=label, zorder=INIT_APPROX_ZORDER)
+
+
+def plot_gradient(ax: Any, X: np.ndarray, Y: np.ndarray, grad_X: np.ndarray, grad_Y: np.ndarray) -> Any:
+    '''
+    Plots gradient field as a field of arrows on a given meshgrid
+
+    Parameters
+    ----------
+    ax : Any
+        Axes to draw on
+    X : np.ndarray
+        x values of the arrow grid
+    Y : np.ndarray
+        y values of the arrow grid
+    grad_X : np.ndarray
+        x components of the gradient on the grid
+    grad_Y : np.ndarray
+        y components of the gradient on the grid
+
+    Returns
+    -------
+    Any
+        Artist of the field
+    '''
+
+    logger.debug('Plotting gradient')
+
+    '''
+    the grid may be denser, than needed for the arrows, so it is thinned
+    '''
+    row_step = max(1, X.shape[0] // NUM_Y_TICKS)
+    col_step = max(1, X.shape[1] // NUM_X_TICKS)
+    X, Y = X[::row_step, ::col_step], Y[::row_step, ::col_step]
+    grad_X, grad_Y = grad_X[::row_step, ::col_step], grad_Y[::row_step, ::col_step]
+
+    '''
+    the direction is not defined, where the gradient is zero or not finite, so these arrows are masked.
+    The components are divided by the larger of their absolute values before normalizing,
+    so that the norm of a huge gradient does not overflow
+    '''
+    scale = np.maximum(np.abs(grad_X), np.abs(grad_Y))
+    invalid = ~(np.isfinite(scale) & (scale > 0))
+    scale = np.where(invalid, 1, scale)
+
+    u, v = np.where(invalid, 0, grad_X) / scale, np.where(invalid, 0, grad_Y) / scale
+    norm = np.hypot(u, v)
+    norm[invalid] = 1
+
+    return ax.quiver(X, Y, np.ma.masked_where(invalid, u / norm), np.ma.masked_where(invalid, v / norm),
+                     scale=50, width=3e-3, color='gray', alpha=0.5, zorder=GRADIENT_ZORDER)
+
+
+def plot_contour(ax: Any, X: np.ndarray, Y: np.ndarray, Z: np.ndarray,
+                 num_levels: int = DEFAULT_NUM_LEVELS, scale: str = DEFAULT_LEVEL_SCALE,
+                 grid_levels: Optional[GridLevels] = None) -> Optional[Any]:
+    '''
+    Plots contour lines of the objective function using a given meshgrid.
+    The levels are colored by their index, so the colors are spread evenly with any scale
+
+    Parameters
+    ----------
+    ax : Any
+        Axes to draw on
+    X : np.ndarray
+        x values of the grid
+    Y : np.ndarray
+        y values of the grid
+    Z : np.ndarray
+        Function values on the grid, may contain NaN and infinity
+    num_levels : int
+        Number of contour lines
+    scale : str
+        Scale of the levels, one of levels.LEVEL_SCALES
+    grid_levels : Optional[GridLevels]
+        Level selection of the grid, computed before. If None, it is computed from Z
+
+    Returns
+    -------
+    Optional[Any]
+        Artist of the contour lines or None, if there are no levels
+        (the surface is constant or is not computed yet)
+    '''
+
+    logger.debug('Plotting contour')
+
+    if grid_levels is None:
+        grid_levels = GridLevels(Z)
+
+    levels = grid_levels.levels(num_levels, scale)
+    if not levels.size:
+        logger.debug('No contour levels')
+        return None
+
+    colors = plt.cm.jet(np.linspace(0, 1, levels.size))  # type: ignore
+
+    return ax.contour(X, Y, np.ma.masked_invalid(Z), levels=levels, colors=colors,
+                      alpha=0.5, zorder=CONTOUR_ZORDER)
@@ -0,0 +1,89 @@
+import numpy as np
+from numpy.typing import DTypeLike
+
+from typing import Any, Dict
+
+from pathlib import Path
+
+from .utils import get_logger
+
+
+logger = get_logger(Path(__file__).name)
+
+
+DOUBLE_PRECISION = 'double'
+MIXED_PRECISION = 'mixed'
+
+
+class DtypePolicy:
+    '''
+    Floating point types, used for the different kinds of arrays.
+
+    The storage type is used for the evaluated grids (the surface, the tiles and the basin maps)
+    and for the stored histories. These arrays are large, and their accuracy
+    is limited by the resolution of the screen anyway, so float32 is enough for them.
+    The batched kernels compute in the type of their input, so the grids are evaluated in it as well.
+
+    The accumulation type is used for the iterations of the methods: the points, the gradients
+    and the approximations of the inverse hessian. It is always float64, since the errors
+    of the hessian update accumulate over the iterations
+
+    Parameters
+    ----------
+    name : str
+        Name of the policy
+    storage : DTypeLike
+        Storage type
+    '''
+
+    def __init__(self, name: str, storage: DTypeLike) -> None:
+        self.name = name
+        self.storage = np.dtype(storage)
+        self.accumulation = np.dtype(np.float64)
+
+
+POLICIES: Dict[str, DtypePolicy] = {
+    DOUBLE_PRECISION: DtypePolicy(DOUBLE_PRECISION, np.float64),
+    MIXED_PRECISION: DtypePolicy(MIXED_PRECISION, np.float32),
+}
+
+
+def get_policy(name: str) -> DtypePolicy:
+    '''
+    Returns the dtype policy by its name
+
+    Parameters
+    ----------
+    name : str
+        Name of the policy, one of the keys of POLICIES
+
+    Returns
+    -------
+    DtypePolicy
+        Policy
+    '''
+
+    if name not in POLICIES:
+        raise ValueError(f'Unknown precision: {name}')
+
+    return POLICIES[name]
+
+
+def floating_dtype(array: Any) -> np.dtype:
+    '''
+    Returns the type of a floating point array, or float64 for other arrays
+    (e.g. integer arrays and lists), so that the kernels keep the precision of their input
+
+    Parameters
+    ----------
+    array : Any
+        Array
+
+    Returns
+    -------
+    np.dtype
+        Floating point type
+    '''
+
+    dtype = np.asarray(array).dtype
+    return dtype if np.issubdtype(dtype, np.floating) else np.dtype(np.float64)
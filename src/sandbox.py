@@ -0,0 +1,203 @@
+import atexit
+import logging
+import multiprocessing
+from multiprocessing.connection import Connection
+
+import sympy
+
+from threading import Lock
+from typing import Tuple, Optional, Any
+
+from pathlib import Path
+
+from .utils import get_logger, ROOT_LOGGER_NAME
+from .errors import Error
+from .parser import prepare_expression
+
+try:
+    import resource
+except ImportError:  # pragma: no cover
+    resource = None  # type: ignore[assignment]
+
+
+logger = get_logger(Path(__file__).name)
+
+
+PARSE_TIMEOUT = 5.0  # time budget of parsing and differentiation in seconds
+MEMORY_LIMIT = 2 * 1024**3  # address space of the worker process in bytes (applied on POSIX only)
+STARTUP_TIMEOUT = 60.0  # the worker imports sympy, which takes a while, but does not count against the budget
+
+READY = 'ready'
+
+Prepared = Tuple[Error, Optional[sympy.Expr], Optional[Tuple[Any, Any]]]
+
+
+def _serve(connection: Connection, memory_limit: Optional[int]) -> None:
+    '''
+    Main loop of the worker process: receives the input strings and sends back
+    the results of parser.prepare_expression. The errors are logged by the caller,
+    so the logging of the worker is silenced
+    '''
+
+    logging.getLogger(ROOT_LOGGER_NAME).addHandler(logging.NullHandler())
+
+    if resource is not None and memory_limit is not None:
+        try:
+            resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+        except (ValueError, OSError):
+            logger.warning('Unable to limit the memory of the worker')
+
+    connection.send(READY)
+
+    while True:
+        try:
+            input_str = connection.recv()
+        except EOFError:
+            return
+
+        try:
+            result: Prepared = prepare_expression(input_str)
+        except (MemoryError, RecursionError):
+            result = Error.TOO_LARGE, None, None
+
+        connection.send(result)
+
+
+class ExpressionSandbox:
+    '''
+    Runs parsing and differentiation of the untrusted expressions in a separate process,
+    so that an expression, which passes the cost estimation of the parser,
+    but still takes too long or too much memory, does not stall the caller.
+
+    The worker is started once and reused, since starting a python process
+    and importing sympy takes much longer, than processing a typical expression.
+    When the budget is exceeded, the worker is killed and started again for the next expression.
+    The sandbox may be shared by several threads, the expressions are processed one at a time
+
+    Parameters
+    ----------
+    memory_limit : Optional[int]
+        Address space limit of the worker in bytes, unlimited if None
+    '''
+
+    def __init__(self, memory_limit: Optional[int] = MEMORY_LIMIT) -> None:
+        self.memory_limit = memory_limit
+
+        '''
+        the worker is spawned rather than forked, since the callers
+        (the GUI and the service) run several threads
+        '''
+        self.__context = multiprocessing.get_context('spawn')
+        self.__process: Optional[Any] = None
+        self.__connection: Optional[Connection] = None
+        self.__lock = Lock()
+
+    def run(self, input_str: str, timeout: float = PARSE_TIMEOUT) -> Prepared:
+        '''
+        Parses the expression and computes its partial derivatives in the worker
+
+        Parameters
+        ----------
+        input_str : str
+            Input string
+        timeout : float
+            Time budget in seconds
+
+        Returns
+        -------
+        Prepared
+            Tuple of the error code, the parsed expression and its partial derivatives.
+            The error is Error.TIMEOUT, if the budget is exceeded, and Error.TOO_LARGE,
+            if the worker runs out of memory
+        '''
+
+        with self.__lock:
+            connection = self.__start()
+
+            try:
+                connection.send(input_str)
+                if connection.poll(timeout):
+                    result: Prepared = connection.recv()
+                    return result
+
+            except (EOFError, OSError):
+                logger.warning('The worker has died while processing the expression')
+                self.__stop()
+                return Error.TOO_LARGE, None, None
+
+            logger.warning(f'Processing of the expression has exceeded {timeout} s')
+            self.__stop()
+            return Error.TIMEOUT, None, None
+
+    def start(self) -> bool:
+        '''
+        Starts the worker ahead of the first expression, so that the startup of the process
+        is not waited for by the caller of run. Safe to call from a background thread
+
+        Returns
+        -------
+        bool
+            Whether the worker is running
+        '''
+
+        with self.__lock:
+            try:
+                self.__start()
+            except RuntimeError as e:
+                logger.warning(str(e))
+                return False
+
+        return True
+
+    def close(self) -> None:
+        with self.__lock:
+            self.__stop()
+
+    def __start(self) -> Connection:
+        if self.__process is not None and self.__process.is_alive() and self.__connection is not None:
+            return self.__connection
+
+        self.__stop()
+
+        logger.debug('Starting sandbox worker')
+
+        connection, child_connection = self.__context.Pipe()
+        process = self.__context.Process(target=_serve, args=(child_connection, self.memory_limit), daemon=True)
+        process.start()
+        child_connection.close()
+
+        if not connection.poll(STARTUP_TIMEOUT) or connection.recv() != READY:
+            process.kill()
+            raise RuntimeError('Unable to start the sandbox worker')
+
+        self.__process, self.__connection = process, connection
+        return connection
+
+    def __stop(self) -> None:
+        if self.__connection is not None:
+            self.__connection.close()
+        if self.__process is not None:
+            self.__process.kill()
+            self.__process.join()
+
+        self.__process, self.__connection = None, None
+
+
+__sandbox: Optional[ExpressionSandbox] = None
+__sandbox_lock = Lock()
+
+
+def get_sandbox() -> ExpressionSandbox:
+    '''
+    Returns the sandbox, shared by the whole application. It is created on the first call
+    and its worker is stopped at exit
+    '''
+
+    global __sandbox
+
+    with __sandbox_lock:
+        if __sandbox is None:
+            __sandbox = ExpressionSandbox()
+            atexit.register(__sandbox.close)
+
+        return __sandbox
@@ -0,0 +1,632 @@
+'''
+HTTP service, rendering the runs of the methods for remote clients.
+
+A job (an expression, an initial approximation, a precision and a method) is run
+through the same pipeline, as in the GUI: the expression is parsed and compiled
+by toolbar_utils, the method is run by optimizers.optimize, and the picture is drawn
+by the functions of the plotting module on an off-screen figure.
+
+The service is built on asyncio streams of the standard library. The requests are put
+into a bounded queue and served by a pool of workers, which run the jobs in threads.
+Identical concurrent requests share a single run. The compiled kernels and their
+tile caches are shared by all of the requests, so the surface of a popular function
+is evaluated once. Endpoints:
+
+    POST /jobs             run a job, the body is a JSON object (see Job.from_json),
+                           returns the JSON result with the history
+    GET  /jobs/<id>        JSON result of a finished job
+    GET  /jobs/<id>.png    picture of a finished job
+    GET  /health           sizes of the queue and of the caches
+
+Run from the root of the repository:
+    python -m src.service --port 8080
+'''
+
+import asyncio
+import argparse
+import hashlib
+import json
+
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+from io import BytesIO
+from threading import Lock
+from typing import Tuple, Dict, Any, Optional, List
+
+from pathlib import Path
+
+import numpy as np
+
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+from .utils import get_logger, configure_logging, trace_span
+from .errors import Error, get_error_message
+from .toolbar_utils import build_function, build_value_and_grad, ValueAndGrad, DIFF_BACKENDS, SYMPY_BACKEND
+from .optimizers import optimize, OPTIMIZERS
+from .tiles import TileCache
+from .termination import get_status_message
+from .plotting import compute_limits, plot_quiver, plot_gradient, plot_contour
+from .sandbox import get_sandbox
+
+
+logger = get_logger(Path(__file__).name)
+
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8080
+DEFAULT_NUM_WORKERS = 4
+QUEUE_CAPACITY = 64  # number of the queued jobs, the service answers 503, when the queue is full
+KERNEL_CACHE_CAPACITY = 32  # number of the compiled kernels (with their tiles)
+RESULT_CACHE_CAPACITY = 256  # number of the finished jobs, whose results are kept
+JOB_TIME_LIMIT = 10.0  # wall time budget of a run in seconds
+MAX_BODY_SIZE = 16 * 1024  # bytes
+MAX_HEADER_SIZE = 16 * 1024  # bytes
+READ_TIMEOUT = 10.0  # time budget of reading the headers and of reading the body in seconds, 408 is answered then
+
+FIGURE_SIZE = (6.4, 4.8)  # inches
+FIGURE_DPI = 100
+
+DEFAULT_METHOD = 'bfgs'
+
+JSON_TYPE = 'application/json'
+PNG_TYPE = 'image/png'
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 408: 'Request Timeout',
+           413: 'Payload Too Large', 500: 'Internal Server Error', 503: 'Service Unavailable'}
+
+
+class JobError(Exception):
+    '''
+    Raised, when a job can not be run because of its parameters, reported with the status 400
+    '''
+
+
+class Job:
+    '''
+    Parameters of a run
+
+    Parameters
+    ----------
+    expression : str
+        Objective function
+    x_0 : Tuple[float, float]
+        Initial approximation
+    epsilon : float
+        Desired precision
+    method : str
+        Name of the method, one of the keys of optimizers.OPTIMIZERS
+    backend : str
+        Differentiation backend, one of toolbar_utils.DIFF_BACKENDS
+    '''
+
+    def __init__(self, expression: str, x_0: Tuple[float, float], epsilon: float,
+                 method: str = DEFAULT_METHOD, backend: str = SYMPY_BACKEND) -> None:
+        self.expression = expression
+        self.x_0 = x_0
+        self.epsilon = epsilon
+        self.method = method
+        self.backend = backend
+
+    @classmethod
+    def from_json(cls, data: Any) -> 'Job':
+        '''
+        Validates the body of a request, e.g.
+        {"expression": "x**2+y**2", "x0": [1, 2], "epsilon": 1e-5, "method": "bfgs", "backend": "sympy"},
+        where the method and the backend are optional
+
+        Parameters
+        ----------
+        data : Any
+            Parsed JSON
+
+        Returns
+        -------
+        Job
+            Job
+        '''
+
+        if not isinstance(data, dict):
+            raise JobError('The body must be a JSON object')
+
+        expression = data.get('expression')
+        if not isinstance(expression, str):
+            raise JobError('The expression must be a string')
+
+        try:
+            x_0 = tuple(float(c) for c in data.get('x0', ()))
+            epsilon = float(data.get('epsilon', 0))
+        except (TypeError, ValueError):
+            raise JobError('The initial approximation and the precision must be numbers')
+
+        if len(x_0) != 2 or not np.all(np.isfinite(x_0)):
+            raise JobError('The initial approximation must be a pair of finite numbers')
+        if not (np.isfinite(epsilon) and epsilon > 0):
+            raise JobError('The precision must be positive')
+
+        method = data.get('method', DEFAULT_METHOD)
+        if method not in OPTIMIZERS:
+            raise JobError(f'Unknown method: {method}')
+
+        backend = data.get('backend', SYMPY_BACKEND)
+        if backend not in DIFF_BACKENDS:
+            raise JobError(f'Unknown backend: {backend}')
+
+        return cls(expression, (x_0[0], x_0[1]), epsilon, method, backend)
+
+    @property
+    def id(self) -> str:
+        '''
+        Identifier of the job: equal jobs have equal identifiers
+        '''
+        key = json.dumps([self.expression, self.x_0, self.epsilon, self.method, self.backend])
+        return hashlib.sha256(key.encode()).hexdigest()[:16]
+
+
+class JobResult:
+    '''
+    Result of a run: the JSON document and the picture
+    '''
+
+    def __init__(self, document: Dict[str, Any], png: bytes) -> None:
+        self.document = document
+        self.png = png
+
+
+class Kernel:
+    '''
+    Compiled objective function with the cache of its surface
+    '''
+
+    def __init__(self, value_and_grad: ValueAndGrad) -> None:
+        self.value_and_grad = value_and_grad
+        self.tile_cache = TileCache(value_and_grad)
+
+
+class KernelCache:
+    '''
+    LRU cache of the compiled kernels, shared by the workers.
+    A kernel is compiled outside of the lock, so a slow compilation does not block
+    the other workers (two workers may compile the same kernel, then one of them is kept)
+
+    Parameters
+    ----------
+    capacity : int
+        Number of the kept kernels
+    '''
+
+    def __init__(self, capacity: int = KERNEL_CACHE_CAPACITY) -> None:
+        self.capacity = capacity
+
+        self.__kernels: 'OrderedDict[Tuple[str, str], Kernel]' = OrderedDict()
+        self.__lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self.__kernels)
+
+    def get(self, expression: str, backend: str) -> Kernel:
+        '''
+        Returns the kernel of the expression, compiling it, if it is not cached
+
+        Parameters
+        ----------
+        expression : str
+            Objective function
+        backend : str
+            Differentiation backend
+
+        Returns
+        -------
+        Kernel
+            Kernel
+        '''
+
+        key = (expression, backend)
+
+        with self.__lock:
+            kernel = self.__kernels.get(key)
+            if kernel is not None:
+                self.__kernels.move_to_end(key)
+                return kernel
+
+        err, func_sp, _, derivatives = build_function(expression)
+        if err != Error.OK:
+            raise JobError(get_error_message(err))
+
+        err, value_and_grad = build_value_and_grad(func_sp, backend, derivatives)  # type: ignore
+        if err != Error.OK:
+            raise JobError(get_error_message(err))
+
+        assert value_and_grad is not None
+
+        with self.__lock:
+            kernel = self.__kernels.setdefault(key, Kernel(value_and_grad))
+            self.__kernels.move_to_end(key)
+
+            while len(self.__kernels) > self.capacity:
+                self.__kernels.popitem(last=False)
+
+        return kernel
+
+
+def result_to_json(result: Dict['str', Any]) -> Dict[str, Any]:
+    '''
+    Converts the result dictionary of optimizers.optimize to JSON types
+
+    Parameters
+    ----------
+    result : Dict['str', Any]
+        Result dictionary
+
+    Returns
+    -------
+    Dict[str, Any]
+        JSON object
+    '''
+
+    return dict(x=[float(c) for c in result['x']],
+                fun=None if result['fun'] is None else float(result['fun']),
+                n_iter=int(result['n_iter']),
+                n_grad_calls=int(result['n_grad_calls']),
+                success=bool(result['success']),
+                status=get_status_message(result['status']),
+                method=result['method'],
+                time=float(result['time']))
+
+
+def render_png(kernel: Kernel, history: np.ndarray, title: str) -> bytes:
+    '''
+    Draws the trajectory over the gradient field and the contour lines
+    on an off-screen figure. The surface is taken from the tile cache of the kernel
+
+    Parameters
+    ----------
+    kernel : Kernel
+        Kernel of the objective function
+    history : np.ndarray
+        History of the method
+    title : str
+        Title of the picture
+
+    Returns
+    -------
+    bytes
+        PNG image
+    '''
+
+    '''
+    the figure is created without pyplot, which is not thread-safe
+    '''
+    fig = Figure(figsize=FIGURE_SIZE, dpi=FIGURE_DPI)
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+
+    x_lims, y_lims = compute_limits([history])
+    ax.set_xlim(*x_lims)
+    ax.set_ylim(*y_lims)
+    ax.set_title(title)
+
+    X, Y, Z, grad_X, grad_Y = kernel.tile_cache.get_region(x_lims, y_lims)
+
+    plot_gradient(ax, X, Y, grad_X, grad_Y)
+    plot_contour(ax, X, Y, Z)
+    plot_quiver(ax, history)
+
+    buffer = BytesIO()
+    fig.savefig(buffer, format='png')
+    return buffer.getvalue()
+
+
+def run_job(job: Job, kernels: KernelCache) -> JobResult:
+    '''
+    Runs a job: compiles (or takes from the cache) the kernel, runs the method and draws the picture
+
+    Parameters
+    ----------
+    job : Job
+        Job
+    kernels : KernelCache
+        Shared cache of the kernels
+
+    Returns
+    -------
+    JobResult
+        Result
+    '''
+
+    with trace_span(logger, 'run_job', job=job.id):
+        kernel = kernels.get(job.expression, job.backend)
+
+        result, history = optimize(job.method, kernel.value_and_grad, np.array(job.x_0), job.epsilon,
+                                   max_time=JOB_TIME_LIMIT)
+
+        document = dict(id=job.id, expression=job.expression, x0=list(job.x_0), epsilon=job.epsilon,
+                        method=job.method, backend=job.backend, result=result_to_json(result),
+                        history=np.asarray(history, dtype=float).tolist(), image=f'/jobs/{job.id}.png')
+
+        png = render_png(kernel, history, OPTIMIZERS[job.method].title)
+
+    return JobResult(document, png)
+
+
+class RenderService:
+    '''
+    Asynchronous HTTP service, running the jobs on a pool of workers
+
+    Parameters
+    ----------
+    num_workers : int
+        Number of the jobs, run at the same time
+    queue_capacity : int
+        Number of the jobs, waiting in the queue
+    read_timeout : float
+        Time budget of reading the headers and of reading the body of a request in seconds,
+        so that a slow or silent client does not hold the connection forever
+    '''
+
+    def __init__(self, num_workers: int = DEFAULT_NUM_WORKERS, queue_capacity: int = QUEUE_CAPACITY,
+                 read_timeout: float = READ_TIMEOUT) -> None:
+        self.num_workers = num_workers
+        self.queue_capacity = queue_capacity
+        self.read_timeout = read_timeout
+
+        self.kernels = KernelCache()
+        self.results: 'OrderedDict[str, JobResult]' = OrderedDict()
+
+        '''
+        futures of the queued and running jobs by their identifiers,
+        an identical request waits for the same future
+        '''
+        self.in_flight: Dict[str, asyncio.Future] = {}
+        self.n_runs = 0  # number of the jobs actually run
+
+        self.__executor = ThreadPoolExecutor(max_workers=num_workers)
+        self.__queue: Optional[asyncio.Queue] = None
+        self.__workers: List[asyncio.Task] = []
+        self.__server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT) -> int:
+        '''
+        Starts the workers and the server
+
+        Parameters
+        ----------
+        host : str
+            Host to listen on
+        port : int
+            Port to listen on, 0 to choose a free port
+
+        Returns
+        -------
+        int
+            Port, the server listens on
+        '''
+
+        '''
+        the sandbox worker is started before accepting the jobs, so the first job
+        does not wait for the startup of the process
+        '''
+        await asyncio.get_running_loop().run_in_executor(self.__executor, get_sandbox().start)
+
+        self.__queue = asyncio.Queue(self.queue_capacity)
+        self.__workers = [asyncio.create_task(self.__work()) for _ in range(self.num_workers)]
+        self.__server = await asyncio.start_server(self.__handle, host, port, limit=MAX_HEADER_SIZE)
+
+        port = self.__server.sockets[0].getsockname()[1]
+        logger.info(f'Serving on {host}:{port}')
+
+        return port
+
+    async def stop(self) -> None:
+        if self.__server is not None:
+            self.__server.close()
+            await self.__server.wait_closed()
+
+        for worker in self.__workers:
+            worker.cancel()
+        await asyncio.gather(*self.__workers, return_exceptions=True)
+
+        self.__executor.shutdown(wait=True)
+
+    async def submit(self, job: Job) -> JobResult:
+        '''
+        Queues a job and waits for its result. If an identical job is queued or running,
+        its result is awaited instead, and the results of the finished jobs are reused
+
+        Parameters
+        ----------
+        job : Job
+            Job
+
+        Returns
+        -------
+        JobResult
+            Result
+        '''
+
+        assert self.__queue is not None, 'The service is not started'
+
+        job_id = job.id
+
+        result = self.results.get(job_id)
+        if result is not None:
+            self.results.move_to_end(job_id)
+            return result
+
+        future = self.in_flight.get(job_id)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self.__queue.put_nowait((job, future))
+            self.in_flight[job_id] = future
+        else:
+            logger.debug(f'Joining job {job_id}')
+
+        '''
+        a disconnected client must not cancel the job, awaited by the others
+        '''
+        return await asyncio.shield(future)
+
+    async def __work(self) -> None:
+        assert self.__queue is not None
+
+        loop = asyncio.get_running_loop()
+
+        while True:
+            job, future = await self.__queue.get()
+
+            try:
+                self.n_runs += 1
+                result = await loop.run_in_executor(self.__executor, run_job, job, self.kernels)
+
+                self.results[job.id] = result
+                while len(self.results) > RESULT_CACHE_CAPACITY:
+                    self.results.popitem(last=False)
+
+                future.set_result(result)
+
+            except Exception as e:
+                '''
+                the errors of a job are passed to the requests, waiting for it
+                '''
+                future.set_exception(e)
+
+            finally:
+                del self.in_flight[job.id]
+                self.__queue.task_done()
+
+    async def __handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            status, content_type, body = await self.__respond(reader)
+        except Exception:
+            logger.exception('Unable to handle the request')
+            status, content_type, body = self.__error(500, 'Internal error')
+
+        header = (f'HTTP/1.1 {status} {REASONS[status]}\r\n'
+                  f'Content-Type: {content_type}\r\n'
+                  f'Content-Length: {len(body)}\r\n'
+                  'Connection: close\r\n\r\n')
+
+        try:
+            writer.write(header.encode('latin-1') + body)
+            await writer.drain()
+            writer.close()
+            await writer.wait_closed()
+        except ConnectionError:
+            logger.debug('The client has disconnected')
+
+    async def __respond(self, reader: asyncio.StreamReader) -> Tuple[int, str, bytes]:
+        try:
+            head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), self.read_timeout)
+        except asyncio.LimitOverrunError:
+            return self.__error(413, 'The headers are too large')
+        except asyncio.IncompleteReadError:
+            return self.__error(400, 'Incomplete request')
+        except asyncio.TimeoutError:
+            return self.__error(408, 'The headers are not received in time')
+
+        request_line, *header_lines = head.decode('latin-1').split('\r\n')
+        try:
+            method, target, _ = request_line.split(' ')
+        except ValueError:
+            return self.__error(400, 'Bad request line')
+
+        headers = {}
+        for line in header_lines:
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        try:
+            length = int(headers.get('content-length', 0))
+        except ValueError:
+            return self.__error(400, 'Bad content length')
+        if not 0 <= length <= MAX_BODY_SIZE:
+            return self.__error(413, 'The body is too large')
+
+        try:
+            body = await asyncio.wait_for(reader.readexactly(length), self.read_timeout)
+        except asyncio.IncompleteReadError:
+            return self.__error(400, 'Incomplete body')
+        except asyncio.TimeoutError:
+            return self.__error(408, 'The body is not received in time')
+
+        logger.debug(f'{method} {target}')
+
+        path = target.split('?')[0]
+
+        if path == '/jobs':
+            if method != 'POST':
+                return self.__error(405, 'Use POST to submit a job')
+            return await self.__post_job(body)
+
+        if method != 'GET':
+            return self.__error(405, 'Use GET')
+
+        if path == '/health':
+            return self.__json(200, dict(queued=self.__queue.qsize() if self.__queue else 0,
+                                         in_flight=len(self.in_flight), runs=self.n_runs,
+                                         kernels=len(self.kernels), results=len(self.results)))
+
+        if path.startswith('/jobs/'):
+            name = path[len('/jobs/'):]
+            job_id, is_png = (name[:-len('.png')], True) if name.endswith('.png') else (name, False)
+
+            result = self.results.get(job_id)
+            if result is None:
+                return self.__error(404, 'Unknown job')
+            if is_png:
+                return 200, PNG_TYPE, result.png
+            return self.__json(200, result.document)
+
+        return self.__error(404, 'Not found')
+
+    async def __post_job(self, body: bytes) -> Tuple[int, str, bytes]:
+        try:
+            job = Job.from_json(json.loads(body))
+        except ValueError:
+            return self.__error(400, 'The body is not a valid JSON')
+        except JobError as e:
+            return self.__error(400, str(e))
+
+        try:
+            result = await self.submit(job)
+        except asyncio.QueueFull:
+            return self.__error(503, 'The queue is full')
+        except JobError as e:
+            return self.__error(400, str(e))
+
+        return self.__json(200, result.document)
+
+    @staticmethod
+    def __json(status: int, document: Dict[str, Any]) -> Tuple[int, str, bytes]:
+        return status, JSON_TYPE, json.dumps(document).encode()
+
+    @classmethod
+    def __error(cls, status: int, message: str) -> Tuple[int, str, bytes]:
+        logger.debug(f'{status}: {message}')
+        return cls.__json(status, dict(error=message))
+
+
+async def serve(host: str, port: int, num_workers: int) -> None:
+    service = RenderService(num_workers)
+    await service.start(host, port)
+
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await service.stop()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--workers', type=int, default=DEFAULT_NUM_WORKERS)
+    parser.add_argument('--log-level', default=None)
+    args = parser.parse_args()
+
+    configure_logging(args.log_level)
+
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,196 @@
+import numpy as np
+
+from enum import Enum
+from time import perf_counter
+from typing import Optional
+
+from pathlib import Path
+
+from .utils import get_logger
+
+
+logger = get_logger(Path(__file__).name)
+
+
+DEFAULT_MAX_ITER = 10000
+
+'''
+the quasi-Newton approximation is reset to the identity, when
+the curvature condition fails: s^T y <= CURVATURE_COEF * ||s|| * ||y||
+'''
+CURVATURE_COEF = 1e-10
+
+
+class Status(Enum):
+    CONVERGED = 1  # the norm of the gradient is less than epsilon
+    F_TOL = 2  # the relative change of the function value is less than f_tol
+    X_TOL = 3  # the relative step is less than x_tol
+    MAX_ITER = 4
+    MAX_GRAD_CALLS = 5
+    TIME_LIMIT = 6
+    NOT_FINITE = 7  # the method has produced NaN or infinity
+
+
+'''
+the statuses, which mean, that the method has found a (numerical) solution
+'''
+SUCCESS_STATUSES = frozenset((Status.CONVERGED, Status.F_TOL, Status.X_TOL))
+
+
+def get_status_message(status: Status) -> str:
+    '''
+    Returns a short human-readable description of a status
+
+    Parameters
+    ----------
+    status : Status
+        Status code
+
+    Returns
+    -------
+    str
+        Status message
+    '''
+
+    if status == Status.CONVERGED:
+        return 'converged'
+    if status == Status.F_TOL:
+        return 'function tolerance'
+    if status == Status.X_TOL:
+        return 'step tolerance'
+    if status == Status.MAX_ITER:
+        return 'iteration limit'
+    if status == Status.MAX_GRAD_CALLS:
+        return 'gradient call limit'
+    if status == Status.TIME_LIMIT:
+        return 'time limit'
+    if status == Status.NOT_FINITE:
+        return 'not finite'
+
+    return 'unknown status'
+
+
+class Termination:
+    '''
+    Stopping criteria of the gradient methods. Besides the convergence test,
+    every run is limited by the iteration, gradient call and wall-clock budgets,
+    so that a divergent run can not hang the caller.
+
+    The budgets are checked between the iterations, so a step, making several
+    gradient calls (e.g. with a line search), may exceed the gradient call budget
+    by the number of its calls
+
+    Parameters
+    ----------
+    epsilon : float
+        Desired norm of the gradient
+    max_iter : int
+        Maximal number of iterations
+    max_grad_calls : Optional[int]
+        Maximal number of gradient calls, unlimited if None
+    max_time : Optional[float]
+        Maximal wall time of the run in seconds, unlimited if None
+    f_tol : float
+        Relative tolerance of the function value change: the run stops, when
+        |f_k - f_k+1| <= f_tol * max(|f_k|, |f_k+1|, 1). Disabled if zero
+    x_tol : float
+        Relative tolerance of the step: the run stops, when
+        ||x_k+1 - x_k|| <= x_tol * (||x_k|| + x_tol). Disabled if zero
+    '''
+
+    def __init__(self, epsilon: float, max_iter: int = DEFAULT_MAX_ITER,
+                 max_grad_calls: Optional[int] = None, max_time: Optional[float] = None,
+                 f_tol: float = 0.0, x_tol: float = 0.0) -> None:
+        self.epsilon = epsilon
+        self.max_iter = max_iter
+        self.max_grad_calls = max_grad_calls
+        self.max_time = max_time
+        self.f_tol = f_tol
+        self.x_tol = x_tol
+
+        self.start_time = perf_counter()
+
+    def start(self, value: Optional[float], grad: np.ndarray) -> Optional[Status]:
+        '''
+        Starts the wall clock and checks the initial approximation
+
+        Parameters
+        ----------
+        value : Optional[float]
+            Objective function value at the initial approximation
+        grad : np.ndarray
+            Gradient at the initial approximation
+
+        Returns
+        -------
+        Optional[Status]
+            Status, if the run has to be stopped before the first iteration, otherwise None
+        '''
+
+        self.start_time = perf_counter()
+
+        if not self.__is_finite(value, grad):
+            return Status.NOT_FINITE
+        if np.linalg.norm(grad) < self.epsilon:
+            return Status.CONVERGED
+        if self.max_iter <= 0:
+            return Status.MAX_ITER
+
+        return None
+
+    def check(self, n_iter: int, n_grad_calls: int,
+              x: np.ndarray, value: Optional[float],
+              x_new: np.ndarray, value_new: Optional[float], grad_new: np.ndarray) -> Optional[Status]:
+        '''
+        Checks the stopping criteria after an iteration
+
+        Parameters
+        ----------
+        n_iter : int
+            Number of the iterations made
+        n_grad_calls : int
+            Number of the gradient calls made
+        x : np.ndarray
+            Previous point
+        value : Optional[float]
+            Objective function value at the previous point
+        x_new : np.ndarray
+            New point
+        value_new : Optional[float]
+            Objective function value at the new point
+        grad_new : np.ndarray
+            Gradient at the new point
+
+        Returns
+        -------
+        Optional[Status]
+            Status, if the run has to be stopped, otherwise None
+        '''
+
+        if not (self.__is_finite(value_new, grad_new) and np.all(np.isfinite(x_new))):
+            return Status.NOT_FINITE
+
+        if np.linalg.norm(grad_new) < self.epsilon:
+            return Status.CONVERGED
+
+        if self.f_tol > 0 and value is not None and value_new is not None and \
+                abs(value - value_new) <= self.f_tol * max(abs(value), abs(value_new), 1.0):
+            return Status.F_TOL
+
+        if self.x_tol > 0 and np.linalg.norm(x_new - x) <= self.x_tol * (np.linalg.norm(x) + self.x_tol):
+            return Status.X_TOL
+
+        if n_iter >= self.max_iter:
+            return Status.MAX_ITER
+
+        if self.max_grad_calls is not None and n_grad_calls >= self.max_grad_calls:
+            return Status.MAX_GRAD_CALLS
+
+        if self.max_time is not None and perf_counter() - self.start_time >= self.max_time:
+            return Status.TIME_LIMIT
+
+        return None
+
+    @staticmethod
+    def __is_finite(value: Optional[float], grad: np.ndarray) -> bool:
+        return (value is None or bool(np.isfinite(value))) and bool(np.all(np.isfinite(grad)))
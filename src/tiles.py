@@ -0,0 +1,275 @@
+import numpy as np
+from numpy.typing import DTypeLike
+
+from collections import OrderedDict
+from concurrent.futures import Executor, Future
+from threading import Lock
+from typing import Tuple, List, Callable, Any, Optional, Set
+
+from pathlib import Path
+
+from .utils import get_logger, trace_span
+
+
+logger = get_logger(Path(__file__).name)
+
+
+TILE_RESOLUTION = 32  # number of points along each side of a tile
+TILES_PER_VIEW = 2  # the tile size is chosen, so that the viewport spans 2-3 tiles along each axis
+DEFAULT_CAPACITY = 256  # number of tiles, kept in the cache
+MIN_TILE_LEVEL = -30
+
+'''
+The key of a tile: levels along the x and y axes and the indices of the tile.
+A tile at levels (lx, ly) with indices (i, j) covers
+[i * 2**lx, (i + 1) * 2**lx] x [j * 2**ly, (j + 1) * 2**ly]
+'''
+TileKey = Tuple[int, int, int, int]
+Tile = Tuple[np.ndarray, np.ndarray, np.ndarray]
+Region = Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]
+
+
+def tile_level(width: float) -> int:
+    '''
+    Chooses the zoom level of the tiles for a viewport of a given width
+
+    Parameters
+    ----------
+    width : float
+        Width of the viewport along an axis
+
+    Returns
+    -------
+    int
+        Level, i.e. the logarithm of the tile size
+    '''
+
+    if not width > 0:
+        return MIN_TILE_LEVEL
+
+    return max(MIN_TILE_LEVEL, int(np.ceil(np.log2(width / TILES_PER_VIEW))))
+
+
+def tile_coords(level: int, index: int, resolution: int) -> np.ndarray:
+    '''
+    Returns coordinates of the grid points of a tile along an axis. The points are
+    placed in the centers of the cells, so the tiles, put next to each other,
+    form a regular grid
+
+    Parameters
+    ----------
+    level : int
+        Level of the tile
+    index : int
+        Index of the tile
+    resolution : int
+        Number of points along the axis
+
+    Returns
+    -------
+    np.ndarray
+        Coordinates
+    '''
+
+    step = 2.0**level / resolution
+    return (index * resolution + np.arange(resolution) + 0.5) * step
+
+
+class TileCache:
+    '''
+    Cache of the objective function surface, split into square tiles at several zoom levels.
+
+    Each tile is evaluated once with the batched kernel and kept in the LRU cache,
+    so panning and zooming only evaluates the tiles, that were not visible before.
+    The missing tiles may be computed in the calling thread or by a background executor.
+    With a float32 dtype the tiles take half of the memory, and the batched kernels compute in float32
+    '''
+
+    def __init__(self, value_and_grad: Callable[[np.ndarray], Tuple[Any, np.ndarray]],
+                 resolution: int = TILE_RESOLUTION, capacity: int = DEFAULT_CAPACITY,
+                 dtype: DTypeLike = np.float64) -> None:
+        self.value_and_grad = value_and_grad
+        self.resolution = resolution
+        self.capacity = capacity
+        self.dtype = np.dtype(dtype)  # type of the tiles and of the points, the kernel is evaluated at
+
+        self.__tiles: 'OrderedDict[TileKey, Tile]' = OrderedDict()
+        self.__pending: Set[TileKey] = set()
+        self.__lock = Lock()
+
+        self.n_evaluated = 0  # number of evaluated tiles, used to check the cache efficiency
+
+    def __len__(self) -> int:
+        return len(self.__tiles)
+
+    def tile_keys(self, x_lims: Tuple[float, float], y_lims: Tuple[float, float]) -> List[TileKey]:
+        '''
+        Returns the keys of the tiles, covering the viewport
+
+        Parameters
+        ----------
+        x_lims : Tuple[float, float]
+            x axis limits
+        y_lims : Tuple[float, float]
+            y axis limits
+
+        Returns
+        -------
+        List[TileKey]
+            Keys of the tiles
+        '''
+
+        level_x = tile_level(x_lims[1] - x_lims[0])
+        level_y = tile_level(y_lims[1] - y_lims[0])
+
+        i_0, i_1 = (int(np.floor(lim / 2.0**level_x)) for lim in x_lims)
+        j_0, j_1 = (int(np.floor(lim / 2.0**level_y)) for lim in y_lims)
+
+        return [(level_x, level_y, i, j) for j in range(j_0, j_1 + 1) for i in range(i_0, i_1 + 1)]
+
+    def missing(self, keys: List[TileKey]) -> List[TileKey]:
+        '''
+        Returns the keys of the tiles, that are neither cached nor being computed
+        '''
+
+        with self.__lock:
+            return [key for key in keys if key not in self.__tiles and key not in self.__pending]
+
+    def compute(self, keys: List[TileKey]) -> None:
+        '''
+        Evaluates the tiles with a single call to the batched kernel and puts them into the cache
+
+        Parameters
+        ----------
+        keys : List[TileKey]
+            Keys of the tiles
+        '''
+
+        if not keys:
+            return
+
+        logger.debug(f'Computing {len(keys)} tiles')
+
+        n = self.resolution
+
+        with trace_span(logger, 'compute_tiles', n_tiles=len(keys)):
+            points = np.empty((2, len(keys), n, n), dtype=self.dtype)
+            for k, (level_x, level_y, i, j) in enumerate(keys):
+                points[0, k], points[1, k] = np.meshgrid(tile_coords(level_x, i, n), tile_coords(level_y, j, n))
+
+            Z, (grad_X, grad_Y) = self.value_and_grad(points)
+
+        with self.__lock:
+            for k, key in enumerate(keys):
+                self.__tiles[key] = (np.array(Z[k], dtype=self.dtype),
+                                     np.array(grad_X[k], dtype=self.dtype),
+                                     np.array(grad_Y[k], dtype=self.dtype))
+                self.__tiles.move_to_end(key)
+
+            while len(self.__tiles) > self.capacity:
+                self.__tiles.popitem(last=False)
+
+            self.n_evaluated += len(keys)
+
+    def submit(self, keys: List[TileKey], executor: Executor,
+               callback: Optional[Callable[[], None]] = None) -> Optional[Future]:
+        '''
+        Schedules computation of the missing tiles on a background executor
+
+        Parameters
+        ----------
+        keys : List[TileKey]
+            Keys of the tiles
+        executor : Executor
+            Executor to run the computation on
+        callback : Optional[Callable[[], None]]
+            Function, called from the worker after the tiles are computed
+
+        Returns
+        -------
+        Optional[Future]
+            Future of the computation or None, if there is nothing to compute
+        '''
+
+        keys = self.missing(keys)
+        if not keys:
+            return None
+
+        with self.__lock:
+            self.__pending.update(keys)
+
+        def job() -> None:
+            try:
+                self.compute(keys)
+            finally:
+                with self.__lock:
+                    self.__pending.difference_update(keys)
+            if callback is not None:
+                callback()
+
+        return executor.submit(job)
+
+    def get_region(self, x_lims: Tuple[float, float], y_lims: Tuple[float, float],
+                   compute_missing: bool = True) -> Region:
+        '''
+        Assembles the surface in the viewport from the tiles
+
+        Parameters
+        ----------
+        x_lims : Tuple[float, float]
+            x axis limits
+        y_lims : Tuple[float, float]
+            y axis limits
+        compute_missing : bool
+            Whether to compute the missing tiles in the calling thread.
+            Otherwise the missing tiles are filled with NaN
+
+        Returns
+        -------
+        Region
+            x and y values of the grid, function values and x and y components of the gradient
+        '''
+
+        keys = self.tile_keys(x_lims, y_lims)
+
+        if compute_missing:
+            self.compute(self.missing(keys))
+
+        n = self.resolution
+        level_x, level_y, i_0, j_0 = keys[0]
+        _, _, i_1, j_1 = keys[-1]
+
+        shape = ((j_1 - j_0 + 1) * n, (i_1 - i_0 + 1) * n)
+        Z, grad_X, grad_Y = (np.full(shape, np.nan, dtype=self.dtype) for _ in range(3))
+
+        with self.__lock:
+            for key in keys:
+                tile = self.__tiles.get(key)
+                if tile is None:
+                    continue
+                self.__tiles.move_to_end(key)
+
+                _, _, i, j = key
+                rows = slice((j - j_0) * n, (j - j_0 + 1) * n)
+                cols = slice((i - i_0) * n, (i - i_0 + 1) * n)
+                Z[rows, cols], grad_X[rows, cols], grad_Y[rows, cols] = tile
+
+        xs = np.concatenate([tile_coords(level_x, i, n) for i in range(i_0, i_1 + 1)])
+        ys = np.concatenate([tile_coords(level_y, j, n) for j in range(j_0, j_1 + 1)])
+
+        '''
+        the mosaic is cropped to the viewport, keeping one extra point
+        on each side, so that the contour lines reach the borders
+        '''
+        cols = self.__crop(xs, x_lims)
+        rows = self.__crop(ys, y_lims)
+
+        X, Y = np.meshgrid(xs[cols].astype(self.dtype), ys[rows].astype(self.dtype))
+
+        return X, Y, Z[rows, cols], grad_X[rows, cols], grad_Y[rows, cols]
+
+    @staticmethod
+    def __crop(coords: np.ndarray, lims: Tuple[float, float]) -> slice:
+        start = max(0, int(np.searchsorted(coords, lims[0])) - 1)
+        stop = min(len(coords), int(np.searchsorted(coords, lims[1])) + 1)
+        return slice(start, stop)
@@ -1,6 +1,6 @@
 import sympy
 
-from typing import Tuple, Callable, Optional
+from typing import Tuple, Callable, Optional, Any
 
 from pathlib import Path
 
@@ -8,63 +8,93 @@ import numpy as np
 
 from .utils import get_logger
 from .errors import Error
+from .autodiff import Tape
+from .jit import build_jit_value_and_grad, NUMBA_AVAILABLE
+from .precision import floating_dtype
+from .parser import prepare_expression, differentiate, SYMBOLS, REAL_SYMBOLS
+from .sandbox import get_sandbox, PARSE_TIMEOUT
 
 
 logger = get_logger(Path(__file__).name)
 
 
-def build_function(input_str: str) -> Tuple[Error,
-                                            Optional[sympy.core.function.Function],
-                                            Optional[Callable[[np.ndarray], float]]]:
+'''
+Fused kernel, returning the value and the gradient of the objective function.
+It accepts either a single point of shape (2,) or a batch of points of shape (2, ...)
+'''
+ValueAndGrad = Callable[[np.ndarray], Tuple[Any, np.ndarray]]
+
+'''
+partial derivatives of the objective function with respect to x and y
+'''
+Derivatives = Tuple[sympy.Expr, sympy.Expr]
+
+SYMPY_BACKEND = 'sympy'
+AUTODIFF_BACKEND = 'autodiff'
+JIT_BACKEND = 'numba'
+
+'''
+the jit backend is offered only if numba is installed
+'''
+DIFF_BACKENDS = (SYMPY_BACKEND, AUTODIFF_BACKEND) + ((JIT_BACKEND,) if NUMBA_AVAILABLE else ())
+
+
+def build_function(input_str: str, timeout: Optional[float] = PARSE_TIMEOUT) \
+        -> Tuple[Error, Optional[sympy.core.function.Function], Optional[Callable[[np.ndarray], float]],
+                 Optional[Derivatives]]:
     '''
-    Parses objective function from a given string
+    Parses objective function from a given string. The string is parsed by the restricted
+    parser (see parser.parse_expression), which never calls eval. Parsing and differentiation
+    are run in the sandbox process under the time budget, so an untrusted expression can not stall the caller.
+    The derivatives are returned, so that build_gradient and build_value_and_grad
+    do not differentiate the function again in the calling process
 
     Parameters
     ----------
     input_str : str
         Input string
+    timeout : Optional[float]
+        Time budget of parsing and differentiation in seconds. If None, the expression
+        is only parsed in the calling process, relying on the cost estimation of the parser
 
     Returns
     -------
-    Tuple[Error, Optional[sympy.core.function.Function], Optional[Callable[[np.ndarray], float]]]]
-        Tuple of the error code, parsed sympy function and a callable version
-        of this function
+    Tuple[Error, Optional[sympy.core.function.Function], Optional[Callable[[np.ndarray], float]],
+          Optional[Derivatives]]
+        Tuple of the error code, parsed sympy function, a callable version
+        of this function and its partial derivatives
     '''
     
     logger.debug('Building function')
 
-    if ',' in input_str:
-        logger.warning('The expression contains comma')
-        return Error.SYNTAX, None, None
-    
-    try:
-        func_sp = sympy.sympify(input_str)
+    err, func_sp, derivatives = Error.OK, None, None
 
-        unknown_functions = func_sp.atoms(sympy.core.function.AppliedUndef)
+    if timeout is not None:
+        try:
+            err, func_sp, derivatives = get_sandbox().run(input_str, timeout)
+        except RuntimeError as e:
+            logger.warning(f'{e}, parsing in the calling process')
+            timeout = None
 
-        if unknown_functions:
-            logger.warning('Unknown functions used: ' + str(unknown_functions))
-            return Error.GRAMMATICAL, None, None
+    if timeout is None:
+        err, func_sp, derivatives = prepare_expression(input_str)
 
-        unknown_symbols = func_sp.atoms(sympy.core.Symbol).difference(sympy.symbols('x y'))
-        
-        if unknown_symbols:
-            logger.warning('Unknown symbols used: ' + str(unknown_symbols))
-            return Error.GRAMMATICAL, None, None
-        
-        def func(x: np.ndarray) -> float:
-            nonlocal func_sp
-            func_eval = func_sp.subs('x', x[0]).subs('y', x[1]).evalf()
-            return float(func_eval)
+    if err != Error.OK:
+        logger.warning(f'Unable to parse the function: {err.name}')
+        return err, None, None, None
 
-        return Error.OK, func_sp, func
-        
-    except (SyntaxError, ValueError):
-        logger.warning('Syntax error in function definition')
-        return Error.SYNTAX, None, None
+    assert func_sp is not None
 
+    def func(x: np.ndarray) -> float:
+        nonlocal func_sp
+        func_eval = func_sp.subs('x', x[0]).subs('y', x[1]).evalf()
+        return float(func_eval)
 
-def build_gradient(func: sympy.core.function.Function) -> Tuple[Error, Optional[Callable[[np.ndarray], np.ndarray]]]:
+    return Error.OK, func_sp, func, derivatives
+
+
+def build_gradient(func: sympy.core.function.Function, derivatives: Optional[Derivatives] = None) \
+        -> Tuple[Error, Optional[Callable[[np.ndarray], np.ndarray]]]:
     '''
     Builds the gradient of the objective function
 
@@ -72,6 +102,8 @@ def build_gradient(func: sympy.core.function.Function) -> Tuple[Error, Optional[
     ----------
     func : sympy.core.function.Function
         Function to differentiate
+    derivatives : Optional[Derivatives]
+        Partial derivatives, computed by build_function. If None, the function is differentiated
 
     Returns
     -------
@@ -82,8 +114,7 @@ def build_gradient(func: sympy.core.function.Function) -> Tuple[Error, Optional[
     logger.debug('Building gradient')
     
     try:
-        grad_sp = sympy.Matrix([sympy.diff(func, 'x'),
-                                sympy.diff(func, 'y')])
+        grad_sp = sympy.Matrix(differentiate(func) if derivatives is None else derivatives)
 
         def grad(x: np.ndarray) -> np.ndarray:
             nonlocal grad_sp
@@ -95,3 +126,85 @@ def build_gradient(func: sympy.core.function.Function) -> Tuple[Error, Optional[
     except ValueError:
         logger.warning('Unable to differentiate the function')
         return Error.UNABLE_TO_DIFFERENTIALE, None
+
+
+def build_value_and_grad(func: sympy.core.function.Function, backend: str = SYMPY_BACKEND,
+                         derivatives: Optional[Derivatives] = None) -> Tuple[Error, Optional[ValueAndGrad]]:
+    '''
+    Builds a fused kernel, that computes the value and the gradient
+    of the objective function at once. Common subexpressions of the function
+    and its partial derivatives are evaluated only once per call
+
+    Parameters
+    ----------
+    func : sympy.core.function.Function
+        Function to differentiate
+    backend : str
+        One of DIFF_BACKENDS. The sympy backend differentiates the function
+        symbolically and compiles the derivatives with lambdify. The autodiff
+        backend records the function on a tape and differentiates it in the reverse mode,
+        which avoids the growth of symbolic derivatives of deeply nested expressions.
+        The numba backend compiles the symbolic derivatives to machine code;
+        if the function can not be compiled, the sympy backend is used instead
+    derivatives : Optional[Derivatives]
+        Partial derivatives, computed by build_function. If None, the function is differentiated.
+        The autodiff backend does not use them
+
+    Returns
+    -------
+    Tuple[Error, Optional[ValueAndGrad]]
+        Tuple of the error code and the kernel. Given a point of shape (2,),
+        the kernel returns a float and an array of shape (2,). Given a batch
+        of points of shape (2, ...), it returns an array of values of shape (...)
+        and an array of gradients of shape (2, ...). A float32 batch
+        is evaluated in float32, see precision.DtypePolicy
+    '''
+    
+    logger.debug(f'Building value and gradient kernel ({backend})')
+
+    assert backend in DIFF_BACKENDS
+
+    if backend == AUTODIFF_BACKEND:
+        try:
+            return Error.OK, Tape(func).value_and_grad
+        except ValueError:
+            logger.warning('Unable to differentiate the function')
+            return Error.UNABLE_TO_DIFFERENTIALE, None
+
+    if backend == JIT_BACKEND:
+        jit_kernel = build_jit_value_and_grad(func, derivatives)
+        if jit_kernel is not None:
+            return Error.OK, jit_kernel
+        logger.warning('Falling back to the sympy backend')
+
+    x, y = REAL_SYMBOLS['x'], REAL_SYMBOLS['y']
+    to_real = {SYMBOLS['x']: x, SYMBOLS['y']: y}
+
+    try:
+        if derivatives is None:
+            derivatives = differentiate(func)
+        exprs = [expr.subs(to_real) for expr in (func, *derivatives)]
+        kernel = sympy.lambdify([x, y], exprs, modules='numpy', cse=True)
+        
+    except (ValueError, TypeError, NotImplementedError):
+        logger.warning('Unable to differentiate the function')
+        return Error.UNABLE_TO_DIFFERENTIALE, None
+
+    def value_and_grad(point: np.ndarray) -> Tuple[Any, np.ndarray]:
+        shape = np.shape(point[0])
+        dtype = floating_dtype(point)
+
+        '''
+        constant subexpressions are returned as scalars, so
+        they have to be broadcasted to the shape of the input
+        '''
+        value, grad_x, grad_y = (np.broadcast_to(np.asarray(z, dtype=dtype), shape)
+                                 for z in kernel(point[0], point[1]))
+        grad = np.stack([grad_x, grad_y])
+
+        if not shape:
+            return float(value), grad
+        
+        return value, grad
+
+    return Error.OK, value_and_grad
@@ -1,15 +1,47 @@
+import os
 import sys
+import atexit
+import queue
 
+from contextlib import nullcontext
 from functools import update_wrapper
-from typing import Any, Callable
+from pathlib import Path
+from time import perf_counter
+from types import TracebackType
+from typing import Any, Callable, Optional, TextIO, Type, ContextManager, Dict
 
 import logging
+import logging.handlers
+
+
+ROOT_LOGGER_NAME = 'gmv'
+LOG_LEVEL_ENV = 'GMV_LOG_LEVEL'
+DEFAULT_LOG_LEVEL = 'WARNING'
+
+'''
+level of the trace spans and events, below DEBUG
+'''
+TRACE = 5
+logging.addLevelName(TRACE, 'TRACE')
+
+LOG_FORMAT = '%(name)-12s: %(levelname)-8s %(message)s%(fields)s'
+
+'''
+returned by trace_span, when tracing is disabled, so that
+a disabled span costs a single level check
+'''
+NULL_SPAN: ContextManager[None] = nullcontext()
+
+__listener: Optional[logging.handlers.QueueListener] = None
 
 
 def get_logger(name: str) -> logging.Logger:
     '''
     Utility function used in each module to
-    initialize a logger
+    initialize a logger. The logger is a child of the root logger
+    of the application, so it does not have handlers of its own,
+    and calling this function twice does not duplicate the output.
+    The output is set up once with configure_logging
 
     Parameters
     ----------
@@ -21,30 +53,159 @@ def get_logger(name: str) -> logging.Logger:
     logging.Logger
         Logger
     '''
-    
-    logger = logging.getLogger(name)
 
-    logger.setLevel(logging.DEBUG)
+    return logging.getLogger(f'{ROOT_LOGGER_NAME}.{Path(name).stem}')
+
+
+class StructuredFormatter(logging.Formatter):
+    '''
+    Formatter, that appends the structured fields of a record
+    (passed as extra={'fields': {...}}) as key=value pairs
+    '''
+
+    def format(self, record: logging.LogRecord) -> str:
+        fields = getattr(record, 'fields', None)
+        record.fields = ''.join(f' {key}={value}' for key, value in fields.items()) if fields else ''
+        return super().format(record)
+
+
+def parse_log_level(level: Optional[str]) -> int:
+    '''
+    Converts a level name (e.g. 'debug' or 'TRACE') or a number to the logging level.
+    If the level is not given, it is taken from the GMV_LOG_LEVEL environment variable
+
+    Parameters
+    ----------
+    level : Optional[str]
+        Level name or number
+
+    Returns
+    -------
+    int
+        Logging level
+    '''
+
+    if level is None:
+        level = os.environ.get(LOG_LEVEL_ENV, DEFAULT_LOG_LEVEL)
+
+    if level.isdigit():
+        return int(level)
+
+    value = logging.getLevelName(level.upper())
+    if not isinstance(value, int):
+        raise ValueError(f'Unknown logging level: {level}')
+
+    return value
+
+
+def configure_logging(level: Optional[str] = None, stream: TextIO = sys.stdout) -> None:
+    '''
+    The single configuration point of the logging. The records are put into a queue
+    by the loggers, and written to the stream by a background listener, so that
+    writing to the stream does not block the GUI thread. May be called again to reconfigure
+
+    Parameters
+    ----------
+    level : Optional[str]
+        Level name or number, see parse_log_level
+    stream : TextIO
+        Output stream
+    '''
+
+    global __listener
+
+    shutdown_logging()
+
+    log_queue: 'queue.Queue[logging.LogRecord]' = queue.Queue()
+
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(StructuredFormatter(LOG_FORMAT))
+
+    __listener = logging.handlers.QueueListener(log_queue, handler)
+    __listener.start()
+
+    root = logging.getLogger(ROOT_LOGGER_NAME)
+    for old_handler in root.handlers[:]:
+        root.removeHandler(old_handler)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.setLevel(parse_log_level(level))
+    root.propagate = False
+
+
+def shutdown_logging() -> None:
+    '''
+    Stops the background listener, flushing the queued records
+    '''
+
+    global __listener
+
+    if __listener is not None:
+        __listener.stop()
+        __listener = None
+
+
+atexit.register(shutdown_logging)
+
+
+class Span:
+    '''
+    Trace span, that logs its duration and fields on exit
+    '''
+
+    def __init__(self, logger: logging.Logger, name: str, fields: Dict[str, Any]) -> None:
+        self.logger = logger
+        self.name = name
+        self.fields = fields
+
+    def __enter__(self) -> 'Span':
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, exc_type: Optional[Type[BaseException]],
+                 exc: Optional[BaseException],
+                 traceback: Optional[TracebackType]) -> None:
+        self.fields['duration_ms'] = f'{1e3 * (perf_counter() - self.start):.3f}'
+        if exc_type is not None:
+            self.fields['error'] = exc_type.__name__
+        self.logger.log(TRACE, self.name, extra={'fields': self.fields})
+
+
+def trace_span(logger: logging.Logger, name: str, **fields: Any) -> ContextManager[Any]:
+    '''
+    Creates a trace span, measuring the duration of a block of code.
+    If tracing is disabled for the logger, the shared no-op span is returned
+
+    Parameters
+    ----------
+    logger : logging.Logger
+        Logger
+    name : str
+        Name of the span
+    **fields : Any
+        Structured fields of the span
+
+    Returns
+    -------
+    ContextManager[Any]
+        Span
+    '''
+
+    if not logger.isEnabledFor(TRACE):
+        return NULL_SPAN
 
-    handler = logging.StreamHandler(sys.stdout)
-    handler.setLevel(logging.DEBUG)
-    formatter = logging.Formatter('%(name)-12s: %(levelname)-8s %(message)s')
-    handler.setFormatter(formatter)
-    logger.addHandler(handler)
+    return Span(logger, name, fields)
 
-    return logger
 
-    
 class CountCalls:
     '''
     Decorator class, that counts the number of calls to the decorated function
     '''
-    
+
     def __init__(self, func: Callable) -> None:
         update_wrapper(self, func)
         self.func = func
         self.n_calls = 0
-        
+
     def __call__(self, *args: Any, **kwargs: Any) -> Any:
         self.n_calls += 1
         return self.func(*args, **kwargs)
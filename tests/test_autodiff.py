@@ -0,0 +1,83 @@
+import sympy
+
+import numpy as np
+
+import pytest
+
+from src.autodiff import Tape
+from src.toolbar_utils import build_function, build_value_and_grad, SYMPY_BACKEND, AUTODIFF_BACKEND
+from src.errors import Error
+
+
+FUNCTIONS = [
+    'x**2+y**2-cos(2*x+y)',
+    'x*y-6.5*(Abs(x)-sin(cos(y)))',
+    'exp(x*y)/(1+x**2)+log(2+y**2)*atan(x)',
+    'x**y+sqrt(x)*tanh(y)',
+    '3'
+]
+
+POINTS = [np.array([0.7, 0.4]), np.array([1.5, -0.3])]
+
+
+def parse(input_string: str) -> sympy.Expr:
+    err, func_sp, _, _ = build_function(input_string)
+    assert err == Error.OK
+    return func_sp  # type: ignore
+
+
+@pytest.mark.parametrize('input_string', FUNCTIONS)
+def test_value_and_grad(input_string: str) -> None:
+    func_sp = parse(input_string)
+    _, expected = build_value_and_grad(func_sp, SYMPY_BACKEND)
+    tape = Tape(func_sp)
+
+    for point in POINTS:
+        value, grad = tape.value_and_grad(point)
+        expected_value, expected_grad = expected(point)  # type: ignore
+        assert isinstance(value, float)
+        assert np.isclose(value, expected_value)
+        assert np.allclose(grad, expected_grad)
+
+    batch = np.random.default_rng(0).uniform(0.1, 2, size=(2, 3, 4))
+    values, grads = tape.value_and_grad(batch)
+    expected_values, expected_grads = expected(batch)  # type: ignore
+    assert values.shape == (3, 4)
+    assert grads.shape == (2, 3, 4)
+    assert np.allclose(values, expected_values)
+    assert np.allclose(grads, expected_grads)
+
+
+@pytest.mark.parametrize('input_string', FUNCTIONS)
+def test_hvp(input_string: str) -> None:
+    func_sp = parse(input_string)
+    x, y = sympy.symbols('x y', real=True)
+    func_real = func_sp.subs({sympy.Symbol('x'): x, sympy.Symbol('y'): y})
+    hessian = sympy.hessian(func_real, [x, y])
+    tape = Tape(func_sp)
+
+    direction = np.array([0.3, -1.2])
+    for point in POINTS:
+        hessian_value = hessian.subs({x: point[0], y: point[1]}).evalf()
+        expected = np.array(hessian_value, dtype=float).dot(direction)
+        assert np.allclose(tape.hvp(point, direction), expected)
+
+
+def test_deep_nesting() -> None:
+    x, y = sympy.symbols('x y')
+    expr = x
+    for _ in range(2000):
+        expr = sympy.sin(expr + y)
+    value, grad = Tape(expr).value_and_grad(np.array([0.5, 0.1]))
+    assert np.isfinite(value)
+    assert np.all(np.isfinite(grad))
+
+
+def test_unsupported() -> None:
+    '''
+    gamma is not in the allow-list of the parser, so the expression is built directly
+    '''
+    func_sp = sympy.gamma(sympy.Symbol('x')) + sympy.Symbol('y')
+    err, kernel = build_value_and_grad(func_sp, AUTODIFF_BACKEND)
+    assert err == Error.UNABLE_TO_DIFFERENTIALE
+    assert kernel is None
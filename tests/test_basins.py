@@ -0,0 +1,93 @@
+import numpy as np
+
+from typing import Tuple, Any
+
+from concurrent.futures import ThreadPoolExecutor
+
+from src.basins import batch_bfgs, BasinMap, PENDING
+from src.optimizers import optimize
+from src.termination import Status
+
+
+def double_well(points: np.ndarray) -> Tuple[Any, np.ndarray]:
+    x, y = points[0], points[1]
+    return (x**2 - 1)**2 + y**2, np.stack([4 * x * (x**2 - 1), 2 * y])
+
+
+def nan_below_zero(points: np.ndarray) -> Tuple[Any, np.ndarray]:
+    x, y = points[0], points[1]
+    with np.errstate(invalid='ignore'):
+        return np.sqrt(x) + y**2, np.stack([0.5 / np.sqrt(x), 2 * y])
+
+
+def test_matches_driver() -> None:
+    starts = np.random.default_rng(0).uniform(-2, 2, size=(2, 50))
+    x, n_iter, status = batch_bfgs(double_well, starts, 1e-6)
+
+    for i in range(starts.shape[1]):
+        res, _ = optimize('bfgs', double_well, starts[:, i], 1e-6, max_iter=200)
+
+        assert status[i] == res['status'].value
+        assert n_iter[i] == res['n_iter']
+        assert np.allclose(x[:, i], res['x'])
+
+
+def test_not_finite() -> None:
+    x, n_iter, status = batch_bfgs(nan_below_zero, np.array([[1.0, -1.0], [1.0, 1.0]]), 1e-6)
+
+    assert np.all(status == Status.NOT_FINITE.value)
+    assert np.all(np.isfinite(x))
+    assert n_iter[1] == 0
+
+
+def test_basin_map() -> None:
+    basin_map = BasinMap(double_well, (-2, 2), (-1, 1), 1e-6, shape=(6, 8), block_rows=4)
+
+    basin_map.compute_block()
+    assert not basin_map.done
+    assert np.all(basin_map.status[4:] == PENDING)
+    assert np.all(np.isnan(basin_map.basins()[4:]))
+
+    labels = basin_map.labels[:4].copy()
+    basin_map.compute_all()
+    assert basin_map.done
+    assert np.array_equal(basin_map.labels[:4], labels)
+
+    assert np.all(basin_map.status == Status.CONVERGED.value)
+    assert np.allclose(np.sort(basin_map.minima[:, 0]), [-1, 1], atol=1e-4)
+
+    '''
+    the starts far enough from the hump converge to the nearest minimum
+    '''
+    for side in (basin_map.X < -1.5, basin_map.X > 1.5):
+        minima = basin_map.minima[basin_map.labels[side]]
+        assert np.allclose(minima, minima[0], atol=1e-4)
+
+    iterations = basin_map.iterations()
+    assert np.all(iterations >= 0)
+
+
+def test_submit() -> None:
+    basin_map = BasinMap(double_well, (-2, 2), (-1, 1), 1e-6, shape=(6, 8), block_rows=4)
+    expected = BasinMap(double_well, (-2, 2), (-1, 1), 1e-6, shape=(6, 8), block_rows=4)
+    expected.compute_all()
+
+    n_ready = []
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        future = basin_map.submit(executor, lambda: n_ready.append(1))
+        assert future is not None
+
+        '''
+        a block of the map is scheduled at a time
+        '''
+        assert basin_map.submit(executor) is None or future.done()
+        future.result()
+
+        while not basin_map.done:
+            next_future = basin_map.submit(executor)
+            assert next_future is not None
+            next_future.result()
+
+    assert basin_map.submit(executor) is None
+    assert n_ready == [1]
+    assert np.array_equal(basin_map.labels, expected.labels)
@@ -1,5 +1,7 @@
 import numpy as np
 
+from typing import Tuple
+
 from src.bfgs import bfgs
 
 
@@ -23,3 +25,15 @@ def test_ravine() -> None:
     x = res['x']  # type: ignore
 
     assert np.linalg.norm(x) < 1e-3
+
+
+def test_value_and_grad() -> None:
+    def value_and_grad(x: np.ndarray) -> Tuple[float, np.ndarray]:
+        return float(x.dot(x)), 2 * x
+    x0 = np.array([1, 1])
+    epsilon = 1e-5
+    res, _ = bfgs(None, x0, epsilon, value_and_grad=value_and_grad)
+    x = res['x']  # type: ignore
+
+    assert np.linalg.norm(x) < 1e-3
+    assert res['fun'] < 1e-6  # type: ignore
@@ -0,0 +1,140 @@
+import warnings
+
+import numpy as np
+
+import pytest
+
+from pathlib import Path
+
+from typing import Any
+
+from matplotlib.figure import Figure
+
+from src.bfgs import bfgs
+from src.termination import Status
+from src.levels import GridLevels
+from src.plotting import plot_gradient, plot_contour, plot_quiver
+from src.export import HistoryWriter, save_history, load_history, save_surface, load_surface, \
+    save_figure, build_report, render_report_page, SURFACE_FILE, HISTORY_FILE_PATTERN
+
+
+X, Y = np.meshgrid(np.linspace(-2, 2, 21), np.linspace(-1, 1, 11))
+SURFACE = (X, Y, X**2 + 3 * Y**2, 2 * X, 6 * Y)
+
+
+def run_bfgs(x_0: np.ndarray) -> tuple:
+    def grad(x: np.ndarray) -> np.ndarray:
+        return np.array([2 * x[0], 6 * x[1]])
+    return bfgs(grad, x_0, 1e-5)
+
+
+def test_history(tmp_path: Path) -> None:
+    result, history = run_bfgs(np.array([1.5, -0.5]))
+
+    save_history(tmp_path / 'history.npz', history, result, 'BFGS')
+    loaded, loaded_result, title = load_history(tmp_path / 'history.npz')
+
+    assert np.array_equal(loaded, history)
+    assert loaded.dtype == np.float64
+    assert title == 'BFGS'
+    assert loaded_result['status'] is Status.CONVERGED
+    assert loaded_result['n_iter'] == result['n_iter']
+    assert np.array_equal(loaded_result['x'], result['x'])
+
+
+def test_float32(tmp_path: Path) -> None:
+    history = np.random.default_rng(0).normal(size=(1000, 2))
+
+    save_history(tmp_path / 'history.npz', history, dtype=np.float32, chunk_size=64)
+    loaded, result, title = load_history(tmp_path / 'history.npz')
+
+    assert loaded.dtype == np.float32
+    assert np.array_equal(loaded, history.astype(np.float32))
+    assert result == {} and title is None
+
+
+def test_streaming(tmp_path: Path) -> None:
+    history = np.cumsum(np.ones((250, 2)), axis=0)
+
+    with HistoryWriter(tmp_path / 'history.npz', chunk_size=100) as writer:
+        for point in history[:7]:
+            writer.write(point)
+        writer.write(history[7:])
+
+    assert writer.n_rows == 250 and writer.n_chunks == 3
+    assert np.array_equal(load_history(tmp_path / 'history.npz')[0], history)
+
+
+def test_empty_history(tmp_path: Path) -> None:
+    HistoryWriter(tmp_path / 'history.npz').close()
+    assert load_history(tmp_path / 'history.npz')[0].shape == (0, 2)
+
+
+def test_surface(tmp_path: Path) -> None:
+    save_surface(tmp_path / 'surface.npz', SURFACE, np.float32)
+    loaded = load_surface(tmp_path / 'surface.npz')
+
+    for array, loaded_array in zip(SURFACE, loaded):
+        assert loaded_array.dtype == np.float32
+        assert np.array_equal(loaded_array, array.astype(np.float32))
+
+
+def test_vector_figure(tmp_path: Path) -> None:
+    fig = Figure()
+    ax = fig.add_subplot()
+    gradient = plot_gradient(ax, X, Y, SURFACE[3], SURFACE[4])
+    plot_contour(ax, X, Y, SURFACE[2])
+    plot_quiver(ax, run_bfgs(np.array([1.5, -0.5]))[1])
+
+    save_figure(fig, tmp_path / 'figure.svg')
+    svg = (tmp_path / 'figure.svg').read_text()
+
+    '''
+    the gradient field and the contour lines are rasterized separately, the trajectory stays vector
+    '''
+    assert svg.count('<image') == 2
+    assert not gradient.get_rasterized()
+
+
+def test_report(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    save_surface(tmp_path / SURFACE_FILE, SURFACE)
+    for run_n, x_0 in enumerate([np.array([1.5, -0.5]), np.array([-1.0, 0.8])]):
+        result, history = run_bfgs(x_0)
+        save_history(tmp_path / HISTORY_FILE_PATTERN.format(run_n), history, result, f'run {run_n}')
+
+    assert build_report(tmp_path, tmp_path / 'report.pdf') == [tmp_path / 'report.pdf']
+    assert b'/Count 2' in (tmp_path / 'report.pdf').read_bytes()
+
+    '''
+    the level selection of the stored surface is computed once for all of the pages
+    '''
+    n_levels = []
+
+    def counting_levels(Z: np.ndarray) -> GridLevels:
+        n_levels.append(1)
+        return GridLevels(Z)
+
+    monkeypatch.setattr('src.export.GridLevels', counting_levels)
+
+    written = build_report(tmp_path, tmp_path / 'report.png')
+    assert written == [tmp_path / 'report_000.png', tmp_path / 'report_001.png']
+    assert all(path.stat().st_size for path in written)
+    assert n_levels == [1]
+
+
+def test_undefined_gradient() -> None:
+    grad_X, grad_Y = np.array(SURFACE[3]), np.array(SURFACE[4])
+    grad_X[0, 0], grad_X[0, 1] = np.nan, np.inf
+    grad_X[0, 2], grad_Y[0, 2] = 1e308, 1e308
+
+    '''
+    the arrows, where the direction is not defined (including the minimum), are masked without warnings
+    '''
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        fig = render_report_page((X, Y, SURFACE[2], grad_X, grad_Y), np.zeros((1, 2)), None, {})
+
+    gradient: Any = fig.axes[0].collections[0]
+    masked = np.asarray(gradient.Umask)
+    assert np.array_equal(np.flatnonzero(masked), [0, 1, 5 * X.shape[1] + 10])
+    assert np.allclose(np.hypot(gradient.U, gradient.V)[~masked], 1)
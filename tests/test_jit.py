@@ -0,0 +1,103 @@
+import numpy as np
+
+import pytest
+
+from typing import Dict, Any
+
+from src import jit, toolbar_utils
+from src.errors import Error
+from src.optimizers import optimize
+from src.toolbar_utils import build_function, build_value_and_grad, SYMPY_BACKEND, JIT_BACKEND
+
+
+FUNCTIONS = ['x**2 + y**2 - cos(2*x + y)', 'x*y - 6.5*(Abs(x) - sin(cos(y)))', 'x**y + sqrt(x)*tanh(y) + pi', '3']
+
+
+@pytest.mark.parametrize('input_str', FUNCTIONS)
+def test_kernel(input_str: str) -> None:
+    pytest.importorskip('numba')
+
+    _, func, _, _ = build_function(input_str)
+    kernel = jit.build_jit_value_and_grad(func)
+    assert kernel is not None
+
+    _, expected = build_value_and_grad(func, SYMPY_BACKEND)
+    assert expected is not None
+
+    point = np.array([0.7, 0.4])
+    value, grad = kernel(point)
+    expected_value, expected_grad = expected(point)
+    assert isinstance(value, float)
+    assert grad.shape == (2,)
+    assert np.isclose(value, expected_value)
+    assert np.allclose(grad, expected_grad)
+
+    points = np.random.default_rng(0).uniform(0.1, 2.0, size=(2, 3, 4))
+    values, grads = kernel(points)
+    expected_values, expected_grads = expected(points)
+    assert values.shape == (3, 4)
+    assert grads.shape == (2, 3, 4)
+    assert np.allclose(values, expected_values)
+    assert np.allclose(grads, expected_grads)
+
+
+def test_bfgs_loop() -> None:
+    pytest.importorskip('numba')
+
+    _, func, _, _ = build_function('(1 - x)**2 + 100*(y - x**2)**2')
+    _, kernel = build_value_and_grad(func, JIT_BACKEND)
+    _, expected_kernel = build_value_and_grad(func, SYMPY_BACKEND)
+    assert isinstance(kernel, jit.JitKernel)
+    assert expected_kernel is not None
+
+    x0 = np.array([0.5, -0.5])
+    res, history = optimize('bfgs', kernel, x0, 1e-5)
+    expected_res, expected_history = optimize('bfgs', expected_kernel, x0, 1e-5)
+
+    assert res['success']
+    assert np.allclose(res['x'], [1, 1], atol=1e-4)
+    assert np.allclose(history[0], x0)
+    assert np.allclose(history[-1], res['x'])
+    assert len(history) == res['n_iter'] + 1
+    assert res['n_grad_calls'] == res['n_iter'] + 1
+    assert np.allclose(history[:5], expected_history[:5])
+
+    res, history = optimize('bfgs', kernel, x0, 1e-12, max_iter=5)
+    assert not res['success']
+    assert res['n_iter'] == 5
+    assert len(history) == 6
+
+
+def test_fallback(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(jit, 'NUMBA_AVAILABLE', False)
+
+    _, func, _, _ = build_function('x**2 + y**2')
+    assert jit.build_jit_value_and_grad(func) is None
+
+    monkeypatch.setattr(toolbar_utils, 'DIFF_BACKENDS', toolbar_utils.DIFF_BACKENDS + (JIT_BACKEND,))
+    err, kernel = build_value_and_grad(func, JIT_BACKEND)
+    assert err == Error.OK
+    assert kernel is not None
+    assert np.allclose(kernel(np.array([1.0, 2.0]))[1], [2, 4])
+
+
+@pytest.mark.parametrize('options', [{}, dict(f_tol=1e-4), dict(max_grad_calls=3), dict(max_iter=2)])
+@pytest.mark.parametrize('input_str', ['sqrt(x) + y**2', 'exp(-x) + y**2', 'x**2 + y**2 - cos(2*x + y)'])
+def test_bfgs_loop_termination(input_str: str, options: Dict[str, Any]) -> None:
+    pytest.importorskip('numba')
+
+    _, func, _, _ = build_function(input_str)
+    _, kernel = build_value_and_grad(func, JIT_BACKEND)
+    _, expected_kernel = build_value_and_grad(func, SYMPY_BACKEND)
+    assert kernel is not None and expected_kernel is not None
+
+    x0 = np.array([1.0, 1.0])
+    with np.errstate(invalid='ignore'):
+        res, history = optimize('bfgs', kernel, x0, 1e-8, **options)
+        expected_res, expected_history = optimize('bfgs', expected_kernel, x0, 1e-8, **options)
+
+    assert res['status'] == expected_res['status']
+    assert res['success'] == expected_res['success']
+    assert res['n_iter'] == expected_res['n_iter']
+    assert np.all(np.isfinite(history))
+    assert np.allclose(history, expected_history)
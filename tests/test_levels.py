@@ -0,0 +1,73 @@
+import numpy as np
+
+import pytest
+
+from matplotlib.figure import Figure
+
+from src.levels import GridLevels, LEVEL_SCALES, LOG_SCALE, QUANTILE_SCALE
+from src.plotting import plot_contour
+
+
+X, Y = np.meshgrid(np.linspace(-2, 2, 41), np.linspace(-2, 2, 41))
+
+SURFACES = [
+    X**2 + Y**2,
+    -np.exp(-(X**2 + Y**2)),  # the maximum is (almost) zero and the values are negative
+    np.exp(10 * X) * Y**2,  # spans many orders of magnitude
+    np.where(X > 0, np.nan, X * Y),  # half of the grid is not defined
+    np.where(X > 1, np.inf, np.sinh(30 * Y)),
+    1e300 * X * Y,
+]
+
+
+@pytest.mark.parametrize('scale', LEVEL_SCALES)
+@pytest.mark.parametrize('surface_n', range(len(SURFACES)))
+def test_levels(surface_n: int, scale: str) -> None:
+    Z = SURFACES[surface_n]
+    levels = GridLevels(Z).levels(10, scale)
+
+    finite = Z[np.isfinite(Z)]
+    assert 0 < len(levels) <= 10
+    assert np.all(np.isfinite(levels))
+    assert np.all(np.diff(levels) > 0)
+    assert np.all((levels > finite.min()) & (levels < finite.max()))
+
+
+@pytest.mark.parametrize('Z', [np.full((3, 3), 2.0), np.full((3, 3), np.nan), np.array([[0.0, np.inf]])])
+def test_no_levels(Z: np.ndarray) -> None:
+    grid_levels = GridLevels(Z)
+    assert grid_levels.empty
+    for scale in LEVEL_SCALES:
+        assert grid_levels.levels(10, scale).size == 0
+
+
+def test_quantile_equalization() -> None:
+    Z = np.exp(10 * X)
+    levels = GridLevels(Z).levels(9, QUANTILE_SCALE)
+
+    '''
+    each band between the levels has the same share of the grid
+    '''
+    counts = np.histogram(Z, bins=np.concatenate([[Z.min()], levels, [Z.max()]]))[0]
+    assert counts.max() - counts.min() <= X.shape[0]
+
+
+def test_log_levels_are_dense_near_minimum() -> None:
+    levels = GridLevels(X**2 + Y**2).levels(10, LOG_SCALE)
+    assert np.all(np.diff(np.diff(levels)) > 0)
+
+
+def test_float32() -> None:
+    Z = (X**2 + Y**2).astype(np.float32)
+    assert np.allclose(GridLevels(Z).levels(10), GridLevels(Z.astype(np.float64)).levels(10))
+
+
+def test_plot_contour() -> None:
+    ax = Figure().add_subplot()
+
+    Z = SURFACES[3]
+    artist = plot_contour(ax, X, Y, Z, 7, grid_levels=GridLevels(Z))
+    assert artist is not None
+    assert len(artist.levels) == 7
+
+    assert plot_contour(ax, X, Y, np.full(X.shape, np.nan)) is None
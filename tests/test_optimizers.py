@@ -0,0 +1,63 @@
+import numpy as np
+
+import pytest
+
+from typing import Tuple
+
+from src.optimizers import optimize, get_optimizer, register_optimizer, HistoryBuffer, OPTIMIZERS, \
+    ConjugateGradient, QuasiNewton
+
+
+def quadratic(x: np.ndarray) -> Tuple[float, np.ndarray]:
+    return float(x[0]**2 + 3 * x[1]**2 + x[0] * x[1]), np.array([2 * x[0] + x[1], 6 * x[1] + x[0]])
+
+
+@pytest.mark.parametrize('method', OPTIMIZERS)
+def test_quadratic(method: str) -> None:
+    x0 = np.array([1.0, -2.0])
+    epsilon = 1e-5
+    res, history = optimize(method, quadratic, x0, epsilon)
+
+    assert res['success']
+    assert res['method'] == method
+    assert np.linalg.norm(res['x']) < 1e-3
+    assert np.allclose(history[0], x0)
+    assert np.allclose(history[-1], res['x'])
+    assert len(history) == res['n_iter'] + 1
+    assert res['n_grad_calls'] >= res['n_iter'] + 1
+    assert res['time'] > 0
+
+
+def test_max_iter() -> None:
+    res, history = optimize('gd', quadratic, np.array([1.0, -2.0]), 1e-12, max_iter=5)
+
+    assert not res['success']
+    assert res['n_iter'] == 5
+    assert len(history) == 6
+
+
+def test_unknown_method() -> None:
+    with pytest.raises(ValueError):
+        get_optimizer('newton')
+
+
+@pytest.mark.parametrize('base', [ConjugateGradient, QuasiNewton])
+def test_incomplete_optimizer(base: type) -> None:
+    class Incomplete(base):  # type: ignore[valid-type, misc]
+        name = 'incomplete'
+
+    with pytest.raises(TypeError):
+        Incomplete()
+    with pytest.raises(AssertionError):
+        register_optimizer(Incomplete)
+    assert 'incomplete' not in OPTIMIZERS
+
+
+def test_history_buffer() -> None:
+    buffer = HistoryBuffer(2, capacity=1)
+    points = np.arange(20, dtype=float).reshape(10, 2)
+    for point in points:
+        buffer.append(point)
+
+    assert len(buffer) == 10
+    assert np.array_equal(buffer.array(), points)
@@ -0,0 +1,90 @@
+import sympy
+
+import pytest
+
+from typing import Optional
+
+from src.parser import parse_expression, prepare_expression, tokenize, estimate_cost, Parser, \
+    MAX_INPUT_LENGTH, MAX_DEPTH, MAX_NODES
+from src.errors import Error
+
+
+class ParseCase:
+
+    def __init__(self, name: str, error: Error, input_string: str, expr: Optional[sympy.Expr]):
+        self.name = name
+        self.error = error
+        self.input_string = input_string
+        self.expr = expr
+
+    def __str__(self) -> str:
+        return f'test_{self.name}'
+
+
+x, y = sympy.symbols('x y')
+
+PARSE_CASES = [
+    ParseCase('precedence', Error.OK, '1+2*x**2/y', 1 + 2 * x**2 / y),
+    ParseCase('unary minus', Error.OK, '-x**2', -x**2),
+    ParseCase('right associative power', Error.OK, '2**x**y', 2**(x**y)),
+    ParseCase('caret', Error.OK, 'x^2+y^2', x**2 + y**2),
+    ParseCase('negative exponent', Error.OK, 'x**-2', x**-2),
+    ParseCase('rational', Error.OK, '1/3*x', sympy.Rational(1, 3) * x),
+    ParseCase('float', Error.OK, '1.5e1*x+.5', 15 * x + 0.5),
+    ParseCase('constants', Error.OK, 'pi*x+E', sympy.pi * x + sympy.E),
+    ParseCase('functions', Error.OK, 'exp(sin(x))-sqrt(Abs(y))', sympy.exp(sympy.sin(x)) - sympy.sqrt(sympy.Abs(y))),
+    ParseCase('empty', Error.SYNTAX, '  ', None),
+    ParseCase('implicit multiplication', Error.SYNTAX, '2x', None),
+    ParseCase('unbalanced', Error.SYNTAX, 'sin(x', None),
+    ParseCase('attribute', Error.SYNTAX, 'x.real', None),
+    ParseCase('dunder', Error.GRAMMATICAL, '__import__(x)', None),
+    ParseCase('function without call', Error.GRAMMATICAL, 'sin+x', None),
+    ParseCase('symbol call', Error.GRAMMATICAL, 'x(y)', None),
+    ParseCase('huge power', Error.TOO_LARGE, '9**9**9', None),
+    ParseCase('nested powers', Error.TOO_LARGE, '((9**900)**900)**900', None),
+    ParseCase('huge exponent', Error.TOO_LARGE, 'x**100000', None),
+    ParseCase('huge float', Error.TOO_LARGE, '1e100000*x', None),
+    ParseCase('too long', Error.TOO_LARGE, '+'.join(['x'] * MAX_INPUT_LENGTH), None),
+    ParseCase('too deep', Error.TOO_LARGE, '(' * (MAX_DEPTH + 1) + 'x' + ')' * (MAX_DEPTH + 1), None),
+    ParseCase('too many nodes', Error.TOO_LARGE, '+'.join(['x'] * (MAX_NODES // 2 + 1)), None),
+    ParseCase('too costly', Error.TOO_LARGE, 'sin(' * 39 + 'x*y' + ')' * 39 + '*x' * 150, None),
+]
+
+
+@pytest.mark.parametrize('case', PARSE_CASES, ids=str)
+def test_parse_expression(case: ParseCase) -> None:
+    err, expr = parse_expression(case.input_string)
+    assert err == case.error
+    if err == Error.OK:
+        assert sympy.simplify(expr - case.expr) == 0  # type: ignore
+
+
+SYMPIFY_CASES = ['x**2/3-24*sqrt(y)/x', 'x*y-6.5*(Abs(x)-sin(cos(y)))', 'tanh(x)+log(1+y**2)']
+
+
+@pytest.mark.parametrize('input_string', SYMPIFY_CASES)
+def test_matches_sympify(input_string: str) -> None:
+    err, expr = parse_expression(input_string)
+    assert err == Error.OK
+    assert expr == sympy.sympify(input_string)
+
+
+def test_tokenize() -> None:
+    assert tokenize('x**2 + 1.5') == [('name', 'x'), ('op', '**'), ('number', '2'),
+                                      ('op', '+'), ('number', '1.5'), ('end', '')]
+
+
+def test_cost_grows_with_nesting() -> None:
+    costs = [estimate_cost(Parser(tokenize('sin(' * n + 'x*y' + ')' * n)).parse()) for n in range(1, 6)]
+    assert costs == sorted(costs)
+    assert costs[-1] - costs[-2] > costs[1] - costs[0]
+
+
+def test_prepare_expression() -> None:
+    err, expr, derivatives = prepare_expression('x**2*y')
+    assert err == Error.OK
+    assert derivatives == (2 * x * y, x**2)
+
+    err, expr, derivatives = prepare_expression('a')
+    assert err == Error.GRAMMATICAL
+    assert expr is None and derivatives is None
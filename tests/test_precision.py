@@ -0,0 +1,88 @@
+import numpy as np
+
+import pytest
+
+from src.precision import get_policy, floating_dtype, DOUBLE_PRECISION, MIXED_PRECISION
+from src.toolbar_utils import build_function, build_value_and_grad, DIFF_BACKENDS
+from src.optimizers import optimize, HistoryBuffer
+from src.tiles import TileCache
+
+
+FUNCTIONS = ['x**2 + y**2 - cos(2*x + y)', 'x*y - 6.5*(Abs(x) - sin(cos(y)))', 'exp(-x**2)*log(1 + y**2) + pi']
+
+'''
+float32 has 24 bits of mantissa, so the relative error of a few operations is about 1e-6
+'''
+RTOL = 1e-5
+ATOL = 1e-5
+
+
+def test_policies() -> None:
+    assert get_policy(DOUBLE_PRECISION).storage == np.float64
+    assert get_policy(MIXED_PRECISION).storage == np.float32
+    assert get_policy(MIXED_PRECISION).accumulation == np.float64
+
+    with pytest.raises(ValueError):
+        get_policy('half')
+
+    assert floating_dtype(np.zeros(2, dtype=np.float32)) == np.float32
+    assert floating_dtype([1, 2]) == np.float64
+
+
+@pytest.mark.parametrize('backend', DIFF_BACKENDS)
+@pytest.mark.parametrize('input_str', FUNCTIONS)
+def test_kernel_accuracy(input_str: str, backend: str) -> None:
+    _, func, _, _ = build_function(input_str)
+    _, kernel = build_value_and_grad(func, backend)
+    assert kernel is not None
+
+    points = np.random.default_rng(0).uniform(-3, 3, size=(2, 40, 30))
+
+    values, grads = kernel(points)
+    values_32, grads_32 = kernel(points.astype(np.float32))
+
+    assert values_32.dtype == np.float32
+    assert grads_32.dtype == np.float32
+    assert np.allclose(values_32, values, rtol=RTOL, atol=ATOL)
+    assert np.allclose(grads_32, grads, rtol=RTOL, atol=ATOL)
+
+
+def test_tiles() -> None:
+    _, func, _, _ = build_function(FUNCTIONS[0])
+    _, kernel = build_value_and_grad(func)
+    assert kernel is not None
+
+    region = TileCache(kernel, resolution=8).get_region((-1.3, 2.1), (0.2, 0.9))
+    region_32 = TileCache(kernel, resolution=8, dtype=np.float32).get_region((-1.3, 2.1), (0.2, 0.9))
+
+    for array, array_32 in zip(region, region_32):
+        assert array_32.dtype == np.float32
+        assert np.allclose(array_32, array, rtol=RTOL, atol=ATOL)
+
+
+@pytest.mark.parametrize('backend', DIFF_BACKENDS)
+def test_history(backend: str) -> None:
+    _, func, _, _ = build_function(FUNCTIONS[0])
+    _, kernel = build_value_and_grad(func, backend)
+    assert kernel is not None
+
+    x0 = np.array([0.5, -0.5])
+    res, history = optimize('bfgs', kernel, x0, 1e-6)
+    res_32, history_32 = optimize('bfgs', kernel, x0, 1e-6, history_dtype=np.float32)
+
+    '''
+    the iterations are made in float64, so only the stored history is rounded
+    '''
+    assert history_32.dtype == np.float32
+    assert res_32['x'].dtype == np.float64
+    assert np.array_equal(res_32['x'], res['x'])
+    assert res_32['n_iter'] == res['n_iter']
+    assert np.allclose(history_32, history, rtol=RTOL, atol=ATOL)
+
+
+def test_history_buffer() -> None:
+    buffer = HistoryBuffer(2, capacity=1, dtype=np.float32)
+    for point in np.arange(10, dtype=float).reshape(5, 2):
+        buffer.append(point)
+
+    assert buffer.array().dtype == np.float32
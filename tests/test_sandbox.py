@@ -0,0 +1,46 @@
+import sympy
+
+import pytest
+
+from typing import Iterator
+
+from src.sandbox import ExpressionSandbox
+from src.errors import Error
+
+
+@pytest.fixture(scope='module')
+def sandbox() -> Iterator[ExpressionSandbox]:
+    sandbox = ExpressionSandbox()
+    yield sandbox
+    sandbox.close()
+
+
+def test_start(sandbox: ExpressionSandbox) -> None:
+    assert sandbox.start()
+    assert sandbox.start()
+
+
+def test_run(sandbox: ExpressionSandbox) -> None:
+    x, y = sympy.symbols('x y')
+
+    err, expr, derivatives = sandbox.run('x*sin(y)')
+    assert err == Error.OK
+    assert expr == x * sympy.sin(y)
+    assert derivatives == (sympy.sin(y), x * sympy.cos(y))
+
+    err, expr, derivatives = sandbox.run('x+y/(2')
+    assert err == Error.SYNTAX
+    assert expr is None
+
+
+def test_timeout_restarts_worker(sandbox: ExpressionSandbox) -> None:
+    '''
+    with a zero budget the result is never ready in time
+    '''
+    err, expr, _ = sandbox.run('x+y', timeout=0)
+    assert err == Error.TIMEOUT
+    assert expr is None
+
+    err, expr, _ = sandbox.run('x+y')
+    assert err == Error.OK
+    assert expr == sympy.Symbol('x') + sympy.Symbol('y')
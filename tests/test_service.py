@@ -0,0 +1,144 @@
+import asyncio
+import json
+
+import pytest
+
+from typing import Any, Tuple, Optional, Dict, Callable, Awaitable
+
+from src.service import RenderService, Job, JobError, DEFAULT_METHOD
+
+
+JOB = {'expression': 'x**2+y**2-cos(2*x+y)', 'x0': [1.5, -1.0], 'epsilon': 1e-5}
+
+
+async def request(port: int, method: str, path: str, body: Optional[bytes] = None) -> Tuple[int, bytes]:
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+
+    body = body or b''
+    writer.write(f'{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(body)}\r\n\r\n'.encode() + body)
+    await writer.drain()
+
+    response = await reader.read()
+    writer.close()
+    await writer.wait_closed()
+
+    head, _, payload = response.partition(b'\r\n\r\n')
+    return int(head.split()[1]), payload
+
+
+async def post_job(port: int, job: Dict[str, Any]) -> Tuple[int, Any]:
+    status, payload = await request(port, 'POST', '/jobs', json.dumps(job).encode())
+    return status, json.loads(payload)
+
+
+async def raw_request(port: int, data: bytes, close: bool = False) -> int:
+    '''
+    sends the data as is and, if close is set, closes the sending side of the connection
+    '''
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(data)
+    if close:
+        writer.write_eof()
+    await writer.drain()
+
+    response = await reader.read()
+    writer.close()
+    await writer.wait_closed()
+
+    return int(response.split()[1])
+
+
+def run_service(test: Callable[[RenderService, int], Awaitable[None]], read_timeout: float = 10.0) -> None:
+    async def main() -> None:
+        service = RenderService(num_workers=2, read_timeout=read_timeout)
+        port = await service.start(port=0)
+        try:
+            await test(service, port)
+        finally:
+            await service.stop()
+
+    asyncio.run(main())
+
+
+def test_job_from_json() -> None:
+    job = Job.from_json(JOB)
+    assert job.x_0 == (1.5, -1.0)
+    assert job.method == DEFAULT_METHOD
+    assert job.id == Job.from_json(dict(JOB)).id
+    assert job.id != Job.from_json({**JOB, 'epsilon': 1e-3}).id
+
+
+@pytest.mark.parametrize('data', [[], {'x0': [1, 2], 'epsilon': 1e-3}, {**JOB, 'x0': [1]}, {**JOB, 'x0': 'ab'},
+                                  {**JOB, 'epsilon': -1}, {**JOB, 'method': 'newton'}, {**JOB, 'backend': 'gpu'}])
+def test_job_from_json_invalid(data: Any) -> None:
+    with pytest.raises(JobError):
+        Job.from_json(data)
+
+
+def test_post_job() -> None:
+    async def test(service: RenderService, port: int) -> None:
+        status, document = await post_job(port, JOB)
+        assert status == 200
+        assert document['result']['success']
+        assert document['history'][0] == JOB['x0']
+        assert len(document['history']) == document['result']['n_iter'] + 1
+
+        status, png = await request(port, 'GET', document['image'])
+        assert status == 200
+        assert png.startswith(b'\x89PNG')
+
+        status, payload = await request(port, 'GET', f'/jobs/{document["id"]}')
+        assert status == 200
+        assert json.loads(payload) == document
+
+    run_service(test)
+
+
+def test_deduplication() -> None:
+    async def test(service: RenderService, port: int) -> None:
+        responses = await asyncio.gather(*[post_job(port, JOB) for _ in range(4)])
+        assert all(status == 200 for status, _ in responses)
+        assert len({json.dumps(document) for _, document in responses}) == 1
+        assert service.n_runs == 1
+
+        '''
+        the kernel (and its tiles) is shared by the jobs with the same expression
+        '''
+        status, _ = await post_job(port, {**JOB, 'x0': [0.5, 0.5]})
+        assert status == 200
+        assert service.n_runs == 2
+        assert len(service.kernels) == 1
+
+    run_service(test)
+
+
+def test_errors() -> None:
+    async def test(service: RenderService, port: int) -> None:
+        status, document = await post_job(port, {**JOB, 'expression': 'a+b'})
+        assert status == 400
+        assert 'error' in document
+
+        assert (await request(port, 'POST', '/jobs', b'{'))[0] == 400
+        assert (await request(port, 'GET', '/jobs'))[0] == 405
+        assert (await request(port, 'GET', '/jobs/0123456789abcdef.png'))[0] == 404
+        assert (await request(port, 'GET', '/unknown'))[0] == 404
+
+        status, payload = await request(port, 'GET', '/health')
+        assert status == 200
+        assert json.loads(payload)['in_flight'] == 0
+
+    run_service(test)
+
+
+def test_read_timeout() -> None:
+    async def test(service: RenderService, port: int) -> None:
+        head = b'POST /jobs HTTP/1.1\r\nContent-Length: 10\r\n\r\n'
+
+        assert await raw_request(port, b'') == 408
+        assert await raw_request(port, b'GET /health HTTP/1.1\r\n') == 408
+        assert await raw_request(port, head + b'{}') == 408
+        assert await raw_request(port, head + b'{}', close=True) == 400
+
+        assert (await request(port, 'GET', '/health'))[0] == 200
+
+    run_service(test, read_timeout=0.2)
@@ -0,0 +1,122 @@
+import numpy as np
+
+import pytest
+
+from time import sleep
+from typing import Tuple
+
+from matplotlib.figure import Figure
+
+from src.optimizers import optimize, get_optimizer, QuasiNewton
+from src.plotting import plot_quiver
+from src.termination import Status, SUCCESS_STATUSES
+
+
+def quadratic(x: np.ndarray) -> Tuple[float, np.ndarray]:
+    return float(x[0]**2 + 3 * x[1]**2 + x[0] * x[1]), np.array([2 * x[0] + x[1], 6 * x[1] + x[0]])
+
+
+def nan_below_half(x: np.ndarray) -> Tuple[float, np.ndarray]:
+    if x[0] < 0.5:
+        return np.nan, np.array([np.nan, np.nan])
+    return float(x[0]**2), np.array([2 * x[0], 0.0])
+
+
+def concave(x: np.ndarray) -> Tuple[float, np.ndarray]:
+    return float(-x.dot(x)), -2 * x
+
+
+def test_converged() -> None:
+    res, _ = optimize('gd', quadratic, np.array([1.0, -2.0]), 1e-5)
+
+    assert res['status'] == Status.CONVERGED
+    assert res['success']
+
+
+def test_not_finite() -> None:
+    res, history = optimize('gd', nan_below_half, np.array([2.0, 1.0]), 1e-5)
+
+    assert res['status'] == Status.NOT_FINITE
+    assert not res['success']
+    assert np.all(np.isfinite(history))
+    assert np.allclose(history[-1], res['x'])
+    assert np.isfinite(res['fun'])
+    assert len(history) == res['n_iter'] + 1
+
+    res, history = optimize('gd', nan_below_half, np.array([0.0, 1.0]), 1e-5)
+    assert res['status'] == Status.NOT_FINITE
+    assert res['n_iter'] == 0
+    assert len(history) == 1
+
+
+def test_divergence() -> None:
+    with np.errstate(over='ignore', invalid='ignore'):
+        res, history = optimize('gd', concave, np.array([1.0, 1.0]), 1e-5, alpha=10.0)
+
+    assert res['status'] == Status.NOT_FINITE
+    assert np.all(np.isfinite(history))
+
+
+@pytest.mark.parametrize('method', ['gd', 'cg-fr'])
+def test_grad_calls_budget(method: str) -> None:
+    res, _ = optimize(method, quadratic, np.array([1.0, -2.0]), 0.0, max_grad_calls=7)
+
+    assert res['status'] == Status.MAX_GRAD_CALLS
+    assert res['n_grad_calls'] >= 7
+
+
+def test_time_budget() -> None:
+    def slow_quadratic(x: np.ndarray) -> Tuple[float, np.ndarray]:
+        sleep(0.01)
+        return quadratic(x)
+
+    res, _ = optimize('gd', slow_quadratic, np.array([1.0, -2.0]), 0.0, max_time=0.05)
+
+    assert res['status'] == Status.TIME_LIMIT
+    assert not res['success']
+    assert res['time'] < 1.0
+
+
+def test_tolerances() -> None:
+    x0 = np.array([1.0, -2.0])
+    res_f, _ = optimize('gd', quadratic, x0, 0.0, f_tol=1e-6)
+    res_x, _ = optimize('gd', quadratic, x0, 0.0, x_tol=1e-6)
+
+    assert res_f['status'] == Status.F_TOL
+    assert res_x['status'] == Status.X_TOL
+    assert res_f['status'] in SUCCESS_STATUSES and res_f['success']
+    assert res_x['status'] in SUCCESS_STATUSES and res_x['success']
+    assert np.linalg.norm(res_f['x']) < 1e-2
+    assert np.linalg.norm(res_x['x']) < 1e-2
+
+
+@pytest.mark.parametrize('method', ['bfgs', 'dfp'])
+def test_hessian_reset(method: str) -> None:
+    optimizer = get_optimizer(method)
+    assert isinstance(optimizer, QuasiNewton)
+    x = np.array([1.0, 0.5])
+    value, grad = concave(x)
+    optimizer.start(x, value, grad)
+
+    optimizer.step(x, value, grad, concave)
+
+    assert optimizer.n_resets == 1
+    assert np.array_equal(optimizer.H_inv, np.eye(2))
+
+
+@pytest.mark.parametrize('x_0, status', [(np.zeros(2), Status.CONVERGED), (np.array([0.25, 0.0]), Status.NOT_FINITE)])
+def test_one_point_history(x_0: np.ndarray, status: Status) -> None:
+    def kernel(x: np.ndarray) -> Tuple[float, np.ndarray]:
+        return nan_below_half(x) if x[0] > 0 else quadratic(x)
+
+    result, history = optimize('bfgs', kernel, x_0, 1e-3)
+    assert result['status'] == status
+    assert history.shape == (1, 2)
+
+    '''
+    a run, that stops at the initial approximation, is drawn as the initial point
+    '''
+    ax = Figure().add_subplot()
+    plot_quiver(ax, history)
+    assert len(ax.collections) == 1
+    assert np.shape(ax.collections[0].get_offsets()) == (1, 2)
@@ -0,0 +1,78 @@
+import numpy as np
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Tuple, Any
+
+from src.tiles import TileCache, tile_level
+
+
+def value_and_grad(points: np.ndarray) -> Tuple[Any, np.ndarray]:
+    x, y = points[0], points[1]
+    return np.sin(x) * y, np.stack([np.cos(x) * y, np.sin(x)])
+
+
+def test_tile_level() -> None:
+    for width in [1e-3, 0.7, 1.0, 5.0, 1e4]:
+        size = 2.0**tile_level(width)
+        assert 1 < width / size <= 2
+
+
+def test_region_values() -> None:
+    cache = TileCache(value_and_grad, resolution=8)
+    X, Y, Z, grad_X, grad_Y = cache.get_region((-1.3, 2.1), (0.2, 0.9))
+
+    assert X.shape == Y.shape == Z.shape == grad_X.shape == grad_Y.shape
+    assert X.min() <= -1.3 and X.max() >= 2.1
+    assert Y.min() <= 0.2 and Y.max() >= 0.9
+
+    expected_Z, (expected_grad_X, expected_grad_Y) = value_and_grad(np.stack([X, Y]))
+    assert np.allclose(Z, expected_Z)
+    assert np.allclose(grad_X, expected_grad_X)
+    assert np.allclose(grad_Y, expected_grad_Y)
+
+    '''
+    the grid, assembled from the tiles, is regular
+    '''
+    assert np.allclose(np.diff(X[0]), X[0, 1] - X[0, 0])
+    assert np.allclose(np.diff(Y[:, 0]), Y[1, 0] - Y[0, 0])
+
+
+def test_only_new_tiles_are_evaluated() -> None:
+    cache = TileCache(value_and_grad, resolution=4)
+
+    cache.get_region((0.1, 1.9), (0.1, 1.9))
+    n_evaluated = cache.n_evaluated
+    assert n_evaluated > 0
+
+    cache.get_region((0.1, 1.9), (0.1, 1.9))
+    assert cache.n_evaluated == n_evaluated
+
+    keys = cache.tile_keys((1.1, 2.9), (0.1, 1.9))
+    n_missing = len(cache.missing(keys))
+    cache.get_region((1.1, 2.9), (0.1, 1.9))
+    assert cache.n_evaluated == n_evaluated + n_missing
+
+
+def test_lru_eviction() -> None:
+    cache = TileCache(value_and_grad, resolution=4, capacity=4)
+
+    for i in range(10):
+        cache.get_region((i, i + 1.5), (0.1, 1.4))
+        assert len(cache) <= 4
+
+
+def test_background() -> None:
+    cache = TileCache(value_and_grad, resolution=4)
+    keys = cache.tile_keys((0.1, 1.9), (0.1, 1.9))
+
+    _, _, Z, _, _ = cache.get_region((0.1, 1.9), (0.1, 1.9), compute_missing=False)
+    assert np.all(np.isnan(Z))
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        future = cache.submit(keys, executor)
+        assert future is not None
+        future.result()
+
+    assert not cache.missing(keys)
+    _, _, Z, _, _ = cache.get_region((0.1, 1.9), (0.1, 1.9), compute_missing=False)
+    assert not np.any(np.isnan(Z))
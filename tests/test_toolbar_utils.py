@@ -1,10 +1,12 @@
 import sympy
 
+import numpy as np
+
 import pytest
 
 from typing import Optional
 
-from src.toolbar_utils import build_function
+from src.toolbar_utils import build_function, build_gradient, build_value_and_grad, DIFF_BACKENDS
 from src.errors import Error
 
 
@@ -64,7 +66,71 @@ BUILD_FUNCTION_CASES = [
 
 @pytest.mark.parametrize('case', BUILD_FUNCTION_CASES, ids=str)
 def test_build_function(case: BuildFunctionCase) -> None:
-    err, func_sp, _ = build_function(case.input_string)
+    err, func_sp, _, _ = build_function(case.input_string)
     assert err == case.error
     if err == Error.OK:
         assert sympy.nsimplify(func_sp - case.func_sp) == 0  # type: ignore
+
+
+VALUE_AND_GRAD_FUNCTIONS = [
+    'x**2+y**2-cos(2*x+y)',
+    'x*y-6.5*(Abs(x)-sin(cos(y)))',
+    'x+y'
+]
+
+
+@pytest.mark.parametrize('input_string', VALUE_AND_GRAD_FUNCTIONS)
+def test_value_and_grad_scalar(input_string: str) -> None:
+    _, func_sp, func, _ = build_function(input_string)
+    err, value_and_grad = build_value_and_grad(func_sp)  # type: ignore
+    assert err == Error.OK
+
+    for point in [np.array([0.5, -0.5]), np.array([-2.0, 3.0])]:
+        value, grad_value = value_and_grad(point)  # type: ignore
+        assert isinstance(value, float)
+        assert grad_value.shape == (2,)
+        assert np.isclose(value, func(point))  # type: ignore
+
+        h = 1e-6
+        numerical_grad = [(func(point + h * e) - func(point - h * e)) / (2 * h)  # type: ignore
+                          for e in np.eye(2)]
+        assert np.allclose(grad_value, numerical_grad, atol=1e-5)
+
+
+@pytest.mark.parametrize('input_string', VALUE_AND_GRAD_FUNCTIONS)
+def test_value_and_grad_batched(input_string: str) -> None:
+    _, func_sp, _, _ = build_function(input_string)
+    _, value_and_grad = build_value_and_grad(func_sp)  # type: ignore
+
+    X, Y = np.meshgrid(np.linspace(-1, 1, 4), np.linspace(-2, 2, 3))
+    Z, grad_value = value_and_grad(np.stack([X, Y]))  # type: ignore
+    assert Z.shape == X.shape
+    assert grad_value.shape == (2, *X.shape)
+
+    for row_n in range(X.shape[0]):
+        for col_n in range(X.shape[1]):
+            point = np.array([X[row_n][col_n], Y[row_n][col_n]])
+            value, point_grad = value_and_grad(point)  # type: ignore
+            assert np.isclose(Z[row_n][col_n], value)
+            assert np.allclose(grad_value[:, row_n, col_n], point_grad)
+
+
+@pytest.mark.parametrize('backend', DIFF_BACKENDS)
+def test_derivatives_reused(backend: str, monkeypatch: pytest.MonkeyPatch) -> None:
+    err, func_sp, func, derivatives = build_function(VALUE_AND_GRAD_FUNCTIONS[1])
+    assert err == Error.OK and derivatives is not None
+
+    '''
+    the derivatives, computed by the sandbox, are used, so the function is not differentiated again
+    '''
+    def differentiate(expr: sympy.Expr) -> None:
+        raise AssertionError('differentiated again')
+    monkeypatch.setattr('src.toolbar_utils.differentiate', differentiate)
+    monkeypatch.setattr('src.jit.differentiate', differentiate)
+
+    _, grad = build_gradient(func_sp, derivatives)  # type: ignore
+    err, value_and_grad = build_value_and_grad(func_sp, backend, derivatives)  # type: ignore
+    assert err == Error.OK
+
+    point = np.array([0.5, -0.5])
+    assert np.allclose(value_and_grad(point)[1], grad(point))  # type: ignore
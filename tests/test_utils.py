@@ -1,4 +1,10 @@
-from src.utils import CountCalls
+import io
+import logging
+
+import pytest
+
+from src.utils import CountCalls, get_logger, configure_logging, shutdown_logging, parse_log_level, \
+    trace_span, NULL_SPAN, TRACE, ROOT_LOGGER_NAME, LOG_LEVEL_ENV
 
 
 def test_countcalls_loop() -> None:
@@ -24,3 +30,52 @@ def test_countcalls_args() -> None:
         else:
             f(i, b=i // 2)
     assert f.n_calls == 10
+
+
+def test_get_logger_does_not_duplicate_handlers() -> None:
+    logger = get_logger('module.py')
+    assert logger is get_logger('module.py')
+    assert not logger.handlers
+    assert logger.name == f'{ROOT_LOGGER_NAME}.module'
+
+
+def test_parse_log_level(monkeypatch: pytest.MonkeyPatch) -> None:
+    assert parse_log_level('debug') == logging.DEBUG
+    assert parse_log_level('TRACE') == TRACE
+    assert parse_log_level('15') == 15
+
+    monkeypatch.setenv(LOG_LEVEL_ENV, 'error')
+    assert parse_log_level(None) == logging.ERROR
+
+    with pytest.raises(ValueError):
+        parse_log_level('verbose')
+
+
+def test_configure_logging() -> None:
+    stream = io.StringIO()
+    try:
+        configure_logging('TRACE', stream)
+        configure_logging('TRACE', stream)
+
+        logger = get_logger('module.py')
+        logger.info('message')
+        with trace_span(logger, 'span', n=3):
+            pass
+    finally:
+        shutdown_logging()
+        logging.getLogger(ROOT_LOGGER_NAME).handlers.clear()
+        logging.getLogger(ROOT_LOGGER_NAME).propagate = True
+
+    lines = stream.getvalue().splitlines()
+    assert len(lines) == 2
+    assert 'message' in lines[0]
+    assert 'span' in lines[1] and 'n=3' in lines[1] and 'duration_ms=' in lines[1]
+
+
+def test_disabled_trace_span() -> None:
+    logger = get_logger('module.py')
+    logger.setLevel(logging.DEBUG)
+    try:
+        assert trace_span(logger, 'span') is NULL_SPAN
+    finally:
+        logger.setLevel(logging.NOTSET)